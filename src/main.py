@@ -29,6 +29,7 @@ import pyautogui as pag
 from modules.misc.appManager import getWindowSize
 import traceback
 import modules.misc.settingsManager as settingsManager
+from modules.misc.settingsStore import settingsStore
 import modules.macro as macroModule
 import modules.controls.mouse as mouse
 import json
@@ -566,18 +567,10 @@ def macro(status, logQueue, updateGUI, run, skipTask, presence=None):
         return setdatEnable, gatherFieldsList, gumdropGatherFieldsList, requireRedField, requireBlueField, feedBees, requireRedGumdropField, requireBlueGumdropField, requireField
 
     #macro.rejoin()
-    # Cache settings to avoid reloading on every iteration
-    settings_cache = {}
-    last_settings_load = 0
-    settings_cache_duration = 0.5  # Reload settings every 0.5 seconds max
-    
+    # Settings are kept in memory by the settings store, which only re-reads the files that changed
+    # Returns the store's shared read-only snapshot. Copy it (settingsStore.get()) before changing it
     def get_cached_settings():
-        nonlocal settings_cache, last_settings_load
-        current_time = time.time()
-        if current_time - last_settings_load > settings_cache_duration:
-            settings_cache = settingsManager.loadAllSettings()
-            last_settings_load = current_time
-        return settings_cache
+        return settingsStore.refresh().settings
     
     while True:
         # Check for pause request (state 5) - release inputs and transition to paused
@@ -592,7 +585,8 @@ def macro(status, logQueue, updateGUI, run, skipTask, presence=None):
         if run.value == 0:
             break  # Exit macro loop if stop requested
         
-        macro.setdat = get_cached_settings()
+        # The quests enable settings in macro.setdat for this iteration only, so the macro gets its own copy
+        macro.setdat = settingsStore.get()
         # Check if profile has changed and reload settings if needed
         macro.checkAndReloadSettings()
 
@@ -1908,23 +1902,15 @@ def watch_for_hotkeys(run):
     force_stop_check_interval = 0.1  # Check every 100ms
     last_force_stop_check = 0
     
-    # Cache settings to avoid reloading on every keypress
-    settings_cache = {}
-    last_settings_load = 0
-    settings_cache_duration = 1.0  # Reload settings every 1 second max
-    
+    # Settings are kept in memory by the settings store, which only re-reads the files that changed
     # Cache Eel recording state to avoid repeated calls
     recording_cache = {"start": False, "stop": False}  # , "pause": False}
     last_recording_check = 0
     recording_cache_duration = 0.5  # Check recording state every 0.5 seconds max
     
+    # Returns the store's shared read-only snapshot, like the macro loop's get_cached_settings
     def get_cached_settings():
-        nonlocal settings_cache, last_settings_load
-        current_time = time.time()
-        if current_time - last_settings_load > settings_cache_duration:
-            settings_cache = settingsManager.loadAllSettings()
-            last_settings_load = current_time
-        return settings_cache
+        return settingsStore.refresh().settings
     
     def is_recording_keybind():
         nonlocal recording_cache, last_recording_check
@@ -2194,7 +2180,7 @@ if __name__ == "__main__":
     import modules.misc.appManager as appManager
     import modules.misc.settingsManager as settingsManager
     from modules.discord_bot.discordBot import discordBot
-    from modules.submacros.convertAhkPattern import ahkPatternToPython
+    from modules.submacros.patternConversion import convertAhkPatterns
     from modules.submacros.stream import cloudflaredStream
     import os
 
@@ -2246,25 +2232,17 @@ if __name__ == "__main__":
         os.makedirs(profile_dir, exist_ok=True)
     settingsManager.saveDict(generalsettings_path, {**generalSettingsReference, **generalSettings})
 
-    #convert ahk pattern
+    #convert ahk pattern (only the new and changed ones, see patternConversion)
     patterns_dir = settingsManager.getPatternsDir()
     if os.path.exists(patterns_dir):
-        ahkPatterns = [x for x in os.listdir(patterns_dir) if ".ahk" in x]
-        for pattern in ahkPatterns:
-            pattern_path = os.path.join(patterns_dir, pattern)
-            with open(pattern_path, "r") as f:
-                ahk = f.read()
-            f.close()
-            try:
-                python = ahkPatternToPython(ahk)
-                print(f"Converted: {pattern}")
-                patternName = pattern.rsplit(".", 1)[0].lower()
-                output_path = os.path.join(patterns_dir, f"{patternName}.py")
-                with open(output_path, "w") as f:
-                    f.write(python)
-                f.close()
-            except:
-                messageBox.msgBox(title="Failed to convert pattern", text=f"There was an error converting {pattern}. The pattern will not be used.")
+        conversion = convertAhkPatterns(patterns_dir)
+        for pattern in conversion["converted"]:
+            print(f"Converted: {pattern}")
+        for pattern, error in conversion["failed"].items():
+            print(f"Failed to convert {pattern}: {error}")
+            messageBox.msgBox(title="Failed to convert pattern", text=f"There was an error converting {pattern}. The pattern will not be used.")
+        if conversion["converted"] or conversion["failed"] or conversion["cached"]:
+            print(f"Ahk patterns: {len(conversion['converted'])} converted, {len(conversion['cached'])} cached, {len(conversion['failed'])} failed in {conversion['time']*1000:.0f}ms ({conversion['mode']})")
     
     #setup stream class
     stream = cloudflaredStream()
@@ -2359,20 +2337,11 @@ if __name__ == "__main__":
     # Initialize Rich Presence Manager
     richPresenceManager = None
     
-    # Cache settings for main GUI loop to avoid reloading every 0.5 seconds
-    gui_settings_cache = {}
-    last_gui_settings_load = 0
-    gui_settings_cache_duration = 1.0  # Reload settings every 1 second max
-
     while True:
         eel.sleep(0.5)
         
-        # Get cached settings
-        current_time = time.time()
-        if current_time - last_gui_settings_load > gui_settings_cache_duration:
-            gui_settings_cache = settingsManager.loadAllSettings()
-            last_gui_settings_load = current_time
-        setdat = gui_settings_cache
+        # Get the settings from the settings store (only re-reads the files that changed)
+        setdat = settingsStore.get()
 
         #discord bot. Look for changes in the bot token
         currentDiscordBotToken = setdat.get("discord_bot_token", "")
@@ -2686,7 +2655,8 @@ if __name__ == "__main__":
         if run.value == 2 and time.time() > disconnectCooldownUntil:
             img = adjustImage("./images/menu", "disconnect", screenInfo["display_type"])
             wmx, wmy, wmw, wmh = getWindowSize("roblox roblox")
-            if locateImageOnScreen(img, wmx+wmw/3, wmy+wmh/2.8, wmw/2.3, wmh/5, 0.7):
+            #checked every loop, and the disconnect popup is large enough for the pyramid match
+            if locateImageOnScreen(img, wmx+wmw/3, wmy+wmh/2.8, wmw/2.3, wmh/5, 0.7, pyramid=True):
                 print("disconnected")
                 run.value = 4
                 disconnectCooldownUntil = time.time() + 300  # 5 min cooldown
\ No newline at end of file
@@ -103,6 +103,7 @@ def load_bitmap_matcher():
 #auto-load the module and expose its contents
 try:
     _bitmap_matcher = load_bitmap_matcher()
+    backend = "native"
     
     # Export all public attributes from the loaded module
     __all__ = [name for name in dir(_bitmap_matcher) if not name.startswith('_')]
@@ -111,18 +112,17 @@ try:
     for name in __all__:
         globals()[name] = getattr(_bitmap_matcher, name)
         
-except ImportError as e:
-    # Provide helpful error message
+except (ImportError, OSError) as e:
+    # OSError: xattr is not available outside of macos
     print(f"Warning: {e}")
-    print("bitmap_matcher extension not available.")
+    print("bitmap_matcher extension not available, using the numpy implementation.")
     
-    # You could provide fallback implementations here if needed
-    def fallback_function():
-        raise RuntimeError("bitmap_matcher extension not loaded. Please build the extension first.")
-    
-    # Example fallback (adjust based on your actual functions)
-    __all__ = ['match_bitmap']  # Add your actual function names
-    match_bitmap = fallback_function
+    # Fall back to the vectorized implementation of the same functions
+    from . import vectorized as _bitmap_matcher
+    backend = "vectorized"
+    __all__ = ['find_bitmap_cython', 'find_all_bitmap_cython', 'create_bitmap_from_base64']
+    for name in __all__:
+        globals()[name] = getattr(_bitmap_matcher, name)
 
 # bitmap_matcher_loader.py - Alternative standalone loader
 """
@@ -0,0 +1,227 @@
+"""
+NumPy implementation of the bitmap_matcher API, used when no compatible compiled extension is found.
+
+Same semantics as the extension:
+- a bitmap pixel matches when every RGB channel is within `variance` of the screen pixel
+- fully transparent bitmap pixels are skipped
+- the search is limited to the x, y, w, h window of the main image, and the match must fit inside it
+- the first match is the top-most, then left-most position
+"""
+import base64
+import io
+import numpy as np
+from PIL import Image
+
+#once there are fewer candidates than this, stop comparing whole planes and only check the remaining positions
+GATHER_THRESHOLD = 4096
+
+def to_rgb_array(img):
+    """Convert a PIL image or an RGB(A) array to an HxWx3 uint8 array."""
+    if isinstance(img, Image.Image):
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGB")
+        arr = np.asarray(img)
+    else:
+        arr = np.asarray(img)
+        if arr.ndim == 2:
+            arr = np.repeat(arr[:, :, None], 3, axis=2)
+    return arr[:, :, :3]
+
+def to_bitmap_arrays(img):
+    """Return the RGB pixels and alpha mask of a bitmap."""
+    if isinstance(img, Image.Image):
+        #convert handles palette and grayscale transparency (tRNS) as well
+        if img.mode != "RGBA":
+            img = img.convert("RGBA")
+        arr = np.asarray(img)
+        return arr[:, :, :3], arr[:, :, 3]
+    arr = np.asarray(img)
+    if arr.ndim == 2:
+        arr = np.repeat(arr[:, :, None], 3, axis=2)
+    if arr.shape[2] == 4:
+        return arr[:, :, :3], arr[:, :, 3]
+    return arr, np.full(arr.shape[:2], 255, dtype=np.uint8)
+
+def get_search_window(main_shape, bitmap_shape, x, y, w, h):
+    mh, mw = main_shape[:2]
+    bh, bw = bitmap_shape[:2]
+    x = max(0, int(x))
+    y = max(0, int(y))
+    x2 = mw if w is None else min(mw, x + int(w))
+    y2 = mh if h is None else min(mh, y + int(h))
+    #number of possible top left positions
+    return x, y, x2 - bw + 1, y2 - bh + 1
+
+def match_positions(main, bitmap, alpha, x=0, y=0, w=None, h=None, variance=0, max_matches=-1):
+    """Return the top left positions where the bitmap matches, in row-major order."""
+    sx, sy, ex, ey = get_search_window(main.shape, bitmap.shape, x, y, w, h)
+    if ex <= sx or ey <= sy:
+        return []
+    variance = max(0, int(variance))
+    pys, pxs = np.nonzero(alpha)
+    if not len(pys):
+        #fully transparent bitmap matches at the first position
+        return [(sx, sy)]
+    colors = bitmap[pys, pxs].astype(np.int16)
+    lows = np.clip(colors - variance, 0, 255).astype(np.uint8)
+    highs = np.clip(colors + variance, 0, 255).astype(np.uint8)
+
+    def pixel_match(values, i):
+        return np.all((values >= lows[i]) & (values <= highs[i]), axis=-1)
+
+    #comparing the channels separately is much faster than np.all over the last axis for whole planes
+    channels = [main[:, :, c] for c in range(3)]
+    def plane_match(py, px, i):
+        ok = None
+        for c in range(3):
+            plane = channels[c][sy+py:ey+py, sx+px:ex+px]
+            m = (plane >= lows[i][c]) & (plane <= highs[i][c])
+            ok = m if ok is None else ok & m
+        return ok
+
+    #candidate filtering: compare one bitmap pixel against every position at a time
+    #positions that fail are dropped, so later pixels are only checked where earlier ones matched
+    candidates = None
+    ys = xs = None
+    for i in range(len(pys)):
+        py, px = pys[i], pxs[i]
+        if ys is None:
+            ok = plane_match(py, px, i)
+            candidates = ok if candidates is None else candidates & ok
+            count = np.count_nonzero(candidates)
+            if not count:
+                return []
+            if count <= GATHER_THRESHOLD:
+                ys, xs = np.nonzero(candidates)
+                ys = ys + sy
+                xs = xs + sx
+        else:
+            keep = pixel_match(main[ys+py, xs+px], i)
+            ys = ys[keep]
+            xs = xs[keep]
+            if not len(ys):
+                return []
+    if ys is None:
+        ys, xs = np.nonzero(candidates)
+        ys = ys + sy
+        xs = xs + sx
+    if max_matches is not None and max_matches >= 0:
+        ys = ys[:max_matches]
+        xs = xs[:max_matches]
+    return [(int(a), int(b)) for a, b in zip(xs, ys)]
+
+def find_bitmap_cython(main_image, bitmap_image, use_simd=False, x=0, y=0, w=None, h=None, variance=0):
+    """Find the first position of bitmap_image in main_image. Returns (x, y) or None.
+
+    use_simd is accepted for compatibility with the extension and has no effect.
+    """
+    main = to_rgb_array(main_image)
+    bitmap, alpha = to_bitmap_arrays(bitmap_image)
+    res = match_positions(main, bitmap, alpha, x, y, w, h, variance, 1)
+    return res[0] if res else None
+
+def find_all_bitmap_cython(main_image, bitmap_image, x=0, y=0, w=None, h=None, variance=0, max_matches=-1):
+    """Find all positions of bitmap_image in main_image. Returns a list of (x, y)."""
+    main = to_rgb_array(main_image)
+    bitmap, alpha = to_bitmap_arrays(bitmap_image)
+    return match_positions(main, bitmap, alpha, x, y, w, h, variance, max_matches)
+
+def create_bitmap_from_base64(base64_string):
+    """Decode a base64 encoded image into an RGBA PIL image. Returns None if it can't be decoded."""
+    try:
+        img = Image.open(io.BytesIO(base64.b64decode(base64_string)))
+        return img.convert("RGBA")
+    except Exception as e:
+        print(f"Failed to decode bitmap: {e}")
+        return None
+
+def find_bitmap_reference(main_image, bitmap_image, x=0, y=0, w=None, h=None, variance=0):
+    """Straightforward pixel by pixel search, used to check the vectorized implementation."""
+    main = to_rgb_array(main_image).astype(np.int16)
+    bitmap, alpha = to_bitmap_arrays(bitmap_image)
+    bitmap = bitmap.astype(np.int16)
+    sx, sy, ex, ey = get_search_window(main.shape, bitmap.shape, x, y, w, h)
+    bh, bw = bitmap.shape[:2]
+    opaque = alpha > 0
+    for py in range(sy, ey):
+        for px in range(sx, ex):
+            diff = np.abs(main[py:py+bh, px:px+bw] - bitmap).max(axis=2)
+            if np.all(diff[opaque] <= variance):
+                return (px, py)
+    return None
+
+def check_parity(cases=200, seed=0, native=None):
+    """Compare the vectorized implementation against the reference search (and the extension if given) on random cases.
+
+    Returns the list of mismatching cases.
+    """
+    rng = np.random.default_rng(seed)
+    mismatches = []
+    for case in range(cases):
+        mh, mw = rng.integers(8, 48, 2)
+        bh, bw = rng.integers(1, 6, 2)
+        #few colors, so partial and repeated matches are common
+        palette = rng.integers(0, 256, (4, 3), dtype=np.uint8)
+        main = palette[rng.integers(0, 4, (mh, mw))]
+        bitmap = np.dstack([palette[rng.integers(0, 4, (bh, bw))], np.where(rng.random((bh, bw)) < 0.2, 0, 255).astype(np.uint8)])
+        #plant the bitmap most of the time, with some noise
+        if rng.random() < 0.7 and mh > bh and mw > bw:
+            py, px = rng.integers(0, mh-bh), rng.integers(0, mw-bw)
+            region = main[py:py+bh, px:px+bw]
+            opaque = bitmap[:, :, 3] > 0
+            noise = rng.integers(-3, 4, (bh, bw, 3))
+            region[opaque] = np.clip(bitmap[:, :, :3].astype(np.int16) + noise, 0, 255)[opaque]
+        variance = int(rng.choice([0, 2, 5, 30]))
+        x = int(rng.integers(0, mw//2))
+        y = int(rng.integers(0, mh//2))
+        w = None if rng.random() < 0.5 else int(rng.integers(1, mw))
+        h = None if rng.random() < 0.5 else int(rng.integers(1, mh))
+        mainImg = Image.fromarray(main, "RGB").convert("RGBA")
+        bitmapImg = Image.fromarray(bitmap, "RGBA")
+        expected = find_bitmap_reference(mainImg, bitmapImg, x=x, y=y, w=w, h=h, variance=variance)
+        results = {"vectorized": find_bitmap_cython(mainImg, bitmapImg, x=x, y=y, w=w, h=h, variance=variance)}
+        if native is not None:
+            results["native"] = native.find_bitmap_cython(mainImg, bitmapImg, x=x, y=y, w=w, h=h, variance=variance)
+        for name, res in results.items():
+            if res is not None:
+                res = tuple(res)
+            if res != expected:
+                mismatches.append({"case": case, "impl": name, "expected": expected, "got": res, "window": (x, y, w, h), "variance": variance})
+    return mismatches
+
+def benchmark(native=None, width=1440, runs=50):
+    """Time the vectorized (and native, if given) search on a buff strip sized image with the haste bitmaps."""
+    from modules.misc.benchmark import timeCall, formatTable
+    rng = np.random.default_rng(0)
+    screen = rng.integers(0, 256, (48, width, 4), dtype=np.uint8)
+    screen[:, :, 3] = 255
+    #a solid colored haste-like icon, so the early pixels produce many candidates
+    screen[10:40, 300:340, :3] = (0xf0, 0xf0, 0xf0)
+    mainImg = Image.fromarray(screen, "RGBA")
+    bitmaps = {
+        "solid 10x1": Image.new("RGBA", (10, 1), (0xf0, 0xf0, 0xf0, 255)),
+        "haste+ 20x1": Image.new("RGBA", (20, 1), "#eddb4cff"),
+        "count 4x11": create_bitmap_from_base64("iVBORw0KGgoAAAANSUhEUgAAAAQAAAALCAAAAAB9zHN3AAAAAnRSTlMAAHaTzTgAAABCSURBVHgBATcAyP8BAPMAAADzAAAAAAAAAAAAAAAAAAAAAAAAAAAAAPMAAADzAAAA8wAAAPMAAAAB8wAAAAIAAAAAtc8GqohTl5oAAAAASUVORK5CYII="),
+    }
+    impls = {"vectorized": find_bitmap_cython}
+    if native is not None:
+        impls["native"] = native.find_bitmap_cython
+    rows = []
+    for name, bitmap in bitmaps.items():
+        for variance in (0, 30):
+            for implName, func in impls.items():
+                stats, res = timeCall(lambda: func(mainImg, bitmap, x=0, variance=variance), runs=runs)
+                rows.append({"bitmap": name, "variance": variance, "impl": implName, "p50_ms": stats["p50_ms"], "p95_ms": stats["p95_ms"], "result": res})
+    print(formatTable(rows))
+    return rows
+
+if __name__ == "__main__":
+    from modules import bitmap_matcher
+    native = bitmap_matcher._bitmap_matcher if bitmap_matcher.backend == "native" else None
+    if native is None:
+        print("Native bitmap_matcher not available, only testing the vectorized implementation")
+    mismatches = check_parity(native=native)
+    print(f"Parity: {len(mismatches)} mismatches")
+    for m in mismatches[:20]:
+        print(m)
+    benchmark(native)
@@ -0,0 +1,135 @@
+import time
+
+'''
+Input backends.
+Keyboard and mouse events go through the active backend, so movement code can be run without sending real inputs
+(eg against a replay capture backend, or to record what a pattern does)
+'''
+
+class PyautoguiInputBackend:
+    '''
+    Sends real inputs with pyautogui and pynput
+    '''
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui as pag
+        from pynput.mouse import Button, Controller
+        self.pag = pag
+        self.button = Button
+        self.pynputMouse = Controller()
+
+    def keyDown(self, k, pause=True):
+        self.pag.keyDown(k, _pause = pause)
+
+    def keyUp(self, k, pause=True):
+        self.pag.keyUp(k, _pause = pause)
+
+    def press(self, k):
+        self.pag.press(k)
+
+    def write(self, text, interval=0.1):
+        self.pag.typewrite(text, interval)
+
+    #move the mouse instantly
+    def teleport(self, x, y):
+        self.pag.moveTo(int(x), int(y))
+
+    def moveTo(self, x, y, duration=0.1):
+        self.pag.moveTo(int(x), int(y), duration)
+        self.pynputMouse.position = (int(x), int(y))
+
+    def moveBy(self, x, y, pause=True):
+        self.pag.move(x, y, _pause=pause)
+
+    def mouseDown(self):
+        self.pynputMouse.press(self.button.left)
+        self.pag.mouseDown()
+
+    def mouseUp(self):
+        self.pynputMouse.release(self.button.left)
+        self.pag.mouseUp()
+
+    def fastClick(self):
+        self.pynputMouse.press(self.button.left)
+        self.pynputMouse.release(self.button.left)
+
+    def scroll(self, clicks, pause=False):
+        self.pag.scroll(clicks, _pause = pause)
+
+    def getPos(self):
+        return self.pag.position()
+
+class RecordingInputBackend:
+    '''
+    Does not send any inputs. Every event is stored as (time, event, args) instead
+    clock: function returning the current time. Defaults to time.perf_counter, pass the replay capture backend's now to line up events with frames
+    '''
+    name = "recording"
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.events = []
+        self.heldKeys = set()
+        self.mouseHeld = False
+        self.pos = (0, 0)
+
+    def record(self, event, *args):
+        self.events.append((self.clock(), event, args))
+
+    def clear(self):
+        self.events = []
+
+    def keyDown(self, k, pause=True):
+        self.heldKeys.add(k)
+        self.record("keyDown", k)
+
+    def keyUp(self, k, pause=True):
+        self.heldKeys.discard(k)
+        self.record("keyUp", k)
+
+    def press(self, k):
+        self.record("press", k)
+
+    def write(self, text, interval=0.1):
+        self.record("write", text)
+
+    def teleport(self, x, y):
+        self.moveTo(x, y, 0)
+
+    def moveTo(self, x, y, duration=0.1):
+        self.pos = (int(x), int(y))
+        self.record("moveTo", *self.pos)
+
+    def moveBy(self, x, y, pause=True):
+        self.pos = (self.pos[0]+x, self.pos[1]+y)
+        self.record("moveBy", x, y)
+
+    def mouseDown(self):
+        self.mouseHeld = True
+        self.record("mouseDown")
+
+    def mouseUp(self):
+        self.mouseHeld = False
+        self.record("mouseUp")
+
+    def fastClick(self):
+        self.record("click")
+
+    def scroll(self, clicks, pause=False):
+        self.record("scroll", clicks)
+
+    def getPos(self):
+        return self.pos
+
+_backend = None
+
+def getInputBackend():
+    global _backend
+    if _backend is None:
+        _backend = PyautoguiInputBackend()
+    return _backend
+
+def setInputBackend(backend):
+    global _backend
+    _backend = backend
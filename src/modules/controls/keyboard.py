@@ -1,25 +1,35 @@
 import sys
 import os
-import pyautogui as pag
+from modules.controls.inputBackend import getInputBackend
 import time
 from modules.submacros.hasteCompensation import HasteCompensationRevamped
+from modules.submacros.hasteSampler import HasteSampler
+from modules.controls.movementTiming import MovementTimer
 import threading
 from collections import deque
 
 
 class keyboard:
-    def __init__(self, walkspeed, enableHasteCompensation, hasteCompensation: HasteCompensationRevamped):
+    def __init__(self, walkspeed, enableHasteCompensation, hasteCompensation: HasteCompensationRevamped, hasteSampleRate=30):
         self.ws = walkspeed
         self.enableHasteCompensation = enableHasteCompensation
         self.hasteCompensation = hasteCompensation
+        #the move speed is read on a background thread, the wait functions use its samples
+        self.hasteSampler = HasteSampler(hasteCompensation, hasteSampleRate)
 
         self.detection_interval = 0.01
+        #the wait functions sleep until shortly before the distance should be reached, instead of spinning
+        self.movementTimer = MovementTimer()
         
         #drift compensation
         self.accumulated_error = 0
         self.error_correction_factor = 0.1
     
     
+    def setHasteCompensation(self, hasteCompensation: HasteCompensationRevamped):
+        self.hasteCompensation = hasteCompensation
+        self.hasteSampler.hasteCompensation = hasteCompensation
+
     def predictiveTimeWait(self, duration):
         base_speed = 28
         target_distance = base_speed * duration
@@ -27,29 +37,13 @@ class keyboard:
         
         traveled_distance = 0
         start_time = time.perf_counter()
-        last_time = start_time
         
         #safety distance, just in case of infinite drifting
         max_time = duration * 1.2
 
-        #sleep_interval = 0.01  # Or even 0.02 would probably work fine
-        
-        while traveled_distance < corrected_target:
-            current_time = time.perf_counter()
-            elapsed = current_time - start_time
-            
-            # Safety timeout
-            if elapsed >= max_time:
-                break
-
-            speed = self.getMoveSpeed()
-            
-            delta_t = current_time - last_time
-            distance_increment = speed * delta_t
-            traveled_distance += distance_increment
-            
-            last_time = current_time
-            #time.sleep(sleep_interval)
+        with self.hasteSampler.active():
+            speed = self.hasteSampler.integrator(start_time)
+            traveled_distance = self.movementTimer.waitDistance(speed, corrected_target, start_time, max_time, "predictiveTimeWait")
         
         #calculate drift and update accumulated error
         distance_error = traveled_distance - target_distance
@@ -72,7 +66,7 @@ class keyboard:
     
     def multiWalk(self, keys, t, applyHaste=True, method='predictive'):
         for k in keys:
-            pag.keyDown(k, _pause=False)
+            getInputBackend().keyDown(k, False)
         
         if applyHaste and self.enableHasteCompensation:
             if method == 'predictive':
@@ -83,21 +77,21 @@ class keyboard:
             time.sleep(t * 28 / self.ws)
         
         for k in keys:
-            pag.keyUp(k, _pause=False)
+            getInputBackend().keyUp(k, False)
 
     @staticmethod
     #call the press function of the pag library
     def pagPress(k):
-        pag.press(k)
+        getInputBackend().press(k)
     @staticmethod
     def keyDown(k, pause = True):
         #for some reason, the function key is sometimes held down, causing it to open the dock or enable dictation
         keyboard.keyUp('fn', False)
-        pag.keyDown(k, _pause = pause)
+        getInputBackend().keyDown(k, pause)
 
     @staticmethod
     def keyUp(k, pause = True):
-        pag.keyUp(k, _pause = pause)
+        getInputBackend().keyUp(k, pause)
 
     #pyautogui without the pause
     def press(self,key, delay = 0.02):
@@ -106,15 +100,15 @@ class keyboard:
         keyboard.keyUp(key, False)
 
     def write(self, text, interval = 0.1):
-        pag.typewrite(text, interval)
+        getInputBackend().write(text, interval)
     #pyautogui with the pause
     def slowPress(self,k):
-        pag.keyDown(k)
+        getInputBackend().keyDown(k)
         time.sleep(0.08)
-        pag.keyUp(k)
+        getInputBackend().keyUp(k)
 
     def getMoveSpeed(self):
-        movespeed = self.hasteCompensation.getHaste()
+        movespeed = self.hasteSampler.getSpeed()
         return movespeed
     
     def timeWaitNoHasteCompensation(self, duration):
@@ -128,45 +122,25 @@ class keyboard:
         maxTime = baseSpeed/24*duration
 
         st = time.perf_counter()
-        prevTime = st
-        prevSpeed = self.getMoveSpeed()
-
-        while traveledDistance < target_distance and prevTime-st < maxTime:
-            currentTime = time.perf_counter()
-            speed = self.getMoveSpeed()
-
-            delta_t = currentTime - prevTime
 
-            # Apply trapezoidal integration to calculate traveled distance
-            traveledDistance += ((prevSpeed + speed) / 2) * delta_t
-
-            # Update previous values
-            prevTime = currentTime
-            prevSpeed = speed
+        with self.hasteSampler.active():
+            #interpolates between the speed samples (trapezoidal integration)
+            speed = self.hasteSampler.integrator(st)
+            traveledDistance = self.movementTimer.waitDistance(speed, target_distance, st, maxTime, "timeWait")
 
         elapsed_time = time.perf_counter() - st
         #print(f"current speed: {speed}, original time: {duration}, actual travel time: {elapsed_time}")
 
     #recreate natro's walk function
     def tileWait(self, n, hasteCap=0):
-        #self.getMoveSpeed takes too fast to run
-        def a():
-            st = time.perf_counter()
-            a = self.hasteCompensation.getHaste()
-            et = time.perf_counter()
-            return st, et, a
         freq = 1  # Simulated frequency constant
         d = freq / 8
         l = n * freq * 4
 
-        s, f, v = a()
-        d += v * (f - s) 
-
-        st = time.time()
-        while d < l:
-            prev_v = v
-            s, f, v = a()
-            d += ((prev_v + v) / 2) * (f - s) 
+        #the distance is integrated from the haste sampler's readings instead of reading the speed every iteration
+        with self.hasteSampler.active():
+            speed = self.hasteSampler.integrator()
+            self.movementTimer.waitDistance(speed, l - d, kind="tileWait")
         
     
     def tileWalk(self, key, tiles, applyHaste = True):
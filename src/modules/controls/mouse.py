@@ -1,26 +1,21 @@
-import pyautogui as pag
 import time
-from pynput.mouse import Button, Controller
+from modules.controls.inputBackend import getInputBackend
 
-pynputMouse = Controller()
 #move the mouse instantly
 def teleport(x,y):
-    pag.moveTo(int(x),int(y))
+    getInputBackend().teleport(x,y)
 
 def moveTo(x,y, delay = 0.1):
-    pag.moveTo(int(x),int(y), delay)
-    pynputMouse.position = (int(x), int(y))
+    getInputBackend().moveTo(x,y, delay)
 
 def mouseDown():
-    pynputMouse.press(Button.left)
-    pag.mouseDown()
+    getInputBackend().mouseDown()
 
 def mouseUp():
-    pynputMouse.release(Button.left)
-    pag.mouseUp()
+    getInputBackend().mouseUp()
 
 def moveBy(x = 0,y = 0, pause=True):
-    pag.move(x, y, _pause=pause)  
+    getInputBackend().moveBy(x, y, pause)
 
 def click():
     mouseDown()
@@ -28,11 +23,10 @@ def click():
     mouseUp()
 
 def fastClick():
-    pynputMouse.press(Button.left)
-    pynputMouse.release(Button.left)
+    getInputBackend().fastClick()
 
 def scroll(clicks, pause = False):
-    pag.scroll(clicks, _pause = pause)
+    getInputBackend().scroll(clicks, pause)
 
 def getPos():
-    return pag.position()
\ No newline at end of file
+    return getInputBackend().getPos()
@@ -0,0 +1,114 @@
+import time
+from collections import deque
+
+#time.sleep can wake up late, so the last part of a wait is spun instead
+spinTime = 0.0015
+
+class MovementTimer:
+    '''
+    Waits until a distance has been travelled, used by the keyboard's walk/wait functions.
+    Instead of checking the distance in a busy loop, the remaining time is predicted from the current speed,
+    and the thread sleeps until shortly before then. The prediction is refreshed every maxChunk seconds,
+    so new haste readings are picked up, and only the last spinTime seconds are spun.
+
+    Every wait records how far it went past (or short of) the target, converted to ms at the current speed,
+    so the accuracy can be compared with the spinning loops (mode="spin").
+    '''
+
+    def __init__(self, mode="predictive", spin=spinTime, maxChunk=0.01, history=1000):
+        self.mode = mode
+        self.spin = spin
+        self.maxChunk = maxChunk
+        self.history = history
+        #kind: stats
+        self.stats = {}
+
+    #integrator: object with update(now) -> distance travelled and v (current speed), eg SpeedIntegrator
+    #target: distance to travel. start: perf_counter time the movement started. maxTime: safety timeout in seconds
+    #returns the distance travelled
+    def waitDistance(self, integrator, target, start=None, maxTime=None, kind="walk"):
+        if start is None:
+            start = time.perf_counter()
+        deadline = start + maxTime if maxTime is not None else None
+        cpuStart = time.thread_time()
+        timedOut = False
+        while True:
+            now = time.perf_counter()
+            distance = integrator.update(now)
+            if distance >= target:
+                break
+            if deadline is not None and now >= deadline:
+                timedOut = True
+                break
+            if self.mode == "spin":
+                continue
+            remaining = (target - distance) / max(integrator.v, 1e-6)
+            if deadline is not None:
+                remaining = min(remaining, deadline - now)
+            if remaining > self.spin:
+                time.sleep(min(remaining - self.spin, self.maxChunk))
+        self.record(kind, distance - target, integrator.v, time.perf_counter() - start, time.thread_time() - cpuStart, timedOut)
+        return distance
+
+    def record(self, kind, distanceError, speed, wallTime, cpuTime, timedOut):
+        stats = self.stats.get(kind)
+        if stats is None:
+            stats = {"errors": deque(maxlen=self.history), "wall": 0, "cpu": 0, "timeouts": 0, "steps": 0}
+            self.stats[kind] = stats
+        #positive: went past the target (overshoot), negative: stopped short (undershoot)
+        stats["errors"].append(distanceError / max(speed, 1e-6))
+        stats["wall"] += wallTime
+        stats["cpu"] += cpuTime
+        stats["timeouts"] += timedOut
+        stats["steps"] += 1
+
+    def getStats(self):
+        from modules.misc.benchmark import percentile
+        out = {}
+        for kind, stats in self.stats.items():
+            errors = list(stats["errors"])
+            absErrors = [abs(x) for x in errors]
+            out[kind] = {
+                "steps": stats["steps"],
+                "mean_error_ms": sum(errors)/max(1, len(errors))*1000,
+                "p50_abs_error_ms": percentile(absErrors, 50)*1000,
+                "p95_abs_error_ms": percentile(absErrors, 95)*1000,
+                "max_overshoot_ms": max(errors, default=0)*1000,
+                "max_undershoot_ms": -min(errors, default=0)*1000,
+                "timeouts": stats["timeouts"],
+                #share of a core used while waiting
+                "cpu_load": stats["cpu"]/max(stats["wall"], 1e-9),
+            }
+        return out
+
+def benchmarkMovementTiming(durations=(0.1, 0.25, 0.5, 1), runs=5, sampleRate=30):
+    '''
+    Compare the predictive timer against the spinning loop on a simulated walk where haste changes halfway through
+    Reports the overshoot/undershoot and cpu load of both modes
+    '''
+    from modules.submacros.hasteSampler import HasteSampler
+    from modules.misc.benchmark import formatTable
+
+    class SimulatedHaste:
+        def __init__(self):
+            self.start = time.perf_counter()
+            self.switch = 0
+        def getHaste(self):
+            time.sleep(0.004) #screenshot + bitmap search
+            return 28 if time.perf_counter() - self.start < self.switch else 28*1.5
+
+    rows = []
+    for mode in ("spin", "predictive"):
+        timer = MovementTimer(mode)
+        for duration in durations:
+            for _ in range(runs):
+                haste = SimulatedHaste()
+                haste.switch = duration/2
+                sampler = HasteSampler(haste, sampleRate)
+                with sampler.active():
+                    start = time.perf_counter()
+                    timer.waitDistance(sampler.integrator(start), 28*duration, start, kind=f"{duration}s")
+        for kind, stats in timer.getStats().items():
+            rows.append({"mode": mode, "walk": kind, **stats})
+    print(formatTable(rows))
+    return rows
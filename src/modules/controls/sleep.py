@@ -1,5 +1,6 @@
 #custom sleep function with pause support
 import time
+from modules.controls.movementTiming import spinTime
 
 # Module-level reference to the run state (multiprocessing.Value)
 _run_state = None
@@ -33,35 +34,23 @@ def sleep(duration, get_now=time.perf_counter):
     if wait_while_paused():
         return  # Stop was requested
     
-    now = get_now()
-    end = now + duration
-    while now < end:
+    # Sleep in os chunks (short enough to notice a pause) and only spin for the last spinTime seconds
+    end = get_now() + duration
+    while True:
+        remaining = end - get_now()
+        if remaining <= spinTime:
+            break
+        time.sleep(min(remaining - spinTime, 0.1))
         # Periodically check for pause during long sleeps
         if duration > 0.1 and is_paused():
             if wait_while_paused():
                 return  # Stop was requested
-        now = get_now()
+    while get_now() < end:
+        pass
 
 def high_precision_sleep(duration):
     """Pause-aware high precision sleep"""
-    # Check for pause before sleeping
-    if wait_while_paused():
-        return  # Stop was requested
-    
-    start_time = time.perf_counter()
-    while True:
-        elapsed_time = time.perf_counter() - start_time
-        remaining_time = duration - elapsed_time
-        if remaining_time <= 0:
-            break
-        if remaining_time > 0.02:  # Sleep for 5ms if remaining time is greater
-            time.sleep(max(remaining_time/2, 0.0001))  # Sleep for the remaining time or minimum sleep interval
-        else:
-            pass
-        # Check for pause during sleep
-        if is_paused():
-            if wait_while_paused():
-                return  # Stop was requested
+    sleep(duration)
 
 def pauseable_sleep(duration):
     """A time.sleep replacement that respects pause state"""
@@ -0,0 +1,231 @@
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import Future
+from modules.controls.inputBackend import getInputBackend
+from modules.controls.movementTiming import spinTime
+from modules.controls.sleep import is_paused, is_stopped, wait_while_paused
+from modules.submacros.patternSimulator import PatternSimulator, VirtualKeyboard, PatternStopped
+
+#one tile is 4 studs (see keyboard.tileWait)
+studsPerTile = 4
+
+#t: tiles walked (haste compensated waits) before the event. fixed: seconds of plain waiting (sleeps, key presses) before the event
+KeyEvent = namedtuple("KeyEvent", ["t", "fixed", "key", "down"])
+
+class Timeline:
+    '''
+    A pattern or path as a list of key events, instead of python that mixes key presses with blocking waits.
+    The time of an event is split into tiles (scaled by the move speed when replayed) and fixed seconds.
+    end is the (t, fixed) time the script finished, after its last event
+    '''
+    def __init__(self, events, end):
+        self.events = events
+        self.end = end
+
+    def __len__(self):
+        return len(self.events)
+
+    #how long the timeline takes at a move speed (studs/s)
+    def duration(self, speed):
+        return self.end[1] + self.end[0]*studsPerTile/speed
+
+class RecordingKeyboard(VirtualKeyboard):
+    '''
+    Virtual keyboard that records the key events. The waits are simulated at the base speed
+    '''
+    def keyDown(self, k, pause=True):
+        self.sim.record(k, True)
+        super().keyDown(k, pause)
+
+    def keyUp(self, k, pause=True):
+        if k in self.sim.held:
+            self.sim.record(k, False)
+        super().keyUp(k, pause)
+
+class TimelineRecorder(PatternSimulator):
+    '''
+    Lowers a pattern/path to a Timeline by running it against a recording keyboard
+    '''
+    keyboardClass = RecordingKeyboard
+
+    def __init__(self, maxTime=600):
+        #the path isn't needed, so it is only sampled once per wait
+        super().__init__(movespeed=28, step=maxTime, maxTime=maxTime)
+
+    def reset(self, x=0, y=0, angle=0):
+        super().reset(x, y, angle)
+        self.tiles = 0
+        self.fixed = 0
+        self.events = []
+
+    def record(self, key, down):
+        self.events.append(KeyEvent(self.tiles, self.fixed, key, down))
+
+    def advance(self, duration):
+        self.fixed += max(0, duration)
+        super().advance(duration)
+
+    def travel(self, distance):
+        distance = max(0, distance)
+        self.tiles += distance/studsPerTile
+        PatternSimulator.advance(self, distance/self.speed)
+
+    def lower(self, code, size=1, width=1, sizeword="m", invertLR=False, invertFB=False):
+        self.run(code, size, width, sizeword, invertLR, invertFB)
+        #release anything the script left held
+        for key in sorted(set(e.key for e in self.events if e.down)):
+            if sum(1 if e.down else -1 for e in self.events if e.key == key) > 0:
+                self.record(key, False)
+        return Timeline(self.events, (self.tiles, self.fixed))
+
+#pattern timelines, keyed by the pattern and its settings. Recompiling the pattern (see codeCache) invalidates the entry
+timelineCache = {}
+
+#timeline of a pattern, or None if it can't be lowered (it uses more than the keyboard and the gather variables)
+def getPatternTimeline(path, size, width, sizeword="m", invertLR=False, invertFB=False):
+    from modules.misc.codeCache import codeCache
+    code = codeCache.get(path)
+    key = (path, size, width, sizeword, invertLR, invertFB)
+    entry = timelineCache.get(key)
+    if entry is not None and entry[0] is code:
+        return entry[1]
+    try:
+        timeline = TimelineRecorder().lower(code, size, width, sizeword, invertLR, invertFB)
+    except PatternStopped as e:
+        print(f"Could not convert {path} to a timeline: {e}")
+        timeline = None
+    except Exception as e:
+        print(f"Could not convert {path} to a timeline, running it as a script instead: {e}")
+        timeline = None
+    timelineCache[key] = (code, timeline)
+    return timeline
+
+class TimelineExecutor:
+    '''
+    Replays a Timeline on its own input thread.
+    Each event has a deadline: the previous event's deadline, plus its fixed wait, plus the time to walk its tiles.
+    The walking time follows the live move speed from the keyboard's haste sampler and is re-predicted while waiting
+    (like MovementTimer), so a late event does not delay the ones after it.
+    The thread sleeps until shortly before a deadline and spins the rest, then sends the key straight to the
+    input backend (without keyboard.keyDown's extra fn release).
+
+    Records the scheduling jitter (send time - deadline) of every event
+    '''
+    def __init__(self, keyboard, maxChunk=0.01, history=2000):
+        self.keyboard = keyboard
+        self.maxChunk = maxChunk
+        self.jitters = deque(maxlen=history)
+        self.sendTimes = deque(maxlen=history)
+        self.played = 0
+        self.events = 0
+        self.aborted = 0
+        self._thread = None
+
+    #wait until studs were walked, starting at start (a perf_counter time, can be in the future). Returns the deadline
+    #integrator: SpeedIntegrator of the haste sampler, or None to walk at the base move speed (no haste compensation)
+    def waitWalk(self, start, studs, integrator):
+        if integrator is None or studs <= 0:
+            deadline = start + max(0, studs)/self.keyboard.ws
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= spinTime:
+                    break
+                time.sleep(min(remaining - spinTime, 0.1))
+        else:
+            integrator.t = start
+            integrator.distance = 0
+            while True:
+                now = time.perf_counter()
+                distance = integrator.update(now)
+                deadline = max(now, start) + (studs - distance)/max(integrator.v, 1e-6)
+                remaining = deadline - now
+                if remaining <= spinTime:
+                    break
+                time.sleep(min(remaining - spinTime, self.maxChunk))
+        while time.perf_counter() < deadline:
+            pass
+        return deadline
+
+    #returns False if the macro was stopped. Keys that are still held are released, even if sending a key fails
+    def replay(self, timeline):
+        backend = getInputBackend()
+        sampler = self.keyboard.hasteSampler
+        useSpeed = self.keyboard.enableHasteCompensation
+        held = set()
+        try:
+            backend.keyUp("fn", False)
+            with sampler.active():
+                integrator = sampler.integrator() if useSpeed else None
+                deadline = time.perf_counter()
+                prev = KeyEvent(0, 0, None, None)
+                for event in timeline.events + [KeyEvent(*timeline.end, None, None)]:
+                    if is_paused():
+                        #let go of the keys while paused, press them again after
+                        for key in held:
+                            backend.keyUp(key, False)
+                        pauseStart = time.perf_counter()
+                        stopped = wait_while_paused()
+                        deadline += time.perf_counter() - pauseStart
+                        if stopped:
+                            held.clear()
+                            self.aborted += 1
+                            return False
+                        for key in held:
+                            backend.keyDown(key, False)
+                    if is_stopped():
+                        self.aborted += 1
+                        return False
+                    deadline = self.waitWalk(deadline + event.fixed - prev.fixed, (event.t - prev.t)*studsPerTile, integrator)
+                    prev = event
+                    if event.key is None:
+                        break
+                    st = time.perf_counter()
+                    if event.down:
+                        backend.keyDown(event.key, False)
+                        held.add(event.key)
+                    else:
+                        backend.keyUp(event.key, False)
+                        held.discard(event.key)
+                    self.jitters.append(st - deadline)
+                    self.sendTimes.append(time.perf_counter() - st)
+                    self.events += 1
+        finally:
+            for key in held:
+                try:
+                    backend.keyUp(key, False)
+                except Exception as e:
+                    print(f"Could not release {key}: {e}")
+        self.played += 1
+        return True
+
+    #replay on the input thread. Returns the result of replay, and raises its exception in the caller
+    #if wait is False, returns a Future of the result instead of blocking
+    def play(self, timeline, wait=True):
+        future = Future()
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(self.replay(timeline))
+            except BaseException as e:
+                future.set_exception(e)
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        if wait:
+            return future.result()
+        return future
+
+    def getStats(self):
+        from modules.misc.benchmark import percentile
+        jitters = list(self.jitters)
+        absJitters = [abs(x) for x in jitters]
+        return {
+            "timelines": self.played,
+            "aborted": self.aborted,
+            "events": self.events,
+            "p50_jitter_ms": percentile(absJitters, 50)*1000,
+            "p95_jitter_ms": percentile(absJitters, 95)*1000,
+            "max_jitter_ms": max(absJitters, default=0)*1000,
+            "avg_send_ms": sum(self.sendTimes)/max(1, len(self.sendTimes))*1000,
+        }
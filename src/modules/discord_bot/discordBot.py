@@ -19,31 +19,19 @@ from datetime import datetime, timedelta
 import queue  # <-- Add this import
 from typing import List
 
-# Import settings manager functions
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'misc'))
-import settingsManager
+# Import settings manager functions (the same module as the settings store, so they share the profile and pending writes)
+import modules.misc.settingsManager as settingsManager
 
-# Global settings cache to avoid frequent file reads
-_settings_cache = {}
-_cache_timestamp = 0
-_cache_duration = 5  # seconds
+from modules.misc.settingsStore import settingsStore
 
 def get_cached_settings():
-    """Get settings with caching to improve performance"""
-    global _settings_cache, _cache_timestamp
-    current_time = time.time()
-
-    if current_time - _cache_timestamp > _cache_duration or not _settings_cache:
-        _settings_cache = settingsManager.loadAllSettings()
-        _cache_timestamp = current_time
-
-    return _settings_cache
+    """Get the settings from the settings store (only re-reads the files that changed)
+    This is the store's shared read-only snapshot. Use settingsStore.get() for a copy that can be changed"""
+    return settingsStore.refresh().settings
 
 def clear_settings_cache():
-    """Clear the settings cache"""
-    global _settings_cache, _cache_timestamp
-    _settings_cache = {}
-    _cache_timestamp = 0
+    """Make the next read check the settings files again"""
+    settingsStore.invalidate()
 
 def update_setting(setting_key, value):
     """Update a specific setting"""
@@ -1,6 +1,7 @@
 import modules.screen.ocr as ocr
 import modules.misc.appManager as appManager
 import modules.misc.settingsManager as settingsManager
+from modules.misc.settingsStore import settingsStore
 import time
 import pyautogui as pag
 
@@ -13,11 +14,17 @@ import modules.controls.mouse as mouse
 import modules.logging.log as logModule
 from modules.submacros.fieldDriftCompensation import fieldDriftCompensation as fieldDriftCompensationClass
 from modules.screen.robloxWindow import RobloxWindowBounds
+from modules.screen.capture import captureService
+from modules.screen.ocrCache import ocrCache
+from modules.screen.digitReader import digitReader, whiteTextMask
+from modules.screen.ocrPool import ocrPool
+from modules.screen.nightDetection import NightDetector
 import sys
 import platform
 import os
 import numpy as np
 import threading
+from concurrent.futures import Future
 from modules.submacros.backpack import bpc
 from modules.screen.imageSearch import *
 import webbrowser
@@ -32,12 +39,17 @@ import math
 import re
 import ast
 from modules.submacros.hourlyReport import HourlyReport, BuffDetector
+from modules.submacros.buffBar import BuffBarParser
 from difflib import SequenceMatcher
 import fuzzywuzzy.process
 import fuzzywuzzy
 import traceback
 import pygetwindow as gw
-from modules.submacros.hasteCompensation import HasteCompensationRevamped
+from modules.submacros.hasteCompensation import createHasteCompensation
+from modules.submacros.hasteBenchmark import selectHasteImplementation
+from modules.misc.fieldData import startLocationDimensions, sizeData
+from modules.misc.codeCache import codeCache
+from modules.controls.timeline import TimelineExecutor, getPatternTimeline
 from modules import bitmap_matcher
 import json
 
@@ -239,28 +251,6 @@ fieldFaceNorthKeys = {
     "coconut": ["."]*4
 }
 
-#the field dimensions taken from natro
-#[length, width]
-startLocationDimensions = {
-    "sunflower": [1250, 2000],
-    "dandelion": [2500, 1000],
-    "mushroom": [1250, 1750],
-    "blue flower": [2750, 750],
-    "clover": [2000, 1500],
-    "strawberry": [1500, 2000],
-    "spider": [2000, 2000],
-    "bamboo": [3000, 1250],
-    "pineapple": [1750, 3000],
-    "stump": [1500, 1500],
-    "cactus": [1500, 2500],
-    "pumpkin": [1500, 2500],
-    "pine tree": [2500, 1700],
-    "rose": [2500, 1500],
-    "mountain top": [2250, 1500],
-    "pepper": [1500, 2250],
-    "coconut": [1500, 2250]
-}
-
 #for the ocr
 #sometimes, it reads the bss font as crillic characters, so it'll need to be converted back to latin
 #This isn't an actual translation, the characters are mapped visually
@@ -480,16 +470,26 @@ class macro:
         if run is not None:
             set_run_state(run)
         
-        self.setdat = settingsManager.loadAllSettings()
-        self.fieldSettings = settingsManager.loadFields()
+        self.setdat = settingsStore.get()
+        self.fieldSettings = settingsStore.getFields()
         # Track profile changes to reload settings when profile is switched
-        self._last_profile_change_counter = settingsManager.getProfileChangeCounter()
+        self._last_profile_change_counter = settingsStore.profileChanges
 
         self.robloxWindow = RobloxWindowBounds()
+        captureService.setRobloxWindow(self.robloxWindow)
+        templateRegistry.indexAll("./images")
+        #load the ocr model in the background, so its ready by the time the macro needs it
+        ocr.ocrBackend.setPreferred(self.setdat.get("ocr_backend", "auto"))
+        ocr.ocrBackend.warmUp()
         
-        self.hasteCompensation = HasteCompensationRevamped(self.robloxWindow, self.setdat["movespeed"])
+        #the implementation that did best in the haste benchmark on this display type (HasteCompensationRevamped if it wasn't run)
+        self.hasteImplementation = selectHasteImplementation(self.robloxWindow.display_type)
+        self.hasteCompensation = createHasteCompensation(self.hasteImplementation, self.robloxWindow, self.setdat["movespeed"])
         self.fieldDriftCompensation = fieldDriftCompensationClass(self.robloxWindow)
-        self.keyboard = keyboard(self.setdat["movespeed"], self.setdat["haste_compensation"], self.hasteCompensation)
+        self.nightDetector = NightDetector(self.robloxWindow)
+        self.keyboard = keyboard(self.setdat["movespeed"], self.setdat["haste_compensation"], self.hasteCompensation, self.setdat.get("haste_sample_rate", 30))
+        #replays patterns converted to key event timelines (timeline_patterns setting)
+        self.timelineExecutor = TimelineExecutor(self.keyboard)
         # Prepare ping settings
         pingSettings = {
             "ping_critical_errors": self.setdat.get("ping_critical_errors", False),
@@ -507,6 +507,7 @@ class macro:
         self.logger = logModule.log(logQueue, self.setdat.get("enable_webhook", False), self.setdat.get("webhook_link", ""), self.setdat.get("send_screenshot", True), blocking=self.setdat.get("low_performance", False), hourlyReportOnly=self.setdat.get("only_send_hourly_report", False), robloxWindow=self.robloxWindow, enableDiscordPing=self.setdat.get("enable_discord_ping", False), discordUserID=self.setdat.get("discord_user_id", ""), pingSettings=pingSettings, webhookTimeFormat=self.setdat.get("webhook_time_format", 24))
         self.buffDetector = BuffDetector(self.robloxWindow)
         self.hourlyReport = HourlyReport(self.buffDetector, self.setdat.get("hourly_report_time_format", 24))
+        self.buffBarParser = BuffBarParser(self.buffDetector, self.hourlyReport)
         self.memoryMatch = MemoryMatch(self.robloxWindow)
 
         #setup an internal cooldown tracker. The cooldowns can be modified
@@ -551,13 +552,15 @@ class macro:
 
     def checkAndReloadSettings(self):
         """Check if profile has changed and reload settings if needed"""
-        current_counter = settingsManager.getProfileChangeCounter()
+        #the store follows profile switches in the gui process too
+        settingsStore.refresh()
+        current_counter = settingsStore.profileChanges
         if current_counter != self._last_profile_change_counter:
             self._last_profile_change_counter = current_counter
             # Reload settings
             old_profile = settingsManager.getCurrentProfile()
-            self.setdat = settingsManager.loadAllSettings()
-            self.fieldSettings = settingsManager.loadFields()
+            self.setdat = settingsStore.get()
+            self.fieldSettings = settingsStore.getFields()
             # Update logger with new webhook settings
             pingSettings = {
                 "ping_critical_errors": self.setdat.get("ping_critical_errors", False),
@@ -582,11 +585,14 @@ class macro:
             # Update keyboard movespeed
             self.keyboard.movespeed = self.setdat["movespeed"]
             # Update haste compensation
-            self.hasteCompensation = HasteCompensationRevamped(self.robloxWindow, self.setdat["movespeed"])
-            self.keyboard.hasteCompensation = self.setdat["haste_compensation"]
-            self.keyboard.hasteCompensationObj = self.hasteCompensation
+            self.hasteCompensation = createHasteCompensation(self.hasteImplementation, self.robloxWindow, self.setdat["movespeed"])
+            self.keyboard.enableHasteCompensation = self.setdat["haste_compensation"]
+            self.keyboard.setHasteCompensation(self.hasteCompensation)
+            self.keyboard.hasteSampler.setRate(self.setdat.get("haste_sample_rate", 30))
             # Update hourly report time format
             self.hourlyReport.timeFormat = self.setdat.get("hourly_report_time_format", 24)
+            # Update ocr backend
+            ocr.ocrBackend.setPreferred(self.setdat.get("ocr_backend", "auto"))
             # Update collect cooldowns
             self.collectCooldowns = dict([(k, v[2]) for k,v in mergedCollectData.items()])
             self.collectCooldowns["sticker_printer"] = 1*60*60
@@ -707,65 +713,15 @@ class macro:
             #if np.mean = 0, no color ranges are detected, is day, hence return false
             return np.mean(mask)
         
-        def isNightSky(bgr):
-            y = 30*self.robloxWindow.multi
-            #crop the image to only the area above buff
-            bgr = bgr[0:y, 180*self.robloxWindow.multi:int(self.robloxWindow.mw)]
-            w,h = bgr.shape[:2]
-            #check if a 15x15 area that is entirely black
-            for x in range(w-15):
-                for y in range(h-15):
-                    area = bgr[x:x+15, y:y+15]
-                    if np.all(area == [0, 0, 0]):
-                        return True
-            return False
-        
-        #detect the color of the grass in fields
-        #useful when gathering
-        def isGrassNight(bgr):       
-            dayColors = [
-                [(47, 117, 57), cv2.getStructuringElement(cv2.MORPH_RECT, (6, 6))], #ground
-                [(46, 117, 58), cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9))], #dande
-                [(60, 156, 74), cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9))], #stump
-                [(38, 114, 51), cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9))], #pa
-                [(66, 123, 40), cv2.getStructuringElement(cv2.MORPH_RECT, (6, 6))], #clov
-                [(32, 211, 22), cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9))], #ant
-            ]
-
-            nightColors = [
-                [(23, 72, 30), cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))], #a
-                [(17, 71, 28), cv2.getStructuringElement(cv2.MORPH_RECT, (6, 6))], #dande
-            ]
-
-            bgr = bgr[0:bgr.shape[0]- (100*self.robloxWindow.multi)]
-            dayScreen = bgr[int(bgr.shape[0]*2/5):bgr.shape[0]].copy()
-            #detect day
-            for color, kernel in dayColors:
-                if findColorObjectRGB(dayScreen, color, variance=6, kernel=kernel, mode="box"):
-                    return False
-            #day not found, detect Night
-            nightScreen = bgr[int(bgr.shape[0]/2):bgr.shape[0]].copy()
-            for color, kernel in nightColors:
-                if findColorObjectRGB(nightScreen, color, variance=6, kernel=kernel, mode="box"):
-                    return True
-                
-            return False
-
         def isNight():
-            screen = mssScreenshotNP(self.robloxWindow.mx,self.robloxWindow.my, self.robloxWindow.mw, self.robloxWindow.mh)
-            # Convert the image from BGRA to HSV
-            bgr = cv2.cvtColor(screen, cv2.COLOR_BGRA2BGR)
-            hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
-
-            if self.converting:
-                nightDetected = isNightSky(bgr)
-            else:
-                nightDetected = isGrassNight(bgr)
+            #the detector works on the bgra frame directly, no colour conversion needed
+            screen = captureService.getRegion("window")
+            nightDetected, confidence = self.nightDetector.detect(screen, self.converting)
 
             #night detected
             if nightDetected:
                 self.nightDetectStreaks += 1
-                #self.logger.webhook("", f"Night Detected? ({self.nightDetectStreaks})", "red", "screen")
+                #self.logger.webhook("", f"Night Detected? ({self.nightDetectStreaks}, {confidence:.2f})", "red", "screen")
                 #im = Image.fromarray(cv2.cvtColor(screen, cv2.COLOR_BGR2RGB))
                 #im.save(f"night-{time.time()}.png")
             else: 
@@ -805,6 +761,7 @@ class macro:
         self.keyboard.keyUp("ctrl")
         self.keyboard.keyUp("f")
 
+    #returns a shared read-only template, see imageManipulation.adjustImage
     def adjustImage(self, path, imageName):
         return adjustImage(path, imageName, self.robloxWindow.display_type)
         
@@ -822,7 +779,7 @@ class macro:
             pyPath = f"{path}.py"
             #ensure that path exists
             if not fileMustExist and not os.path.isfile(pyPath): return
-            exec(open(pyPath).read())
+            exec(codeCache.get(pyPath))
 
     def getBackpack(self):
         return bpc(self.robloxWindow.mx+(self.robloxWindow.mw//2+59+3), self.robloxWindow.my+self.robloxWindow.yOffset+6)
@@ -884,8 +841,7 @@ class macro:
         return False
     
     def getTextBesideE(self):
-        img = mssScreenshot(self.robloxWindow.mx+(self.robloxWindow.mw//2-200), self.robloxWindow.my+self.robloxWindow.yOffset+34, 400, 140)
-        textRaw = ''.join([x[1][0] for x in ocr.ocrRead(img)]).lower()
+        textRaw = ''.join([x[1][0] for x in ocr.ocrReadArrayCached(captureService.getRegion("ebutton"), "ebutton")]).lower()
         return self.convertCyrillic(textRaw)
     
     def isBesideE(self, includeList = [], excludeList = [], log=False):
@@ -903,13 +859,11 @@ class macro:
     
     def isBesideEImage(self, name):
         template = self.adjustImage("./images/menu",name)
-        return locateTransparentImageOnScreen(template, self.robloxWindow.mx+(self.robloxWindow.mw//2-200), self.robloxWindow.my+self.robloxWindow.yOffset+34, 400, 140, 0.75)
+        return locationCache.search(("ebutton", name), template, captureService.getRegion("ebutton"), 0.75, locateTransparentImage, self.robloxWindow.version)
 
     def getTiming(self,name = None):
-        for _ in range(3):
-            data = settingsManager.readSettingsFile("./data/user/timings.txt")
-            if data: break #most likely another process is writing to the file
-            time.sleep(0.1)
+        #settings files are replaced atomically, so a read never sees a partially written file
+        data = settingsManager.readSettingsFile("./data/user/timings.txt")
         if name is not None:
             if not name in data:
                 print(f"could not find timing for {name}, setting a new one")
@@ -918,8 +872,9 @@ class macro:
             return data[name]
         return data
     
+    #the macro process is killed when it stops, so timings are written right away instead of after the debounce
     def saveTiming(self, name):
-        return settingsManager.saveSettingFile(name, time.time(), "./data/user/timings.txt")
+        return settingsManager.saveSettingFile(name, time.time(), "./data/user/timings.txt", immediate=True)
     #returns true if the cooldown is up
     #note that cooldown is in seconds
     def hasRespawned(self, name, cooldown, applyMobRespawnBonus = False, timing = None):
@@ -996,7 +951,8 @@ class macro:
         time.sleep(0.4)
         threshold = 0
         if detect or detectOnly: threshold = 0.75
-        res = locateImageOnScreen(yesImg, x, y, 580, 265, threshold)
+        screen = captureService.getRegion((x, y, 580, 265))
+        res = locationCache.search("yes", yesImg, screen, threshold, locateImageOnScreenArray, self.robloxWindow.version)
         if res is None: return False
         if detectOnly: return True
         bestX, bestY = [x//self.robloxWindow.multi for x in res[1]]
@@ -1105,7 +1061,7 @@ class macro:
             #most likely the correct item, stop searching
             if max_val > 0.7:
                 itemScreenshot = mssScreenshot(self.robloxWindow.mx+90, self.robloxWindow.my+(max_loc[1]//self.robloxWindow.multi)+60, 220, 60)
-                itemOCRText = ''.join([x[1][0] for x in ocr.ocrRead(itemScreenshot)]).replace(" ","").replace("-","").lower()
+                itemOCRText = ''.join([x[1][0] for x in ocr.ocrReadCached(itemScreenshot, "inventory")]).replace(" ","").replace("-","").lower()
                 if itemOCRName in itemOCRText or self.getStringSimilarity(itemOCRName, itemOCRText) > 0.7:
                     print(itemOCRText)
                     bestY = max_loc[1]
@@ -1801,7 +1757,7 @@ class macro:
                 time.sleep(1)
                 self.logger.webhook("",f'Claimed hive {newHiveNumber}', "bright green", "screen", ping_category="ping_critical_errors")
                 self.setdat["hive_number"] = newHiveNumber
-                settingsManager.saveGeneralSetting("hive_number", newHiveNumber)
+                settingsManager.saveGeneralSetting("hive_number", newHiveNumber, immediate=True)
                 for _ in range(8):
                     self.keyboard.press("o")
                 self.moveMouseToDefault()
@@ -1816,7 +1772,7 @@ class macro:
     
     def blueTextImageSearch(self, text, threshold=0.7):
         target = self.adjustImage("./images/blue", text)
-        return locateImageOnScreen(target, self.robloxWindow.mx+(self.robloxWindow.mw*3/4), self.robloxWindow.my+(self.robloxWindow.mh*3/5), self.robloxWindow.mw/4, self.robloxWindow.mh-self.robloxWindow.mh*3/5, threshold)
+        return locationCache.search(("blue", text), target, captureService.getRegion("blue"), threshold, locateImageOnScreenArray, self.robloxWindow.version)
     #background thread for gather
     #check if mobs have been killed and reset their timings
     #check if player died
@@ -1912,13 +1868,6 @@ class macro:
             tcfbkey = backkey
             afcfbkey = fwdkey
         facingcorner = 0
-        sizeData = {
-            "xs": 0.25,
-            "s": 0.5,
-            "m": 1,
-            "l": 1.5,
-            "xl": 2
-        }
         sizeword = fieldSetting["size"]
         size = sizeData[sizeword]
         width = fieldSetting["width"]
@@ -1930,7 +1879,10 @@ class macro:
         keepGathering = True
         self.died = False
         #time to gather
-        gatherNameSpace = {**locals(), **globals()}
+        patternPath = f"../settings/patterns/{pattern}.py"
+        #namespace of the pattern, rebuilt when the pattern is recompiled (see below)
+        patternCode = None
+        gatherNameSpace = {}
         self.set_task_status(f"gather_{field}", task="gather", field=field)
         self.isGathering = True
         firstPattern = True
@@ -2020,13 +1972,26 @@ class macro:
 
             #ensure that the pattern works
             try:
-                exec(open(f"../settings/patterns/{pattern}.py").read(), gatherNameSpace)
+                timeline = None
+                if self.setdat.get("timeline_patterns", False):
+                    timeline = getPatternTimeline(patternPath, size, width, sizeword, fieldSetting["invert_lr"], fieldSetting["invert_fb"])
+                if timeline is not None:
+                    self.timelineExecutor.play(timeline)
+                else:
+                    code = codeCache.get(patternPath)
+                    #only the names the pattern uses, instead of copying all of the globals
+                    #an edited pattern can use other names, so the namespace is rebuilt when the code object changes
+                    if code is not patternCode:
+                        gatherNameSpace = codeCache.namespace(patternPath, globals(), locals())
+                        patternCode = code
+                    exec(code, gatherNameSpace)
             except Exception as e:
                 print(traceback.format_exc())
                 if firstPattern:
                     self.logger.webhook("Incompatible pattern", f"The pattern {pattern} is incompatible with the macro. Defaulting to e_lol instead.\
                                         Avoid using this pattern in the future. If you are the creator of this pattern, the error can be found in terminal", "red")
                     pattern = "e_lol"
+                    patternPath = f"../settings/patterns/{pattern}.py"
             firstPattern = False
 
             #mob respawn check
@@ -2395,7 +2360,7 @@ class macro:
             self.logger.webhook("", f"No {egg} eggs left, Sticker Printer has been disabled", "red", "screen", ping_category="ping_critical_errors")
             self.updateGUI.value = 1
             self.setdat["sticker_printer"] = False
-            settingsManager.saveProfileSetting(f"sticker_printer", False)
+            settingsManager.saveProfileSetting(f"sticker_printer", False, immediate=True)
             self.keyboard.press("e")
             return
         #wait for sticker to generate
@@ -2775,7 +2740,7 @@ class macro:
             self.goToField(currField, "south")
             time.sleep(0.8)
             try:
-                exec(open(f"../paths/vic/find_vic/{currField}.py").read())
+                exec(codeCache.get(f"../paths/vic/find_vic/{currField}.py"))
             except VicStopPathException:
                 pass
             if self.vicField:
@@ -2806,7 +2771,7 @@ class macro:
         
         #run the dodge pattern
         #similar to the search pattern, between each line of code, check if vic has been defeated/player died
-        pathLines = open(f"../paths/vic/kill_vic/{self.vicField}.py").read().split("\n")
+        pathLines = codeCache.getLines(f"../paths/vic/kill_vic/{self.vicField}.py")
         loop = True
         self.died = False
         st = time.time() 
@@ -2983,7 +2948,7 @@ class macro:
         finalKey = None
         path = f"../paths/planters/{field}.py"
         if os.path.isfile(path): #not all fields have a planter path
-            exec(open(path).read())
+            exec(codeCache.get(path))
         #go to the planter
         if method == "collect": #return true if the planter can be found
             time.sleep(1)
@@ -3391,7 +3356,8 @@ class macro:
                     break
                 #update the quantity
                 quantity1Img = quantity2Img
-            quantity = ''.join([x[1][0] for x in ocr.ocrRead(mssScreenshot(self.robloxWindow.mx+(self.robloxWindow.mw/2-60-140), self.robloxWindow.my+(math.floor(self.robloxWindow.mh*0.48)+140-20), 110, 23*2))])
+            quantityImg = mssScreenshot(self.robloxWindow.mx+(self.robloxWindow.mw/2-60-140), self.robloxWindow.my+(math.floor(self.robloxWindow.mh*0.48)+140-20), 110, 23*2)
+            quantity = digitReader.read(whiteTextMask(np.array(quantityImg)), lambda: ''.join([x[1][0] for x in ocr.ocrRead(quantityImg)]))
             quantity = ''.join([x for x in quantity if x.isdigit()])
             if quantity:
                 quantity = int(quantity)
@@ -3592,12 +3558,9 @@ class macro:
             self.backgroundOnce()
             time.sleep(1)
 
-    def getHoney(self):
-        cap = mssScreenshot(self.robloxWindow.mx+(self.robloxWindow.mw//2-241), self.robloxWindow.my+self.robloxWindow.yOffset+5, 140, 36)
-        ocrres = ocr.ocrFunc(cap)
+    def parseHoney(self, result):
         honey = ""
         try:
-            result = ''.join([x[1][0] for x in ocrres])
             for i in result:
                 if i == "(" or i == "+":
                     break
@@ -3609,6 +3572,57 @@ class macro:
             print(honey)
         return honey if honey else 0
 
+    def getHoney(self):
+        screen = captureService.getRegion("honey")
+        def readWithOCR():
+            return ''.join([x[1][0] for x in ocr.ocrReadArrayCached(screen, "honey")])
+        return self.parseHoney(digitReader.read(whiteTextMask(screen), readWithOCR))
+
+    #same as getHoney, but the ocr (if needed) runs in the ocr pool. Returns a future of the honey
+    def getHoneyAsync(self):
+        screen = np.array(captureService.getRegion("honey"))
+        mask = whiteTextMask(screen)
+        text = digitReader.read(mask)
+        out = Future()
+        if text:
+            out.set_result(self.parseHoney(text))
+            return out
+        def done(future):
+            try:
+                text = ''.join([x[1][0] for x in future.result()])
+                digitReader.learn(digitReader.segment(mask), text)
+                out.set_result(self.parseHoney(text))
+            except Exception as e:
+                out.set_exception(e)
+        ocrPool.submit(screen).add_done_callback(done)
+        return out
+
+    #stats of the caches, pools and timing systems, for checking the macro's performance
+    def getPerformanceStats(self):
+        return {
+            "time": time.time(),
+            "capture": captureService.getStats(),
+            "template_registry": templateRegistry.getStats(),
+            "ocr_cache": ocrCache.getStats(),
+            "digit_reader": digitReader.getStats(),
+            "ocr_pool": ocrPool.getStats(),
+            "ocr_backend": ocr.ocrBackend.getStats(),
+            "haste_sampler": self.keyboard.hasteSampler.getStats(),
+            "movement_timing": self.keyboard.movementTimer.getStats(),
+            "code_cache": codeCache.getStats(),
+            "timeline_executor": self.timelineExecutor.getStats(),
+            "field_drift_compensation": self.fieldDriftCompensation.getStats(),
+            "settings_store": settingsStore.getStats(),
+            "settings_writer": settingsManager.settingsWriter.getStats(),
+            "location_cache": locationCache.getStats(),
+        }
+
+    #saved with the hourly report when the performance_stats setting is enabled
+    def savePerformanceStats(self, path="./data/user/performance_stats.json"):
+        with open(path, "w") as f:
+            json.dump(self.getPerformanceStats(), f, indent=2, default=str)
+        print(f"Performance stats saved to {path}")
+
     def hourlyReportBackgroundOnce(self):
         try:
             currMin = datetime.now().minute
@@ -3618,6 +3632,10 @@ class macro:
             if currMin == 0 and time.time() - self.lastHourlyReport > 120:
                 hourlyReportData = self.hourlyReport.generateHourlyReport(self.setdat)
                 self.logger.hourlyReport("Hourly Report", "", "purple")
+                if digitReader.unsaved:
+                    digitReader.save()
+                if self.setdat.get("performance_stats", False):
+                    self.savePerformanceStats()
 
                 #add to history
                 with open("data/user/hourly_report_history.txt", "r") as f:
@@ -3647,73 +3665,27 @@ class macro:
                 #instead of using time.sleep, we want to run the code at the start of the min
                 if currMin != self.prevMin:
                     self.prevMin = currMin
-                    honey = self.getHoney()
-                    print(honey)
+                    #the honey is read in the ocr pool, so this thread can keep handling the hotbar
+                    self.honeyFuture = self.getHoneyAsync()
                     backpack = self.getBackpack()
 
-                    self.hourlyReport.addHourlyStat("honey_per_min", honey)
                     self.hourlyReport.addHourlyStat("backpack_per_min", backpack)
 
+                if self.honeyFuture is not None and self.honeyFuture.done():
+                    honeyFuture, self.honeyFuture = self.honeyFuture, None
+                    honey = honeyFuture.result()
+                    print(honey)
+                    self.hourlyReport.addHourlyStat("honey_per_min", honey)
+
             if self.status.value != "rejoining" and not currSec%6 and currSec != self.prevSec:
                 i = (60*currMin + currSec)//6
-                screen = cv2.cvtColor(self.buffDetector.screenshotBuffArea(), cv2.COLOR_BGRA2BGR)
-                height, width = screen.shape[:2]
-                uptimeBuffsColors = self.hourlyReport.uptimeBuffsColors
-                uptimeBearBuffs = self.hourlyReport.uptimeBearBuffs
-
-                for j in ["baby_love"]:
-                    if self.buffDetector.detectBuffColorInImage(screen, uptimeBuffsColors[j][0], uptimeBuffsColors[j][1], y1=30*self.multi, searchDirection=7):
-                        self.hourlyReport.uptimeBuffsValues[j][i] = 1
-
-                bearBuffRes = [int(x) for x in self.buffDetector.getBuffsWithImage(uptimeBearBuffs, screen=screen, threshold=0.78)]
-                if any(bearBuffRes):
-                    self.hourlyReport.uptimeBuffsValues["bear"][i] = 1
-
-                for j in ["focus", "bomb_combo", "balloon_aura", "inspire"]:
-                    res = self.buffDetector.detectBuffColorInImage(screen, uptimeBuffsColors[j][0], uptimeBuffsColors[j][1], y1=30*self.multi, y2=50*self.multi, searchDirection=7)
-                    if res:
-                        x = res[0]+res[2]
-                        x1 = max(0, int(x-25*self.multi))
-                        x2 = min(width, int(x+5*self.multi))
-                        buffImg = screen[15*self.multi:50*self.multi , x1:x2]
-                        self.hourlyReport.uptimeBuffsValues[j][i] = int(self.buffDetector.getBuffQuantityFromImgTight(buffImg))
-
-                x = 0
-                for _ in range(3):
-                    res = self.buffDetector.detectBuffColorInImage(screen, uptimeBuffsColors["haste"][0], uptimeBuffsColors["haste"][1],x, 30*self.multi, searchDirection=6)
-                    if not res:
-                        break
-                    x = res[0]
-                    if self.buffDetector.detectBuffColorInImage(screen, uptimeBuffsColors["melody"][0], uptimeBuffsColors["melody"][1], x+2*self.multi, 30, x+34*self.multi, 40*self.multi, 12):
-                        self.hourlyReport.uptimeBuffsValues["melody"][i] = 1
-                    elif not self.hourlyReport.uptimeBuffsValues["haste"][i]:
-                        x1 = max(0, int(x+6*self.multi))
-                        x2 = min(width, int(x+44*self.multi))
-                        buffImg = screen[15*self.multi:50*self.multi , x1:x2]
-                        self.hourlyReport.uptimeBuffsValues["haste"][i] = int(self.buffDetector.getBuffQuantityFromImgTight(buffImg))
-                    x += 44*self.multi
-                #print(bd.detectBuffColorInImage(screen, 0xff242424, variation=12, minSize=(3*2,2*2), show=True))
-
-                x = screen.shape[1]
-                for _ in range(3):
-                    res = self.buffDetector.detectBuffColorInImage(screen, uptimeBuffsColors["boost"][0], uptimeBuffsColors["boost"][1], y1=30*self.multi, x2=x, searchDirection=7)
-                    if not res:
-                        break
-                    x = res[0]+res[2]
-                    y = res[1] + res[3]
-
-                    if len(self.buffDetector.detectBuffColorInImage(screen, uptimeBuffsColors["red_boost"][0], uptimeBuffsColors["red_boost"][1], x-30*self.multi, 15*self.multi, x-4*self.multi, 34*self.multi, 20)):
-                        buffType = "red_boost"
-                    elif len(self.buffDetector.detectBuffColorInImage(screen, uptimeBuffsColors["blue_boost"][0], uptimeBuffsColors["blue_boost"][1], x-30*self.multi, 15*self.multi, x-4*self.multi, 34*self.multi, 20)):
-                        buffType = "blue_boost"
-                    else:
-                        buffType = "white_boost"
-
-                    x1 = max(0, x-25*self.multi)
-                    buffImg = screen[15*self.multi: 50*self.multi, x1: x]
-                    self.hourlyReport.uptimeBuffsValues[buffType][i] = int(self.buffDetector.getBuffQuantityFromImgTight(buffImg))
-
-                    x -= 40*self.multi
+                #read every buff from one screenshot
+                snapshot = self.buffBarParser.parse()
+                for buff, value in snapshot.items():
+                    #only the first haste (that isnt melody) is counted
+                    if buff == "haste" and self.hourlyReport.uptimeBuffsValues["haste"][i]:
+                        continue
+                    self.hourlyReport.uptimeBuffsValues[buff][i] = value
                 
                 self.prevSec = currSec
 
@@ -3800,7 +3772,7 @@ class macro:
         for i in range(150):
             screen = screenshotQuest(800, mode="RGBA")
 
-            res = bitmap_matcher.find_bitmap_cython(screen, questGiverImg, variance=5, h=250)
+            res = locationCache.searchBitmap(("quest", questGiver), screen, questGiverImg, self.robloxWindow.version, variance=5, h=250)
             if res:
                 rx, ry = res
                 rw, rh = questGiverImg.size
@@ -3980,7 +3952,7 @@ class macro:
             return screen
 
         def processScreenshotForObjectives(screen):
-            """Process a single screenshot for quest objectives"""
+            """Find the text chunks in a screenshot and start reading them in the ocr pool. Returns a future of the ocr results"""
             screenGray = cv2.cvtColor(screen, cv2.COLOR_BGR2GRAY)
             img = cv2.inRange(screenGray, 0, 50)
             img = cv2.GaussianBlur(img, (5, 5), 0)
@@ -3996,17 +3968,24 @@ class macro:
             maxArea = 40000*self.robloxWindow.multi     # Too big = background or large UI elements
             maxHeight = 75*self.robloxWindow.multi       # Cap height to filter out title bar
 
-            objectives = []
+            textImgs = []
             for contour in contours[::-1]:
                 x, y, w, h = cv2.boundingRect(contour)
                 # Check if contour meets size requirements
                 area = w*h
                 if area < minArea or area > maxArea or h > maxHeight:
                     continue
+                textImgs.append(screen[y:y+h, x:x+w])
+
+            # All chunks are read in one batch, while the quest list keeps scrolling
+            return ocrPool.submitBatch(textImgs)
 
-                textImg = Image.fromarray(screen[y:y+h, x:x+w])
+        def getObjectivesFromOCR(ocrResults):
+            """Convert the ocr results of the text chunks to quest objectives"""
+            objectives = []
+            for lines in ocrResults:
                 textChunk = []
-                for line in ocr.ocrRead(textImg):
+                for line in lines:
                     textChunk.append(self.convertCyrillic(line[1][0].strip().lower()))
                 textChunk = ''.join(textChunk)
 
@@ -4061,6 +4040,7 @@ class macro:
         # Scroll through quest list slowly, capturing screenshots
         self.logger.webhook("Quest Completer", "Scanning quest objectives...", "light blue")
         allObjectives = set()  # Use set to avoid duplicates
+        pendingObjectives = []  # ocr futures of each screenshot
         scrollStep = 50  # Scroll amount per step
         screenshotInterval = 3  # Take screenshot every N scroll steps
         maxScrollSteps = 100  # Maximum scroll steps to prevent infinite loop
@@ -4094,8 +4074,7 @@ class macro:
                 screen = screen[endIndex:, :]
 
             # Process this screenshot for objectives
-            objectives = processScreenshotForObjectives(screen)
-            allObjectives.update(objectives)
+            pendingObjectives.append(processScreenshotForObjectives(screen))
 
             # Scroll down
             mouse.scroll(-scrollStep)
@@ -4112,6 +4091,9 @@ class macro:
         self.toggleQuest()
         self.moveMouseToDefault()
 
+        for future in pendingObjectives:
+            allObjectives.update(getObjectivesFromOCR(future.result()))
+
         self.logger.webhook("Quest Completer", f"Quest scanning complete. Found {len(allObjectives)} unique objectives.", "light blue")
         return list(allObjectives)
 
@@ -4704,7 +4686,7 @@ class macro:
         self.moveMouseToDefault()
 
     def saveAFB(self, name):
-        return settingsManager.saveSettingFile(name, time.time(), "./data/user/AFB.txt")
+        return settingsManager.saveSettingFile(name, time.time(), "./data/user/AFB.txt", immediate=True)
     
     def getAFBtiming(self,name = None):
         for _ in range(3):
@@ -5039,9 +5021,19 @@ class macro:
         self.nightDetectStreaks = 0
         self.hourlyReport.loadHourlyReportData()
         self.prevMin = -1  
+        self.honeyFuture = None
         self.prevSec = -1
         self.multi = self.robloxWindow.multi
         self.lastHourlyReport = 0
+        #load the ocr model in the ocr pool before the first request
+        ocrPool.warmUp()
+        #compile the patterns and paths now, so a broken one is reported before it is needed
+        #patterns can use the gather function's variables and the globals
+        brokenScripts = {**codeCache.validateFolder("../settings/patterns", set(globals()) | set(self.gather.__code__.co_varnames)), **codeCache.validateFolder("../paths")}
+        for path, error in brokenScripts.items():
+            print(f"{path}: {error}")
+        if brokenScripts:
+            self.logger.webhook("Broken patterns/paths", "\n".join(f"{os.path.basename(x)}: {e}" for x, e in brokenScripts.items()), "red")
 
         if self.setdat["low_performance"]:
             mergedBackgroundThread = threading.Thread(target=self.mergedBackgrounds, daemon=True)
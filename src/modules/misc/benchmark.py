@@ -0,0 +1,53 @@
+import time
+
+'''
+Small helpers shared by the benchmark functions
+'''
+
+def percentile(values, p):
+    if not values:
+        return 0
+    values = sorted(values)
+    k = (len(values)-1) * p/100
+    f = int(k)
+    c = min(f+1, len(values)-1)
+    return values[f] + (values[c]-values[f]) * (k-f)
+
+def summarize(durations):
+    return {
+        "runs": len(durations),
+        "mean_ms": sum(durations)/max(1, len(durations))*1000,
+        "p50_ms": percentile(durations, 50)*1000,
+        "p95_ms": percentile(durations, 95)*1000,
+        "min_ms": min(durations)*1000 if durations else 0,
+    }
+
+#time a function over multiple runs. Returns the summary and the output of the last call
+def timeCall(func, runs=100, warmup=3):
+    for _ in range(warmup):
+        func()
+    durations = []
+    out = None
+    for _ in range(runs):
+        st = time.perf_counter()
+        out = func()
+        durations.append(time.perf_counter()-st)
+    return summarize(durations), out
+
+#format a list of dicts as a text table
+def formatTable(rows, columns=None):
+    if not rows:
+        return ""
+    if columns is None:
+        columns = list(rows[0].keys())
+    def fmt(v):
+        if isinstance(v, float):
+            return f"{v:.3f}"
+        return str(v)
+    cells = [[fmt(r.get(c, "")) for c in columns] for r in rows]
+    widths = [max(len(c), *(len(row[i]) for row in cells)) for i, c in enumerate(columns)]
+    lines = [" | ".join(c.ljust(widths[i]) for i, c in enumerate(columns))]
+    lines.append("-+-".join("-"*w for w in widths))
+    for row in cells:
+        lines.append(" | ".join(v.ljust(widths[i]) for i, v in enumerate(row)))
+    return "\n".join(lines)
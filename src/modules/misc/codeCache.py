@@ -0,0 +1,126 @@
+import builtins
+import dis
+import os
+import threading
+
+class CodeCache:
+    '''
+    Compiled gather patterns and path scripts, so they aren't read and compiled every time they run.
+    Entries are keyed by path and checked against the file's mtime and size (one os.stat) on every use,
+    so an edited file is recompiled the next time it runs. A file that fails to compile keeps raising the
+    same error until it is changed.
+    '''
+
+    def __init__(self):
+        self.entries = {} #path: (mtime_ns, size, code or exception)
+        self.lineEntries = {} #path: (mtime_ns, size, [code of each line])
+        self._lock = threading.Lock()
+
+        #stats
+        self.hits = 0
+        self.compiles = 0
+
+    def _compile(self, path):
+        with open(path, "r") as f:
+            source = f.read()
+        self.compiles += 1
+        try:
+            return compile(source, path, "exec")
+        except SyntaxError as e:
+            return e
+
+    #code object of a script. Raises OSError if the file doesn't exist and SyntaxError if it doesn't compile
+    def get(self, path):
+        st = os.stat(path)
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            self.hits += 1
+            code = entry[2]
+        else:
+            code = self._compile(path)
+            with self._lock:
+                self.entries[path] = (st.st_mtime_ns, st.st_size, code)
+        if isinstance(code, SyntaxError):
+            raise code
+        return code
+
+    #code objects of each line of a script, for scripts that are run line by line (eg vic's dodge patterns)
+    def getLines(self, path):
+        st = os.stat(path)
+        entry = self.lineEntries.get(path)
+        if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            self.hits += 1
+            return entry[2]
+        with open(path, "r") as f:
+            lines = f.read().split("\n")
+        self.compiles += 1
+        codes = [compile(line, path, "exec") for line in lines]
+        with self._lock:
+            self.lineEntries[path] = (st.st_mtime_ns, st.st_size, codes)
+        return codes
+
+    #global names the code reads, including in the functions it defines
+    def getNames(self, code):
+        names = set(code.co_names)
+        for const in code.co_consts:
+            if hasattr(const, "co_names"):
+                names |= self.getNames(const)
+        return names
+
+    #namespace with only the names the script uses, looked up in the given scopes (first match wins)
+    def namespace(self, path, *scopes):
+        out = {}
+        for name in self.getNames(self.get(path)):
+            for scope in scopes:
+                if name in scope:
+                    out[name] = scope[name]
+                    break
+        return out
+
+    #names the script reads but never defines, and that are not in available (or builtins)
+    def undefinedNames(self, path, available):
+        loaded = set()
+        stored = set()
+        def walk(code):
+            for ins in dis.get_instructions(code):
+                if ins.opname in ("LOAD_NAME", "LOAD_GLOBAL"):
+                    loaded.add(ins.argval)
+                elif ins.opname in ("STORE_NAME", "STORE_GLOBAL", "IMPORT_NAME"):
+                    stored.add(ins.argval)
+            for const in code.co_consts:
+                if hasattr(const, "co_code"):
+                    walk(const)
+        walk(self.get(path))
+        return sorted(x for x in loaded - stored - set(available) if not hasattr(builtins, x))
+
+    #compile every .py file in a folder (recursively), so a broken one is found before it is needed
+    #available: if set, also report names that are not defined for the scripts
+    #returns {path: error message}
+    def validateFolder(self, folder, available=None):
+        errors = {}
+        for root, _, files in os.walk(folder):
+            for file in sorted(files):
+                if not file.endswith(".py"):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    self.get(path)
+                    if available is not None:
+                        undefined = self.undefinedNames(path, available)
+                        if undefined:
+                            errors[path] = f"undefined names: {', '.join(undefined)}"
+                except SyntaxError as e:
+                    errors[path] = f"line {e.lineno}: {e.msg}"
+                except (OSError, UnicodeDecodeError) as e:
+                    errors[path] = str(e)
+        return errors
+
+    def getStats(self):
+        return {
+            "scripts": len(self.entries) + len(self.lineEntries),
+            "hits": self.hits,
+            "compiles": self.compiles,
+        }
+
+#shared by the gather patterns and paths
+codeCache = CodeCache()
@@ -0,0 +1,32 @@
+#field data shared by the macro and the offline tools (eg the pattern simulator)
+
+#the field dimensions taken from natro
+#[length, width]
+startLocationDimensions = {
+    "sunflower": [1250, 2000],
+    "dandelion": [2500, 1000],
+    "mushroom": [1250, 1750],
+    "blue flower": [2750, 750],
+    "clover": [2000, 1500],
+    "strawberry": [1500, 2000],
+    "spider": [2000, 2000],
+    "bamboo": [3000, 1250],
+    "pineapple": [1750, 3000],
+    "stump": [1500, 1500],
+    "cactus": [1500, 2500],
+    "pumpkin": [1500, 2500],
+    "pine tree": [2500, 1700],
+    "rose": [2500, 1500],
+    "mountain top": [2250, 1500],
+    "pepper": [1500, 2250],
+    "coconut": [1500, 2250]
+}
+
+#pattern size setting: multiplier passed to the gather patterns as size
+sizeData = {
+    "xs": 0.25,
+    "s": 0.5,
+    "m": 1,
+    "l": 1.5,
+    "xl": 2
+}
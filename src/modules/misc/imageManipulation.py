@@ -3,6 +3,8 @@ import cv2
 import os
 from PIL import Image
 import imagehash
+import threading
+from collections import OrderedDict
 #accept a pillow image and return a cv2 one
 def pillowToCv2(img):
     return cv2.cvtColor(np.array(img), cv2.COLOR_BGR2RGB)
@@ -10,20 +12,7 @@ def pillowToCv2(img):
 def pillowToHash(img):
     return imagehash.average_hash(img)
 
-#resize the image based on the user's screen coordinates
-def adjustImage(folder, imageName, display_type):
-    #get a list of all images and find the name of the one that matches
-    images = os.listdir(folder)
-    for x in images:
-        #images are named in the format itemname-width
-        #width is the width of the monitor used to take the image
-        if not "-" in x: continue
-        name, res = x.split(".")[0].split("-",1)
-        if name == imageName:
-            img = Image.open(f"{folder}/{x}")
-            break
-    else:
-        raise FileNotFoundError(f"Could not find the image named {imageName} in {folder}")
+def scaleTemplate(img, res, display_type):
     #get original size of image
     width, height = img.size
     #calculate the scaling value 
@@ -35,6 +24,111 @@ def adjustImage(folder, imageName, display_type):
     else: #screen is retina but image is built-in
         scaling = 0.5
     #resize image
-    img = img.resize((int(width/scaling), int(height/scaling)))
-    #convert to cv2
-    return pillowToCv2(img)
\ No newline at end of file
+    return img.resize((int(width/scaling), int(height/scaling)))
+
+class TemplateRegistry:
+    '''
+    Process wide store of the template images.
+    Each folder is indexed once (instead of calling os.listdir on every lookup) and images are only decoded when first requested.
+    Decoded and scaled templates are kept in memory, up to maxSize entries (least recently used are dropped first).
+
+    Forms:
+        bgr: same output as adjustImage
+        gray: bgr converted the same way locateTransparentImage converts its target
+        mask: alpha channel of the template (None if the image has no transparency)
+    '''
+    def __init__(self, maxSize=256):
+        self.maxSize = maxSize
+        self.index = {} #folder: {name: [(res, path)]}
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normFolder(folder):
+        return os.path.normpath(os.path.abspath(folder))
+
+    def indexFolder(self, folder):
+        files = {}
+        for x in sorted(os.listdir(folder)):
+            #images are named in the format itemname-width
+            #width is the width of the monitor used to take the image
+            if not "-" in x or not x.lower().endswith(".png"): continue
+            name, res = x.split(".")[0].split("-",1)
+            files.setdefault(name, []).append((res, os.path.join(folder, x)))
+        self.index[self.normFolder(folder)] = files
+        return files
+
+    #index every folder with templates in it. Called once at startup
+    def indexAll(self, root="./images"):
+        for dirPath, _, files in os.walk(root):
+            if any(x.endswith(".png") for x in files):
+                self.indexFolder(dirPath)
+
+    def findFile(self, folder, imageName, display_type):
+        files = self.index.get(self.normFolder(folder))
+        if files is None:
+            files = self.indexFolder(folder)
+        if imageName not in files:
+            raise FileNotFoundError(f"Could not find the image named {imageName} in {folder}")
+        variants = files[imageName]
+        #prefer an image taken on the same display type so it does not need to be scaled
+        for res, path in variants:
+            if res == display_type:
+                return res, path
+        return variants[0]
+
+    def load(self, folder, imageName, display_type, form):
+        if form == "gray":
+            return cv2.cvtColor(self.get(folder, imageName, display_type), cv2.COLOR_RGB2GRAY)
+        res, path = self.findFile(folder, imageName, display_type)
+        img = scaleTemplate(Image.open(path), res, display_type)
+        if form == "mask":
+            if img.mode == "P": img = img.convert("RGBA")
+            if "A" not in img.getbands():
+                return None
+            return np.array(img.getchannel("A"))
+        return pillowToCv2(img)
+
+    def get(self, folder, imageName, display_type, form="bgr"):
+        key = (self.normFolder(folder), imageName, display_type, form)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self.cache[key]
+        img = self.load(folder, imageName, display_type, form)
+        #templates are shared, dont let callers modify them
+        if img is not None:
+            img.flags.writeable = False
+        with self.lock:
+            self.misses += 1
+            self.cache[key] = img
+            while len(self.cache) > self.maxSize:
+                self.cache.popitem(last=False)
+        return img
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.index = {}
+
+    def getStats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits/total if total else 0,
+            "cached": len(self.cache),
+            "folders": len(self.index)
+        }
+
+templateRegistry = TemplateRegistry()
+
+#resize the image based on the user's screen coordinates
+#templates are loaded through the registry, so they are only read from disk once
+#the returned array is shared with every other caller and is read-only. Callers that need to modify it (eg draw on it,
+#convert it in place) must use adjustImage(...).copy()
+def adjustImage(folder, imageName, display_type):
+    return templateRegistry.get(folder, imageName, display_type)
@@ -6,6 +6,7 @@ import zipfile
 import tempfile
 from datetime import datetime
 import re
+from modules.misc.settingsWriter import SettingsWriter
 
 #returns a dictionary containing the settings
 profileName = "a"
@@ -252,12 +253,11 @@ def duplicateProfile(source_name, new_name):
     except Exception as e:
         return False, f"Failed to duplicate profile: {str(e)}"
 
-def readSettingsFile(path):
+#parse the contents of a settings file to a dict
+def parseSettings(raw):
     #get each line
-    #read the file, format it to:
+    #format it to:
     #[[key, value], [key, value]]
-    with open(path) as f:
-        raw = f.read()
 
     # If `max_convert_time=` was accidentally concatenated onto the previous line,
     # insert a newline before it so it becomes its own setting line.
@@ -278,31 +278,39 @@ def readSettingsFile(path):
             out[k] = v
     return out
 
-def saveDict(path, data):
+def formatSettings(data):
     out = "\n".join([f"{k}={v}" for k,v in data.items()])
     # Ensure file ends with a newline to avoid accidental concatenation
     if not out.endswith("\n"):
         out = out + "\n"
-    with open(path, "w") as f:
-        f.write(out)
+    return out
+
+#changes to settings files are batched and written atomically by the settings writer
+settingsWriter = SettingsWriter(parseSettings, formatSettings, os.path.join(getProjectRoot(), "src", "data", "user", "settings.lock"))
+
+#read a settings file, including the changes that are not written yet
+def readSettingsFile(path):
+    with open(path) as f:
+        raw = f.read()
+    return settingsWriter.overlay(path, parseSettings(raw))
+
+#write all settings of a file now
+def saveDict(path, data):
+    settingsWriter.replace(path, data)
 
 #update one property of a setting
-def saveSettingFile(setting,value, path):
-    #get the dictionary
-    data = readSettingsFile(path)
-    #update the dictionary
-    data[setting] = value
-    #write it
-    saveDict(path, data)
+#immediate: write it now instead of after the debounce. Used by the macro process, which is killed when it stops
+def saveSettingFile(setting,value, path, immediate=False):
+    settingsWriter.set(path, setting, value)
+    if immediate:
+        try:
+            settingsWriter.flush()
+        except OSError as e:
+            #the change stays queued and the writer retries it with a backoff
+            print(f"Could not save {setting} now, retrying in the background: {e}")
 
 def removeSettingFile(setting, path):
-    #get the dictionary
-    data = readSettingsFile(path)
-    #remove the setting if it exists
-    if setting in data:
-        del data[setting]
-        #write it back
-        saveDict(path, data)
+    settingsWriter.remove(path, setting)
 
 def loadFields():
     fields_path = os.path.join(getProfilePath(), "fields.txt")
@@ -416,56 +424,49 @@ def getAvailablePatterns():
         return [f.replace(".py", "") for f in os.listdir(patterns_dir) if f.endswith(".py")]
     return []
 
-def syncFieldSettings(setting, value):
+def syncFieldSettings(setting, value, immediate=False):
     """Synchronize field settings from profile to general settings"""
     try:
         # Update the general settings file
         generalSettingsPath = os.path.join(getProfilePath(), "generalsettings.txt")
-        generalData = readSettingsFile(generalSettingsPath)
-        generalData[setting] = value
-        saveDict(generalSettingsPath, generalData)
+        saveSettingFile(setting, value, generalSettingsPath, immediate)
     except Exception as e:
         print(f"Warning: Could not sync field settings to general settings: {e}")
 
-def syncFieldSettingsToProfile(setting, value):
+def syncFieldSettingsToProfile(setting, value, immediate=False):
     """Synchronize field settings from general to profile settings"""
     try:
         # Update the profile settings file
         profileSettingsPath = os.path.join(getProfilePath(), "settings.txt")
-        profileData = readSettingsFile(profileSettingsPath)
-        profileData[setting] = value
-        saveDict(profileSettingsPath, profileData)
+        saveSettingFile(setting, value, profileSettingsPath, immediate)
     except Exception as e:
         print(f"Warning: Could not sync field settings to profile settings: {e}")
 
-def saveProfileSetting(setting, value):
+def saveProfileSetting(setting, value, immediate=False):
     settings_path = os.path.join(getProfilePath(), "settings.txt")
-    saveSettingFile(setting, value, settings_path)
+    saveSettingFile(setting, value, settings_path, immediate)
     # Synchronize field settings with general settings
     if setting in ["fields", "fields_enabled"]:
-        syncFieldSettings(setting, value)
+        syncFieldSettings(setting, value, immediate)
 
 def saveDictProfileSettings(dict):
     settings_path = os.path.join(getProfilePath(), "settings.txt")
-    saveDict(settings_path, {**readSettingsFile(settings_path), **dict})
+    for k, v in dict.items():
+        saveSettingFile(k, v, settings_path)
 
 #increment a setting, and return the dictionary for the setting
+#the increment is done under the settings file lock, so increments from other processes aren't lost. It is written right away
 def incrementProfileSetting(setting, incrValue):
-    #get the dictionary
     settings_path = os.path.join(getProfilePath(), "settings.txt")
-    data = readSettingsFile(settings_path)
-    #update the dictionary
-    data[setting] += incrValue
-    #write it
-    saveDict(settings_path, data)
-    return data
-
-def saveGeneralSetting(setting, value):
+    settingsWriter.update(settings_path, setting, lambda value: value + incrValue, 0)
+    return readSettingsFile(settings_path)
+
+def saveGeneralSetting(setting, value, immediate=False):
     generalsettings_path = os.path.join(getProfilePath(), "generalsettings.txt")
-    saveSettingFile(setting, value, generalsettings_path)
+    saveSettingFile(setting, value, generalsettings_path, immediate)
     # Synchronize field settings with profile settings
     if setting in ["fields", "fields_enabled"]:
-        syncFieldSettingsToProfile(setting, value)
+        syncFieldSettingsToProfile(setting, value, immediate)
 
 def removeGeneralSetting(setting):
     generalsettings_path = os.path.join(getProfilePath(), "generalsettings.txt")
@@ -474,15 +475,16 @@ def removeGeneralSetting(setting):
 def loadSettings():
     settings_path = os.path.join(getProfilePath(), "settings.txt")
     default_settings_path = os.path.join(getDefaultSettingsPath(), "settings.txt")
+    #the defaults are optional, the hardcoded fields below are used without them
+    defaultSettings = readSettingsFile(default_settings_path) if os.path.exists(default_settings_path) else {}
     try:
         settings = readSettingsFile(settings_path)
     except FileNotFoundError:
         print(f"Warning: Profile '{profileName}' settings file not found, using defaults")
         # Fall back to default settings if profile file is missing
-        settings = readSettingsFile(default_settings_path)
+        settings = dict(defaultSettings)
 
     # Ensure fields and fields_enabled arrays have 5 elements
-    defaultSettings = readSettingsFile(default_settings_path)
     defaultFields = defaultSettings.get("fields", ['pine tree', 'sunflower', 'dandelion', 'pine tree', 'sunflower'])
     defaultFieldsEnabled = defaultSettings.get("fields_enabled", [True, False, False, False, False])
     
@@ -505,20 +507,8 @@ def loadSettings():
     
     return settings
 
-#return a dict containing all settings except field (general, profile, planters)
-def loadAllSettings():
-    # Auto-migrate profiles to have their own generalsettings.txt files
-    migrateProfilesToGeneralSettings()
-
-    generalsettings_path = os.path.join(getProfilePath(), "generalsettings.txt")
-    try:
-        generalSettings = readSettingsFile(generalsettings_path)
-    except FileNotFoundError:
-        # Fall back to global generalsettings if profile-specific one doesn't exist
-        print(f"Warning: Profile '{profileName}' generalsettings file not found, using global generalsettings")
-        generalSettings = readSettingsFile(generalsettings_path)
-
-    # Migrate old boolean flags to new macro_mode setting
+#migrate old boolean flags (field_only_mode, quest_only_mode) to the macro_mode setting, and save the general settings if they changed
+def migrateMacroMode(generalSettings, generalsettings_path):
     migrated = False
     field_only = generalSettings.get("field_only_mode", False)
     quest_only = generalSettings.get("quest_only_mode", False)
@@ -548,6 +538,21 @@ def loadAllSettings():
             saveDict(generalsettings_path, generalSettings)
             print("Migrated old field_only_mode/quest_only_mode settings to new macro_mode setting")
 
+#return a dict containing all settings except field (general, profile, planters)
+def loadAllSettings():
+    # Auto-migrate profiles to have their own generalsettings.txt files
+    migrateProfilesToGeneralSettings()
+
+    generalsettings_path = os.path.join(getProfilePath(), "generalsettings.txt")
+    try:
+        generalSettings = readSettingsFile(generalsettings_path)
+    except FileNotFoundError:
+        # Fall back to global generalsettings if profile-specific one doesn't exist
+        print(f"Warning: Profile '{profileName}' generalsettings file not found, using global generalsettings")
+        generalSettings = readSettingsFile(generalsettings_path)
+
+    migrateMacroMode(generalSettings, generalsettings_path)
+
     return {**loadSettings(), **generalSettings}
 
 def initializeFieldSync():
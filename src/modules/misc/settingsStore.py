@@ -0,0 +1,181 @@
+import copy
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+from modules.misc import settingsManager
+
+#settings: general and profile settings (what loadAllSettings returns). fields: field settings (what loadFields returns)
+#both are read-only views. Use SettingsStore.get/getFields for copies that can be changed
+SettingsSnapshot = namedtuple("SettingsSnapshot", ["version", "profile", "settings", "fields"])
+
+#(mtime_ns, size) of a file, or None if it doesn't exist
+def fileKey(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+class SettingsStore:
+    '''
+    Settings of the current profile, kept in memory instead of being read from the files every time they are needed.
+    refresh() checks the mtime and size of the profile's files (at most every pollInterval seconds) and only re-reads the
+    files that changed. Each change publishes a new snapshot with a higher version, and calls the subscribers with the
+    setting keys and field names that changed.
+    A profile switched in another process (eg the gui) is picked up from current_profile.txt.
+    Changes queued by this process in the settings writer are visible on the next refresh, before they are written.
+    The profile migrations run once per profile, when the store first loads it
+    '''
+
+    def __init__(self, pollInterval=0.5):
+        self.pollInterval = pollInterval
+        self._lock = threading.RLock()
+        self.snapshot = None
+        self.profile = None
+        self.keys = {} #name: fileKey of the file when it was last read
+        self.data = {"settings": {}, "general": {}, "fields": {}}
+        self.subscribers = []
+        self.migratedProfiles = set()
+        self.lastPoll = 0
+        self.profileChanges = 0 #number of profile switches after the first load
+        #changes saved by this process are pending in the settings writer until they are flushed, so the file doesn't
+        #change yet. Re-read the file (with the pending changes applied) when one is queued
+        settingsManager.settingsWriter.subscribe(self.onWrite)
+
+        #stats
+        self.polls = 0
+        self.reads = {}
+        self.failedReads = 0
+
+    def getPaths(self):
+        profilePath = settingsManager.getProfilePath()
+        return {
+            "settings": os.path.join(profilePath, "settings.txt"),
+            "general": os.path.join(profilePath, "generalsettings.txt"),
+            "fields": os.path.join(profilePath, "fields.txt"),
+        }
+
+    #follow current_profile.txt and run the migrations when a profile is loaded for the first time
+    def checkProfile(self):
+        key = fileKey(settingsManager.CURRENT_PROFILE_FILE)
+        if key != self.keys.get("profile"):
+            self.keys["profile"] = key
+            settingsManager.loadCurrentProfile()
+        profile = settingsManager.getCurrentProfile()
+        if profile == self.profile:
+            return
+        if self.profile is not None:
+            self.profileChanges += 1
+        self.profile = profile
+        #read all files of the new profile
+        for name in self.data:
+            self.keys.pop(name, None)
+        if profile not in self.migratedProfiles:
+            settingsManager.migrateProfilesToGeneralSettings()
+
+    def read(self, name, path):
+        if name == "settings":
+            return settingsManager.loadSettings()
+        if name == "fields":
+            return settingsManager.loadFields()
+        data = settingsManager.readSettingsFile(path)
+        if self.profile not in self.migratedProfiles:
+            settingsManager.migrateMacroMode(data, path)
+            self.migratedProfiles.add(self.profile)
+        return data
+
+    #return the current snapshot, re-reading the files that changed if the last check is older than pollInterval
+    def refresh(self, force=False):
+        if not force and self.snapshot is not None and time.monotonic() - self.lastPoll < self.pollInterval:
+            return self.snapshot
+        with self._lock:
+            self.lastPoll = time.monotonic()
+            self.polls += 1
+            self.checkProfile()
+            changed = False
+            for name, path in self.getPaths().items():
+                key = fileKey(path)
+                if name in self.keys and key == self.keys[name]:
+                    continue
+                #the key is taken before reading, so a write during the read is picked up by the next check
+                self.keys[name] = key
+                try:
+                    self.data[name] = self.read(name, path)
+                except (OSError, SyntaxError, ValueError) as e:
+                    #missing, or read while another process was writing it. Keep the old data and try again next time
+                    print(f"Warning: Could not read {path}: {e}")
+                    self.keys[name] = None
+                    self.failedReads += 1
+                    continue
+                self.reads[name] = self.reads.get(name, 0) + 1
+                changed = True
+            if changed or self.snapshot is None:
+                self.publish()
+            return self.snapshot
+
+    #a change to path was queued in the settings writer
+    def onWrite(self, path):
+        path = os.path.abspath(path)
+        with self._lock:
+            for name, filePath in self.getPaths().items():
+                if os.path.abspath(filePath) == path:
+                    self.keys.pop(name, None)
+                    self.lastPoll = 0
+
+    #mark the files as stale, so the next refresh checks them (eg after saving a setting)
+    def invalidate(self):
+        self.lastPoll = 0
+
+    def publish(self):
+        settings = {**self.data["settings"], **self.data["general"]}
+        fields = self.data["fields"]
+        prev = self.snapshot
+        missing = object()
+        if prev is None:
+            changedKeys, changedFields = set(settings), set(fields)
+        else:
+            changedKeys = {k for k in settings.keys() | prev.settings.keys() if settings.get(k, missing) != prev.settings.get(k, missing)}
+            changedFields = {k for k in fields.keys() | prev.fields.keys() if fields.get(k, missing) != prev.fields.get(k, missing)}
+            #the files were saved without changing anything
+            if not changedKeys and not changedFields and prev.profile == self.profile:
+                return
+        version = prev.version + 1 if prev else 1
+        self.snapshot = SettingsSnapshot(version, self.profile, MappingProxyType(settings), MappingProxyType(fields))
+        for callback in list(self.subscribers):
+            try:
+                callback(self.snapshot, changedKeys, changedFields)
+            except Exception as e:
+                print(f"Settings subscriber {callback} failed: {e}")
+
+    #a copy of the general and profile settings, like loadAllSettings
+    def get(self):
+        return copy.deepcopy(dict(self.refresh().settings))
+
+    #a copy of the field settings, like loadFields
+    def getFields(self):
+        return copy.deepcopy(dict(self.refresh().fields))
+
+    #callback(snapshot, changedKeys, changedFields) is called from the thread that refreshes the store
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def getStats(self):
+        return {
+            "version": self.snapshot.version if self.snapshot else 0,
+            "profile": self.profile,
+            "profile_changes": self.profileChanges,
+            "polls": self.polls,
+            "reads": dict(self.reads),
+            "failed_reads": self.failedReads,
+            "subscribers": len(self.subscribers),
+        }
+
+#one store per process
+settingsStore = SettingsStore()
@@ -0,0 +1,260 @@
+import atexit
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class SettingsWriter:
+    '''
+    Batches changes to key=value settings files and writes them after a short debounce, instead of rewriting the
+    file on every change.
+    Changes are kept per file until no new change arrived for delay seconds (or the oldest one is maxDelay old).
+    A flush holds a file lock shared by all processes (gui, macro, discord bot), re-reads each file, applies its
+    pending changes and writes it to a temp file that is fsynced and renamed over the original.
+    Readers never see a partially written file, and changes from different processes to different keys are not lost.
+    A failed flush keeps its changes and is retried with a backoff.
+    Changes that must survive the process being killed (eg the macro's timings) can be flushed right away with flush().
+
+    parse(text) -> dict and format(dict) -> text convert between the file contents and the settings
+    '''
+
+    def __init__(self, parse, format, lockPath, delay=0.2, maxDelay=1, history=500):
+        self.parse = parse
+        self.format = format
+        self.lockPath = lockPath
+        self.delay = delay
+        self.maxDelay = maxDelay
+        self.pending = {} #path: {key: value, or removed for removed keys}
+        self._lock = threading.RLock()
+        self._wake = threading.Condition(self._lock)
+        self._flushLock = threading.Lock()
+        self.flushing = {} #changes being written by the current flush
+        #backoff after a failed flush
+        self.minRetryDelay = self.retryDelay = 0.5
+        self.maxRetryDelay = 10
+        self.retryAt = 0
+        self._thread = None
+        self.firstChange = None
+        self.lastChange = None
+        self.subscribers = [] #called with the path of a file when a change to it is queued
+        atexit.register(self.flush)
+
+        #stats
+        self.changes = 0 #changes queued
+        self.writes = 0 #files written
+        self.flushes = 0
+        self.flushTimes = deque(maxlen=history)
+
+    #marks a removed key in the pending changes
+    removed = object()
+
+    #lock shared between processes. Threads of this process are serialized by self._lock
+    def _fileLock(self):
+        if fcntl is None:
+            return None
+        try:
+            f = open(self.lockPath, "a")
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(self.lockPath), exist_ok=True)
+            f = open(self.lockPath, "a")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return f
+
+    def _fileUnlock(self, f):
+        if f is not None:
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+
+    def _read(self, path):
+        try:
+            with open(path, "r") as f:
+                return self.parse(f.read())
+        except FileNotFoundError:
+            return {}
+
+    #write text to a temp file in the same folder, fsync it and rename it over path
+    def _writeAtomic(self, path, text):
+        folder = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp_", suffix=".txt")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.writes += 1
+
+    def _queue(self, path, key, value):
+        with self._lock:
+            self.pending.setdefault(os.path.abspath(path), {})[key] = value
+            self.changes += 1
+            now = time.monotonic()
+            self.lastChange = now
+            if self.firstChange is None:
+                self.firstChange = now
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._wake.notify()
+        for callback in list(self.subscribers):
+            callback(path)
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        return callback
+
+    def set(self, path, key, value):
+        self._queue(path, key, value)
+
+    def remove(self, path, key):
+        self._queue(path, key, self.removed)
+
+    #apply the pending changes of a file to settings read from it
+    def overlay(self, path, data):
+        path = os.path.abspath(path)
+        if path not in self.pending and path not in self.flushing:
+            return data
+        with self._lock:
+            for changes in [self.flushing.get(path, {}), self.pending.get(path, {})]:
+                for k, v in changes.items():
+                    if v is self.removed:
+                        data.pop(k, None)
+                    else:
+                        data[k] = v
+        return data
+
+    #write all settings of a file now
+    #pending changes to keys that aren't in data are written with it (a removed key stays removed). Keys in data
+    #replace their pending changes, since data is newer
+    def replace(self, path, data):
+        with self._flushLock:
+            with self._lock:
+                changes = self.pending.pop(os.path.abspath(path), {})
+            data = dict(data)
+            for k, v in changes.items():
+                if k in data:
+                    continue
+                if v is not self.removed:
+                    data[k] = v
+            lock = self._fileLock()
+            try:
+                self._writeAtomic(path, self.format(data))
+            except BaseException:
+                #keep the changes that weren't written
+                with self._lock:
+                    self.pending[os.path.abspath(path)] = {**changes, **self.pending.get(os.path.abspath(path), {})}
+                raise
+            finally:
+                self._fileUnlock(lock)
+
+    #change a setting based on its current value in the file, eg to increment a counter
+    #the read, fn(value) and the write happen under the file lock, so an update from another process isn't lost
+    #pending changes of the file are written with it. Returns the new value
+    def update(self, path, key, fn, default=None):
+        with self._flushLock:
+            lock = self._fileLock()
+            try:
+                data = self.overlay(path, self._read(path))
+                with self._lock:
+                    changes = self.pending.pop(os.path.abspath(path), {})
+                data[key] = fn(data.get(key, default))
+                try:
+                    self._writeAtomic(path, self.format(data))
+                except BaseException:
+                    with self._lock:
+                        self.pending[os.path.abspath(path)] = {**changes, **self.pending.get(os.path.abspath(path), {})}
+                    raise
+            finally:
+                self._fileUnlock(lock)
+        with self._lock:
+            self.changes += 1
+        for callback in list(self.subscribers):
+            callback(path)
+        return data[key]
+
+    #write the pending changes of all files
+    #the disk i/o happens outside self._lock, so set() isn't blocked by a write. Flushes are serialized by self._flushLock
+    def flush(self):
+        with self._flushLock:
+            with self._lock:
+                if not self.pending:
+                    return
+                pending, self.pending = self.pending, {}
+                #still applied by overlay while they are written
+                self.flushing = pending
+                self.firstChange = None
+            st = time.perf_counter()
+            lock = None
+            try:
+                lock = self._fileLock()
+                for path in list(pending):
+                    data = self._read(path)
+                    before = dict(data)
+                    for k, v in pending[path].items():
+                        if v is self.removed:
+                            data.pop(k, None)
+                        else:
+                            data[k] = v
+                    if data != before:
+                        self._writeAtomic(path, self.format(data))
+                    del pending[path]
+            finally:
+                self._fileUnlock(lock)
+                with self._lock:
+                    self.flushing = {}
+                    if pending:
+                        #keep what couldn't be written and retry after a backoff. Newer changes win
+                        for path, changes in pending.items():
+                            self.pending[path] = {**changes, **self.pending.get(path, {})}
+                        now = time.monotonic()
+                        self.retryAt = now + self.retryDelay
+                        self.retryDelay = min(self.retryDelay*2, self.maxRetryDelay)
+                        if self.firstChange is None:
+                            self.firstChange = self.lastChange = now
+                        self._wake.notify()
+                    else:
+                        self.retryAt = 0
+                        self.retryDelay = self.minRetryDelay
+            self.flushes += 1
+            self.flushTimes.append(time.perf_counter()-st)
+
+    #flush after delay seconds without changes, or maxDelay after the first change (and not before a retry is due)
+    def _run(self):
+        while True:
+            with self._lock:
+                while True:
+                    if self.firstChange is None:
+                        self._wake.wait()
+                        continue
+                    now = time.monotonic()
+                    due = max(min(self.lastChange + self.delay, self.firstChange + self.maxDelay), self.retryAt)
+                    if now >= due:
+                        break
+                    self._wake.wait(due-now)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Could not save settings, retrying in {max(0, self.retryAt-time.monotonic()):.1f}s: {e}")
+
+    def getStats(self):
+        from modules.misc.benchmark import percentile
+        times = list(self.flushTimes)
+        return {
+            "changes": self.changes,
+            "flushes": self.flushes,
+            "writes": self.writes,
+            #changes merged into each file write
+            "changes_per_write": self.changes/max(1, self.writes),
+            "p50_flush_ms": percentile(times, 50)*1000,
+            "p95_flush_ms": percentile(times, 95)*1000,
+            "max_flush_ms": max(times, default=0)*1000,
+        }
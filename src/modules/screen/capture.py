@@ -0,0 +1,141 @@
+import threading
+import time
+from modules.screen import screenshot
+
+class CaptureService:
+    '''
+    Shared capture of the roblox window, grabbed from the active capture backend.
+    Instead of every detector opening its own mss context and grabbing its own rectangle, one frame of the whole window is grabbed per tick
+    and detectors receive a numpy view (no copy) of the region they need.
+    A frame is only re-grabbed when it is older than maxAge or the window bounds changed.
+
+    Views are read-only since they share the same frame. Copy them before drawing on them.
+    '''
+
+    def __init__(self, robloxWindow=None, maxAge=0.05):
+        self.robloxWindow = robloxWindow
+        self.maxAge = maxAge
+        self._lock = threading.Lock()
+        #(bgra array, (x,y,w,h) in screen points, timestamp)
+        self._frame = None
+
+        #named regions. Each value is a function that takes the roblox window and returns (x,y,w,h) in screen points
+        self.regions = {
+            "window": lambda rw: (rw.mx, rw.my, rw.mw, rw.mh),
+            #buff strip used for haste compensation
+            "buffs": lambda rw: (rw.mx, rw.my+rw.yOffset+33, rw.mw, 48),
+            #buff strip used by the buff detector/hourly report
+            "buffArea": lambda rw: (rw.mx, rw.my+rw.yOffset+33, rw.mw, 45),
+            #text beside the E button prompt
+            "ebutton": lambda rw: (rw.mx+(rw.mw//2-200), rw.my+rw.yOffset+34, 400, 140),
+            "honey": lambda rw: (rw.mx+(rw.mw//2-241), rw.my+rw.yOffset+5, 140, 36),
+            #bottom right of the screen, where the blue texts appear
+            "blue": lambda rw: (rw.mx+(rw.mw*3/4), rw.my+(rw.mh*3/5), rw.mw/4, rw.mh-rw.mh*3/5),
+        }
+
+        #stats
+        self.grabs = 0 #number of screenshots taken for the shared frame
+        self.directGrabs = 0 #regions outside of the window that had to be grabbed on their own
+        self.requests = 0 #number of regions served
+        self.grabTime = 0 #total time spent grabbing
+        self.maxGrabTime = 0
+
+    def setRobloxWindow(self, robloxWindow):
+        self.robloxWindow = robloxWindow
+        self.invalidate()
+
+    def defineRegion(self, name, func):
+        self.regions[name] = func
+
+    #grab a region of the screen as a bgra numpy array
+    def grab(self, x, y, w, h):
+        st = time.perf_counter()
+        out = screenshot.grabBGRA(x, y, w, h)
+        duration = time.perf_counter() - st
+        self.grabTime += duration
+        self.maxGrabTime = max(self.maxGrabTime, duration)
+        return out
+
+    def getBounds(self):
+        if self.robloxWindow is None:
+            return (0, 0, *screenshot.getScreenSize())
+        return tuple(int(v) for v in self.regions["window"](self.robloxWindow))
+
+    #mark the current frame as stale, so the next request grabs a new one
+    #call this after an action that is expected to change the screen
+    def invalidate(self):
+        self._frame = None
+
+    def getFrame(self, maxAge=None):
+        if maxAge is None:
+            maxAge = self.maxAge
+        bounds = self.getBounds()
+        frame = self._frame
+        if frame is not None and frame[1] == bounds and time.perf_counter() - frame[2] <= maxAge:
+            return frame
+        with self._lock:
+            #another thread might have grabbed the frame while waiting for the lock
+            frame = self._frame
+            if frame is not None and frame[1] == bounds and time.perf_counter() - frame[2] <= maxAge:
+                return frame
+            img = self.grab(*bounds)
+            img.flags.writeable = False
+            frame = (img, bounds, time.perf_counter())
+            self._frame = frame
+            self.grabs += 1
+        return frame
+
+    #get a region of the screen as a bgra numpy view into the shared frame
+    #region can be the name of a defined region or (x,y,w,h) in screen points
+    def getRegion(self, region, maxAge=None):
+        self.requests += 1
+        if isinstance(region, str):
+            region = self.regions[region](self.robloxWindow)
+        x, y, w, h = [int(v) for v in region]
+
+        img, (fx, fy, fw, fh), _ = self.getFrame(maxAge)
+        #region is not fully inside the window, grab it separately
+        if x < fx or y < fy or x+w > fx+fw or y+h > fy+fh:
+            self.directGrabs += 1
+            return self.grab(x, y, w, h)
+        #the frame is in pixels while the region is in points (retina frames are twice the size)
+        scale = img.shape[1]/fw
+        x1 = int(round((x-fx)*scale))
+        y1 = int(round((y-fy)*scale))
+        x2 = x1 + max(1, int(round(w*scale)))
+        y2 = y1 + max(1, int(round(h*scale)))
+        return img[y1:y2, x1:x2]
+
+    #get the rgb value of a pixel
+    #read from the shared frame if it is fresh. Otherwise grab just the pixel, since a pixel isn't worth a full window grab
+    def getPixel(self, x, y, maxAge=None):
+        if maxAge is None:
+            maxAge = self.maxAge
+        frame = self._frame
+        x, y = int(x), int(y)
+        if frame is not None and frame[1] == self.getBounds() and time.perf_counter() - frame[2] <= maxAge:
+            img = self.getRegion((x, y, 1, 1), maxAge)
+        else:
+            self.requests += 1
+            self.directGrabs += 1
+            img = self.grab(x, y, 1, 1)
+        b, g, r = img[0, 0, :3]
+        return (int(r), int(g), int(b))
+
+    def getStats(self):
+        return {
+            "grabs": self.grabs,
+            "direct_grabs": self.directGrabs,
+            "requests": self.requests,
+            #how many regions were served per screenshot taken
+            "requests_per_grab": self.requests/max(1, self.grabs+self.directGrabs),
+            "avg_grab_ms": self.grabTime/max(1, self.grabs+self.directGrabs)*1000,
+            "max_grab_ms": self.maxGrabTime*1000,
+        }
+
+    def formatStats(self):
+        stats = self.getStats()
+        return f"Capture: {stats['requests']} regions from {stats['grabs']} frames (+{stats['direct_grabs']} direct), {stats['requests_per_grab']:.1f} regions/grab, avg grab {stats['avg_grab_ms']:.1f}ms, max {stats['max_grab_ms']:.1f}ms"
+
+#one capture service per process
+captureService = CaptureService()
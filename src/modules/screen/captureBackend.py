@@ -0,0 +1,191 @@
+import numpy as np
+import threading
+import time
+import os
+import bisect
+import cv2
+
+'''
+Frame capture backends.
+All screenshots go through the active backend, so the vision code can be run against recorded frames
+instead of the screen (eg on a headless machine for benchmarks and regression checks).
+
+A backend has:
+    grab(x,y,w,h) -> bgra numpy array of the region. x,y,w,h are in screen points, the array is in pixels
+    size() -> (width, height) of the screen in points
+    scale -> pixels per point (2 on retina)
+'''
+
+class MSSCaptureBackend:
+    '''
+    Captures the live screen with mss.
+    Each thread keeps its own mss instance for the lifetime of the process instead of opening one per grab
+    '''
+    name = "mss"
+
+    def __init__(self):
+        self._local = threading.local()
+        from modules.screen.screenData import getScreenData
+        self.scale = 2 if getScreenData()["display_type"] == "retina" else 1
+
+    def getGrabber(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            import mss
+            import mss.darwin
+            mss.darwin.IMAGE_OPTIONS = 0
+            sct = mss.mss()
+            self._local.sct = sct
+        return sct
+
+    def size(self):
+        import pyautogui as pag
+        return pag.size()
+
+    def grab(self, x, y, w, h):
+        monitor = {"left": int(x), "top": int(y), "width": int(w), "height": int(h)}
+        return np.array(self.getGrabber().grab(monitor))
+
+class ReplayCaptureBackend:
+    '''
+    Serves crops of recorded frames instead of the screen.
+    frames: list of bgra (or bgr) arrays, all of the same size
+    timestamps: time of each frame in seconds, relative to the first one
+    origin: screen position (in points) of the top left corner of the frames
+    scale: pixels per point of the recorded frames
+
+    The current frame is picked in one of 3 ways:
+        - manually with step() and seek(t)
+        - advanceOnGrab: move to the next frame after every grab
+        - realtime: follow the timestamps using the time since the first grab
+    '''
+    name = "replay"
+
+    def __init__(self, frames, timestamps=None, origin=(0,0), scale=1, realtime=False, advanceOnGrab=False, loop=False):
+        if not len(frames):
+            raise ValueError("replay backend needs at least one frame")
+        self.frames = [self.toBGRA(f) for f in frames]
+        if timestamps is None:
+            timestamps = [i*0.1 for i in range(len(self.frames))]
+        self.timestamps = [t-timestamps[0] for t in timestamps]
+        self.origin = origin
+        self.scale = scale
+        self.realtime = realtime
+        self.advanceOnGrab = advanceOnGrab
+        self.loop = loop
+
+        self.index = 0
+        self.startTime = None
+        self.grabs = 0
+
+    @staticmethod
+    def toBGRA(img):
+        img = np.asarray(img)
+        if img.ndim == 2:
+            return cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
+        if img.shape[2] == 3:
+            return cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+        return img
+
+    def __len__(self):
+        return len(self.frames)
+
+    #time of the current frame, in seconds from the first frame
+    def now(self):
+        return self.timestamps[self.index]
+
+    def seek(self, t):
+        if self.loop:
+            t %= self.timestamps[-1] or 1
+        self.index = max(0, bisect.bisect_right(self.timestamps, t)-1)
+
+    #move to the next frame. Returns False once the recording has ended
+    def step(self, n=1):
+        i = self.index + n
+        if i >= len(self.frames):
+            if not self.loop:
+                self.index = len(self.frames)-1
+                return False
+            i %= len(self.frames)
+        self.index = i
+        return True
+
+    def reset(self):
+        self.index = 0
+        self.startTime = None
+
+    #the recording covers the screen from (0,0) to its bottom right corner
+    def size(self):
+        fh, fw = self.frames[0].shape[:2]
+        return (int(self.origin[0] + fw/self.scale), int(self.origin[1] + fh/self.scale))
+
+    def getFrame(self):
+        if self.realtime:
+            if self.startTime is None:
+                self.startTime = time.perf_counter()
+            self.seek(time.perf_counter() - self.startTime)
+        return self.frames[self.index]
+
+    def grab(self, x, y, w, h):
+        frame = self.getFrame()
+        self.grabs += 1
+        ox, oy = self.origin
+        x1 = int(round((x-ox)*self.scale))
+        y1 = int(round((y-oy)*self.scale))
+        x2 = x1 + int(round(w*self.scale))
+        y2 = y1 + int(round(h*self.scale))
+        fh, fw = frame.shape[:2]
+        out = np.zeros((max(0, y2-y1), max(0, x2-x1), 4), dtype=np.uint8)
+        #areas outside of the recording are left black, same as mss does for areas outside of the screen
+        cx1, cy1, cx2, cy2 = max(0, x1), max(0, y1), min(fw, x2), min(fh, y2)
+        if cx2 > cx1 and cy2 > cy1:
+            out[cy1-y1:cy2-y1, cx1-x1:cx2-x1] = frame[cy1:cy2, cx1:cx2]
+        if self.advanceOnGrab:
+            self.step()
+        return out
+
+#load a recording
+#path can be a .npz file with "frames" and optionally "timestamps", "origin" and "scale"
+#or a directory of png files (sorted by name) with an optional timestamps.txt (one time per line)
+def loadReplay(path, **kwargs):
+    if path.endswith(".npz"):
+        data = np.load(path)
+        frames = list(data["frames"])
+        timestamps = list(data["timestamps"]) if "timestamps" in data else None
+        if "origin" in data and "origin" not in kwargs:
+            kwargs["origin"] = tuple(int(v) for v in data["origin"])
+        if "scale" in data and "scale" not in kwargs:
+            kwargs["scale"] = float(data["scale"])
+    else:
+        files = sorted(x for x in os.listdir(path) if x.endswith(".png"))
+        frames = [cv2.imread(os.path.join(path, x), cv2.IMREAD_UNCHANGED) for x in files]
+        timestamps = None
+        timestampPath = os.path.join(path, "timestamps.txt")
+        if os.path.exists(timestampPath):
+            with open(timestampPath, "r") as f:
+                timestamps = [float(x) for x in f.read().split()]
+    return ReplayCaptureBackend(frames, timestamps, **kwargs)
+
+#record frames of a region from the active backend to a .npz file that can be loaded with loadReplay
+def recordReplay(path, x, y, w, h, count, interval=0.1):
+    backend = getCaptureBackend()
+    frames = []
+    timestamps = []
+    st = time.perf_counter()
+    for i in range(count):
+        frames.append(backend.grab(x, y, w, h))
+        timestamps.append(time.perf_counter()-st)
+        time.sleep(max(0, st + (i+1)*interval - time.perf_counter()))
+    np.savez_compressed(path, frames=np.array(frames), timestamps=np.array(timestamps), origin=np.array([x, y]), scale=backend.scale)
+
+_backend = None
+
+def getCaptureBackend():
+    global _backend
+    if _backend is None:
+        _backend = MSSCaptureBackend()
+    return _backend
+
+def setCaptureBackend(backend):
+    global _backend
+    _backend = backend
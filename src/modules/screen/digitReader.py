@@ -0,0 +1,320 @@
+import os
+import threading
+import time
+import cv2
+import numpy as np
+
+class DigitReader:
+    '''
+    Reads numbers drawn in the roblox hud font (honey, buff stack counts, quantities) without going through the full ocr engine.
+    The text mask is split into glyphs with connected components, and each glyph is compared against a small stored glyph set.
+    Glyphs are normalized to a fixed size before comparing, so the same set works for retina and built-in screens.
+
+    The glyph set is learnt from the ocr: when a read is ambiguous (unknown glyph, low score or two digits scoring too close),
+    the fallback ocr is used instead, and if its result lines up with the segmented glyphs, those glyphs are added to the set.
+    The set is saved to data/user so it only has to be learnt once.
+    '''
+
+    digits = "0123456789"
+
+    def __init__(self, glyphPath="./data/user/digit_glyphs.npz", glyphSize=(10, 14), minScore=0.75, minMargin=0.06, samplesPerChar=6, minArea=3):
+        self.glyphPath = glyphPath
+        self.glyphSize = glyphSize #(w, h)
+        self.minScore = minScore
+        self.minMargin = minMargin
+        self.samplesPerChar = samplesPerChar
+        self.minArea = minArea
+        self._lock = threading.Lock()
+        #char: list of (normalized glyph, aspect ratio)
+        self.glyphs = {}
+        self.lastSave = 0
+        self.unsaved = False
+
+        self.reads = 0
+        self.recognized = 0
+        self.fallbacks = 0
+        self.learnt = 0
+        self.readTime = 0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.glyphPath):
+            return
+        try:
+            data = np.load(self.glyphPath)
+            for char, glyph, aspect in zip(data["chars"], data["glyphs"], data["aspects"]):
+                if glyph.shape != (self.glyphSize[1], self.glyphSize[0]):
+                    continue
+                self.glyphs.setdefault(str(char), []).append((glyph.astype(np.float32), float(aspect)))
+        except Exception as e:
+            print(f"Failed to load digit glyphs: {e}")
+            self.glyphs = {}
+
+    def save(self):
+        with self._lock:
+            chars, glyphs, aspects = [], [], []
+            for char, samples in self.glyphs.items():
+                for glyph, aspect in samples:
+                    chars.append(char)
+                    glyphs.append(glyph)
+                    aspects.append(aspect)
+            self.unsaved = False
+            self.lastSave = time.time()
+        if not chars:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.glyphPath) or ".", exist_ok=True)
+            tmpPath = f"{self.glyphPath}.tmp.npz"
+            np.savez_compressed(tmpPath, chars=np.array(chars), glyphs=np.array(glyphs, dtype=np.float32), aspects=np.array(aspects, dtype=np.float32))
+            os.replace(tmpPath, self.glyphPath)
+        except Exception as e:
+            print(f"Failed to save digit glyphs: {e}")
+
+    def hasGlyphs(self):
+        return all(d in self.glyphs for d in self.digits)
+
+    #median width/height of the learnt digits, excluding 1 which is much narrower
+    def getDigitAspect(self):
+        aspects = [aspect for char, samples in self.glyphs.items() if char.isdigit() and char != "1" for _, aspect in samples]
+        return float(np.median(aspects)) if aspects else None
+
+    def normalize(self, glyphMask):
+        return cv2.resize(glyphMask.astype(np.float32), self.glyphSize, interpolation=cv2.INTER_AREA)
+
+    #split a text mask (text pixels are non zero) into glyphs, left to right
+    #returns a list of (kind, x, y, w, h, glyph), where kind is "glyph" for full height characters or the punctuation character
+    def segment(self, mask):
+        mask = (np.asarray(mask) > 0).astype(np.uint8)
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        comps = [(i, *stats[i][:4]) for i in range(1, count) if stats[i][cv2.CC_STAT_AREA] >= self.minArea]
+        if not comps:
+            return []
+        textHeight = max(c[4] for c in comps)
+        bottom = max(c[2]+c[4] for c in comps if c[4] >= textHeight*0.7)
+
+        #digits that touch form one wide component. Split them using the usual digit width
+        digitAspect = self.getDigitAspect()
+
+        out = []
+        small = []
+        for i, x, y, w, h in comps:
+            if h >= textHeight*0.7:
+                glyph = (labels[y:y+h, x:x+w] == i)
+                parts = max(1, round(w/h/digitAspect)) if digitAspect and w > h else 1
+                for p in range(parts):
+                    px1, px2 = w*p//parts, w*(p+1)//parts
+                    part = glyph[:, px1:px2]
+                    #trim the empty rows so the part is normalized like a separate glyph
+                    rows = np.nonzero(part.any(axis=1))[0]
+                    if not len(rows):
+                        continue
+                    part = part[rows[0]:rows[-1]+1]
+                    out.append(["glyph", x+px1, y+rows[0], px2-px1, len(rows), part])
+            elif h <= textHeight*0.4 and w <= textHeight*0.4:
+                small.append([x, y, w, h])
+            else:
+                #not a digit or punctuation (eg +, -, brackets that are shorter than the digits)
+                out.append(["unknown", x, y, w, h, None])
+
+        #small components are punctuation. Two stacked dots make a colon
+        small.sort(key=lambda c: c[1])
+        used = set()
+        for a in range(len(small)):
+            if a in used: continue
+            x, y, w, h = small[a]
+            char = None
+            for b in range(a+1, len(small)):
+                if b in used: continue
+                x2, y2, w2, h2 = small[b]
+                if x2 < x+w and x < x2+w2:
+                    used.add(b)
+                    char = ":"
+                    break
+            if char is None:
+                if y+h < bottom - textHeight*0.3:
+                    continue #dot above the baseline, most likely noise
+                #commas go below the baseline
+                char = "," if y+h > bottom + textHeight*0.1 else "."
+            out.append([char, x, y, w, h, None])
+        out.sort(key=lambda c: c[1])
+        return out
+
+    #compare a glyph against the glyph set. Returns (char, score, margin)
+    def classify(self, glyph):
+        h, w = glyph.shape
+        norm = self.normalize(glyph)
+        aspect = w/h
+        best = {}
+        for char, samples in self.glyphs.items():
+            for sample, sampleAspect in samples:
+                overlap = np.minimum(norm, sample).sum() / max(np.maximum(norm, sample).sum(), 1e-6)
+                score = overlap * min(aspect, sampleAspect)/max(aspect, sampleAspect)
+                if score > best.get(char, -1):
+                    best[char] = score
+        if not best:
+            return None, 0, 0
+        ranked = sorted(best.items(), key=lambda x: x[1], reverse=True)
+        margin = ranked[0][1] - ranked[1][1] if len(ranked) > 1 else ranked[0][1]
+        return ranked[0][0], ranked[0][1], margin
+
+    #read the text from a segmented mask. Returns None if any glyph is ambiguous
+    def recognize(self, segments):
+        #until every digit has been learnt, a digit that is not in the set would be read as the closest learnt one
+        if not segments or not self.hasGlyphs():
+            return None
+        text = ""
+        for kind, x, y, w, h, glyph in segments:
+            if kind == "unknown":
+                return None
+            if kind != "glyph":
+                text += kind
+                continue
+            char, score, margin = self.classify(glyph)
+            if char is None or score < self.minScore or margin < self.minMargin:
+                return None
+            text += char
+        return text
+
+    #add the glyphs of a read to the glyph set, if the fallback text lines up with the segmented glyphs
+    def learn(self, segments, text):
+        chars = [x for x in text if x.isdigit() or x in ".,:"]
+        if not segments or len(chars) != len(segments):
+            return False
+        pairs = []
+        for char, (kind, x, y, w, h, glyph) in zip(chars, segments):
+            if char.isdigit() != (kind == "glyph"):
+                return False
+            if kind == "glyph":
+                pairs.append((char, glyph))
+        learnt = False
+        with self._lock:
+            for char, glyph in pairs:
+                samples = self.glyphs.setdefault(char, [])
+                if len(samples) >= self.samplesPerChar:
+                    continue
+                norm = self.normalize(glyph)
+                samples.append((norm, glyph.shape[1]/glyph.shape[0]))
+                learnt = True
+                self.learnt += 1
+            if learnt:
+                self.unsaved = True
+        if learnt and time.time() - self.lastSave > 30:
+            self.save()
+        return learnt
+
+    #read a number from a text mask (text pixels are non zero)
+    #fallback: optional function that returns the text with ocr, used when the read is ambiguous. Its result is used to learn glyphs
+    #returns the text, or "" if it can't be read
+    def read(self, mask, fallback=None):
+        st = time.perf_counter()
+        self.reads += 1
+        segments = self.segment(mask)
+        text = self.recognize(segments)
+        self.readTime += time.perf_counter() - st
+        if text is not None:
+            self.recognized += 1
+            return text
+        if fallback is None:
+            return ""
+        self.fallbacks += 1
+        text = fallback()
+        self.learn(segments, text)
+        return text
+
+    def getStats(self):
+        return {
+            "reads": self.reads,
+            "recognized": self.recognized,
+            "fallbacks": self.fallbacks,
+            "learnt_glyphs": self.learnt,
+            "glyph_chars": "".join(sorted(self.glyphs)),
+            "avg_read_ms": self.readTime/max(1, self.reads)*1000,
+        }
+
+#mask of white hud text in a bgr(a) crop
+def whiteTextMask(bgr, minValue=230):
+    return cv2.inRange(np.asarray(bgr)[:, :, :3], np.array([minValue]*3), np.array([255]*3))
+
+def loadCorpus(path):
+    '''
+    Load a labelled crop corpus: a folder of png text masks/crops and a labels.txt with one "filename,text" line per crop
+    '''
+    corpus = []
+    with open(os.path.join(path, "labels.txt"), "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or "," not in line:
+                continue
+            name, text = line.split(",", 1)
+            img = cv2.imread(os.path.join(path, name), cv2.IMREAD_GRAYSCALE)
+            if img is not None:
+                corpus.append((img, text))
+    return corpus
+
+def syntheticCorpus(count=200, seed=0):
+    #numbers drawn with an opencv font at built-in and retina scale, for when no recorded corpus is available
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for i in range(count):
+        scale = 1 if i % 2 else 2
+        text = str(int(rng.integers(0, 10**int(rng.integers(1, 8)))))
+        if rng.random() < 0.3:
+            text = f"{int(text):,}"
+        img = np.zeros((20*scale, (12*len(text)+8)*scale), dtype=np.uint8)
+        x = 2*scale
+        for char in text:
+            cv2.putText(img, char, (x, 16*scale), cv2.FONT_HERSHEY_SIMPLEX, 0.5*scale, 255, scale, cv2.LINE_8)
+            x += (6 if char == "," else 12)*scale
+        corpus.append((img, text))
+    return corpus
+
+def benchmarkDigitReader(corpus=None, ocrFunc=None, trainFraction=0.3):
+    '''
+    Measure the latency and accuracy of the digit reader on a labelled corpus of text masks
+    corpus: list of (mask, text) or a path for loadCorpus. Defaults to the synthetic corpus
+    ocrFunc: optional function(mask) -> text, to compare against the full ocr (eg lambda m: ocrRead(Image.fromarray(m)))
+    The first trainFraction of the corpus is used to learn the glyphs (with the labels as the fallback)
+    '''
+    from modules.misc.benchmark import timeCall, formatTable, percentile
+    if corpus is None:
+        corpus = syntheticCorpus()
+    elif isinstance(corpus, str):
+        corpus = loadCorpus(corpus)
+    split = max(1, int(len(corpus)*trainFraction))
+    #a fresh glyph set that is not saved
+    reader = DigitReader(glyphPath="")
+    reader.save = lambda: None
+    for mask, text in corpus[:split]:
+        reader.read(mask, lambda: text)
+
+    rows = []
+    test = corpus[split:]
+    impls = {"digitReader": lambda mask: reader.read(mask)}
+    if ocrFunc is not None:
+        impls["ocr"] = ocrFunc
+    for name, func in impls.items():
+        times, correct, unread = [], 0, 0
+        for mask, text in test:
+            stats, out = timeCall(lambda: func(mask), runs=3, warmup=0)
+            times.append(stats["p50_ms"])
+            strip = lambda s: "".join(x for x in s if x.isdigit())
+            correct += strip(out) == strip(text)
+            unread += not out
+        n = max(1, len(test))
+        rows.append({
+            "impl": name,
+            "crops": len(test),
+            "p50_ms": percentile(times, 50),
+            "p95_ms": percentile(times, 95),
+            "accuracy": correct/n,
+            "fallback_rate": unread/n,
+        })
+    print(formatTable(rows))
+    return rows
+
+#one digit reader per process
+digitReader = DigitReader()
+
+if __name__ == "__main__":
+    import sys
+    benchmarkDigitReader(sys.argv[1] if len(sys.argv) > 1 else None)
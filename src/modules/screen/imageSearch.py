@@ -3,6 +3,9 @@ from modules.screen.screenshot import mssScreenshot, mssScreenshotNP
 import numpy as np
 import imagehash
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from modules import bitmap_matcher
 
 class TemplateTooLargeError(Exception):
     def __init__(self, template_size, image_size):
@@ -27,11 +30,113 @@ def templateMatch(smallImg, bigImg):
 #     # scale back to original coordinates
 #     return min_val, max_val, (int(min_loc[0] / scale), int(min_loc[1] / scale)), (int(max_loc[0] / scale), int(max_loc[1] / scale))
 
-def locateImageOnScreen(target, x,y,w,h, threshold = 0):
+#coarse to fine template matching
+#the template and image are first matched at a reduced scale, then the best coarse candidates are refined at full resolution in a small window around them
+#falls back to the full resolution match when the coarse result is not reliable:
+#   - the template is too small to be downscaled
+#   - the best coarse score is below minCoarseScore (but above absentScore)
+#   - the coarse search could not separate the candidates (more than maxCandidates within ambiguity of the best score)
+#absentScore: if the best coarse score is below this, the template is treated as not on screen and the coarse result is returned as is
+#returns the same values as templateMatch. min_val and min_loc are from the refinement windows only
+def templateMatchPyramid(smallImg, bigImg, scale=0.5, minCoarseScore=0.5, ambiguity=0.05, maxCandidates=3, absentScore=None):
+    if smallImg.shape[0] > bigImg.shape[0] or smallImg.shape[1] > bigImg.shape[1]:
+        raise TemplateTooLargeError(
+            template_size=(smallImg.shape[1], smallImg.shape[0]),
+            image_size=(bigImg.shape[1], bigImg.shape[0])
+        )
+    th, tw = smallImg.shape[:2]
+    #not worth it for small searches, and small templates lose too much detail
+    if min(th, tw)*scale < 8 or bigImg.shape[0]*bigImg.shape[1] < 4*th*tw:
+        return templateMatch(smallImg, bigImg)
+
+    smallCoarse = cv2.resize(smallImg, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    bigCoarse = cv2.resize(bigImg, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if smallCoarse.shape[0] > bigCoarse.shape[0] or smallCoarse.shape[1] > bigCoarse.shape[1]:
+        return templateMatch(smallImg, bigImg)
+    coarse = cv2.matchTemplate(bigCoarse, smallCoarse, cv2.TM_CCOEFF_NORMED)
+
+    #collect the best candidates, suppressing the area around each one so they are distinct locations
+    candidates = []
+    sh, sw = smallCoarse.shape[:2]
+    bestScore = None
+    for _ in range(maxCandidates+1):
+        _, score, _, loc = cv2.minMaxLoc(coarse)
+        if bestScore is None:
+            bestScore = score
+            if absentScore is not None and score < absentScore:
+                min_val, _, min_loc, _ = cv2.minMaxLoc(coarse)
+                return min_val, score, (int(min_loc[0]/scale), int(min_loc[1]/scale)), (int(loc[0]/scale), int(loc[1]/scale))
+            if score < minCoarseScore:
+                return templateMatch(smallImg, bigImg)
+        elif score < bestScore - ambiguity:
+            break
+        candidates.append(loc)
+        cx, cy = loc
+        coarse[max(0, cy-sh//2):cy+sh//2+1, max(0, cx-sw//2):cx+sw//2+1] = -1
+    if len(candidates) > maxCandidates:
+        return templateMatch(smallImg, bigImg)
+
+    #refine each candidate at full resolution
+    margin = int(2/scale)+2
+    bh, bw = bigImg.shape[:2]
+    best = None
+    for cx, cy in candidates:
+        x1 = max(0, int(cx/scale)-margin)
+        y1 = max(0, int(cy/scale)-margin)
+        x2 = min(bw, int(cx/scale)+tw+margin)
+        y2 = min(bh, int(cy/scale)+th+margin)
+        if x2-x1 < tw or y2-y1 < th: continue
+        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(cv2.matchTemplate(bigImg[y1:y2, x1:x2], smallImg, cv2.TM_CCOEFF_NORMED))
+        if best is None or max_val > best[1]:
+            best = (min_val, max_val, (min_loc[0]+x1, min_loc[1]+y1), (max_loc[0]+x1, max_loc[1]+y1))
+    if best is None:
+        return templateMatch(smallImg, bigImg)
+    return best
+
+def benchmarkPyramid(frames, templates, threshold=0.7, runs=10):
+    '''
+    Compare templateMatchPyramid against the exact templateMatch on recorded frames
+    frames: list of bgr(a) screenshots (eg ReplayCaptureBackend.frames), templates: dict of name: bgr template
+    Reports the speedup and how often both agree on the match (same decision at the threshold and, when found, the same location within 2px)
+    '''
+    from modules.misc.benchmark import timeCall, formatTable
+    rows = []
+    for name, template in templates.items():
+        exactTimes = []
+        pyramidTimes = []
+        agree = 0
+        total = 0
+        for frame in frames:
+            if frame.ndim == 3 and frame.shape[2] == 4:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+            try:
+                exactStats, exact = timeCall(lambda: templateMatch(template, frame), runs, 1)
+                pyramidStats, pyramid = timeCall(lambda: templateMatchPyramid(template, frame, absentScore=threshold-0.25), runs, 1)
+            except TemplateTooLargeError:
+                continue
+            exactTimes.append(exactStats["p50_ms"])
+            pyramidTimes.append(pyramidStats["p50_ms"])
+            total += 1
+            exactFound = exact[1] >= threshold
+            pyramidFound = pyramid[1] >= threshold
+            if exactFound == pyramidFound and (not exactFound or (abs(exact[3][0]-pyramid[3][0]) <= 2 and abs(exact[3][1]-pyramid[3][1]) <= 2)):
+                agree += 1
+        if not total: continue
+        exactMs = sum(exactTimes)/total
+        pyramidMs = sum(pyramidTimes)/total
+        rows.append({"template": name, "frames": total, "exact_ms": exactMs, "pyramid_ms": pyramidMs, "speedup": exactMs/max(pyramidMs, 1e-9), "agreement": agree/total})
+    print(formatTable(rows))
+    return rows
+
+#pyramid: use the coarse to fine match. Only worth it for large templates in large regions, check it with benchmarkPyramid first
+def locateImageOnScreen(target, x,y,w,h, threshold = 0, pyramid = False):
     screen = mssScreenshot(x,y,w,h)
     screen = cv2.cvtColor(np.array(screen), cv2.COLOR_RGB2BGR)
     try:
-        _, max_val, _, max_loc = templateMatch(target, screen)
+        if pyramid:
+            _, max_val, _, max_loc = templateMatchPyramid(target, screen, absentScore=threshold-0.25 if threshold > 0 else None)
+        else:
+            _, max_val, _, max_loc = templateMatch(target, screen)
     except TemplateTooLargeError:
         return None
     if max_val < threshold: return None
@@ -40,9 +145,12 @@ def locateImageOnScreen(target, x,y,w,h, threshold = 0):
 #used for locating templates with transparency
 #this is done by template matching with the gray color space
 
+#target and screen can also be passed in already in gray (eg from the template registry)
 def locateTransparentImage(target, screen, threshold):
-    screen = cv2.cvtColor(screen, cv2.COLOR_BGRA2GRAY)
-    target = cv2.cvtColor(target, cv2.COLOR_RGB2GRAY)
+    if screen.ndim == 3:
+        screen = cv2.cvtColor(screen, cv2.COLOR_BGRA2GRAY)
+    if target.ndim == 3:
+        target = cv2.cvtColor(target, cv2.COLOR_RGB2GRAY)
     try:
         _, max_val, _, max_loc = templateMatch(target, screen)
     except TemplateTooLargeError:
@@ -55,6 +163,129 @@ def locateTransparentImageOnScreen(target, x,y,w,h, threshold = 0):
     return locateTransparentImage(target, screen, threshold)
 
 
+class TemplateSet:
+    '''
+    A group of templates that are searched for in the same screen.
+    templates: dict of name: template, or a list of templates (named by their index)
+    gray: the templates are gray (eg from templateRegistry.get(..., "gray")), so the screen is converted to gray once instead of to bgr
+    '''
+    def __init__(self, templates, gray=False):
+        if not isinstance(templates, dict):
+            templates = dict(enumerate(templates))
+        self.templates = templates
+        self.gray = gray
+
+    def prepareScreen(self, screen):
+        if self.gray:
+            if screen.ndim == 3:
+                return cv2.cvtColor(screen, cv2.COLOR_BGRA2GRAY if screen.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+            return screen
+        if screen.ndim == 3 and screen.shape[2] == 4:
+            return cv2.cvtColor(screen, cv2.COLOR_BGRA2BGR)
+        return screen
+
+#shared pool for matching template sets. cv2.matchTemplate releases the GIL, so threads run in parallel
+templateMatchPool = None
+def getTemplateMatchPool():
+    global templateMatchPool
+    if templateMatchPool is None:
+        templateMatchPool = ThreadPoolExecutor(max_workers=4)
+    return templateMatchPool
+
+#match every template of a TemplateSet against the same screen, converting the screen only once
+#modes:
+#   first: return the first template (in order) above the threshold. Templates after it are not searched
+#   best: return the n highest scoring templates above the threshold
+#   all: return every template above the threshold
+#returns a list of (name, max_val, max_loc), in template order for first/all and by score for best
+#parallel: spread the templates across a thread pool. In first mode, all templates are searched but the first one in order is still returned
+def matchTemplateSet(templateSet, screen, threshold=0, mode="first", n=1, parallel=False):
+    screen = templateSet.prepareScreen(screen)
+
+    def match(item):
+        name, template = item
+        try:
+            _, max_val, _, max_loc = templateMatch(template, screen)
+        except TemplateTooLargeError:
+            return None
+        if max_val < threshold: return None
+        return (name, max_val, max_loc)
+
+    items = list(templateSet.templates.items())
+    if parallel and len(items) > 1:
+        results = [x for x in getTemplateMatchPool().map(match, items) if x]
+        if mode == "first":
+            return results[:1]
+    else:
+        results = []
+        for item in items:
+            res = match(item)
+            if not res: continue
+            results.append(res)
+            if mode == "first":
+                return results
+
+    if mode == "best":
+        results.sort(key=lambda x: x[1], reverse=True)
+        return results[:n]
+    return results
+
+#convert a pillow screenshot once for multiple bitmap_matcher searches
+#the numpy implementation would otherwise convert the image on every call. The compiled one takes the pillow image as is
+def prepareBitmapScreen(screen):
+    if bitmap_matcher.backend == "vectorized":
+        return bitmap_matcher._bitmap_matcher.to_rgb_array(screen)
+    return screen
+
+#find the first bitmap of a list that is in the screen, using bitmap_matcher
+#returns (index, (x,y)) or None
+def findFirstBitmap(screen, bitmaps, **kwargs):
+    screen = prepareBitmapScreen(screen)
+    for i, bitmap in enumerate(bitmaps):
+        res = bitmap_matcher.find_bitmap_cython(screen, bitmap, **kwargs)
+        if res:
+            return i, res
+    return None
+
+def benchmarkTemplateSet(screen, templates, threshold=0.7, runs=50, gray=True):
+    '''
+    Compare matching a set of templates one call at a time (the old loops) against matchTemplateSet
+    screen: bgra screenshot, templates: dict of name: template in the same form as gray
+    '''
+    from modules.misc.benchmark import timeCall, formatTable
+    templateSet = TemplateSet(templates, gray)
+
+    def sequential():
+        out = []
+        for name, template in templates.items():
+            res = locateTransparentImage(template, screen, threshold) if gray else locateImageOnScreenArray(template, screen, threshold)
+            if res: out.append(name)
+        return out
+
+    rows = []
+    for name, func in [
+        ("sequential", sequential),
+        ("set all", lambda: [x[0] for x in matchTemplateSet(templateSet, screen, threshold, "all")]),
+        ("set all parallel", lambda: [x[0] for x in matchTemplateSet(templateSet, screen, threshold, "all", parallel=True)]),
+        ("set first", lambda: [x[0] for x in matchTemplateSet(templateSet, screen, threshold, "first")]),
+        ("set first parallel", lambda: [x[0] for x in matchTemplateSet(templateSet, screen, threshold, "first", parallel=True)]),
+    ]:
+        stats, res = timeCall(func, runs)
+        rows.append({"method": name, "p50_ms": stats["p50_ms"], "p95_ms": stats["p95_ms"], "found": res})
+    print(formatTable(rows))
+    return rows
+
+#same as locateImageOnScreen, but on an existing bgr(a) screenshot
+def locateImageOnScreenArray(target, screen, threshold=0):
+    if screen.ndim == 3 and screen.shape[2] == 4:
+        screen = cv2.cvtColor(screen, cv2.COLOR_BGRA2BGR)
+    try:
+        _, max_val, _, max_loc = templateMatchPyramid(target, screen, absentScore=threshold-0.25 if threshold > 0 else None)
+    except TemplateTooLargeError:
+        return None
+    if max_val < threshold: return None
+    return (max_val, max_loc)
+
 def similarHashes(hash1, hash2, threshold):
     return hash1-hash2 < threshold
 
@@ -229,3 +460,110 @@ def fastFeatureMatching(haystack, needle):
     center_x = int(np.mean(dst[:, 0, 0]))
     center_y = int(np.mean(dst[:, 0, 1]))
     return (center_x, center_y)
+
+
+class LocationCache:
+    '''
+    Remembers where each template was last found, since most ui elements appear at (almost) the same position every time.
+    A search first scans a small window around the last hit, then a wider one, and only scans the whole screen if both miss.
+    Locations are forgotten when the screen size or the roblox window version changes (see RobloxWindowBounds.version).
+
+    Hits in the smaller windows must score at least minCachedScore, so a low caller threshold (eg 0, "give me the best match")
+    does not lock onto a stale position.
+    The cache is shared by the macro's threads. Matching runs outside of the lock, only the entries and stats are locked
+    '''
+    def __init__(self, margin=8, widenFactor=4, minCachedScore=0.8):
+        self.margin = margin
+        self.widenFactor = widenFactor
+        self.minCachedScore = minCachedScore
+        self.locations = {}
+        self._lock = threading.Lock()
+        self.stats = {"near": 0, "wide": 0, "full": 0, "pixels_scanned": 0, "pixels_full": 0}
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self.locations = {}
+            else:
+                self.locations.pop(key, None)
+
+    def getWindows(self, key, shape, templateSize, version):
+        with self._lock:
+            entry = self.locations.get(key)
+            if entry is None: return []
+            (lx, ly), prevShape, prevVersion = entry
+            if prevShape != shape[:2] or prevVersion != version:
+                self.locations.pop(key, None)
+                return []
+        tw, th = templateSize
+        h, w = shape[:2]
+        windows = []
+        for margin in (self.margin, self.margin*self.widenFactor):
+            x1, y1 = max(0, lx-margin), max(0, ly-margin)
+            x2, y2 = min(w, lx+tw+margin), min(h, ly+th+margin)
+            if x2-x1 >= tw and y2-y1 >= th:
+                windows.append((x1, y1, x2, y2))
+        return windows
+
+    def record(self, level, key, loc, shape, version, scanned):
+        with self._lock:
+            self.stats[level] += 1
+            self.stats["pixels_scanned"] += scanned
+            self.stats["pixels_full"] += shape[0]*shape[1]
+            if loc is not None:
+                self.locations[key] = ((int(loc[0]), int(loc[1])), shape[:2], version)
+
+    #search for a template in a screen array
+    #matcher: function(template, screen, threshold) -> (max_val, max_loc) or None, eg locateTransparentImage or locateImageOnScreenArray
+    #returns the same as the matcher, with max_loc relative to the whole screen
+    def search(self, key, template, screen, threshold, matcher, version=None):
+        th, tw = template.shape[:2]
+        scanned = 0
+        for level, (x1, y1, x2, y2) in zip(("near", "wide"), self.getWindows(key, screen.shape, (tw, th), version)):
+            scanned += (x2-x1)*(y2-y1)
+            res = matcher(template, screen[y1:y2, x1:x2], max(threshold, self.minCachedScore))
+            if res:
+                loc = (res[1][0]+x1, res[1][1]+y1)
+                self.record(level, key, loc, screen.shape, version, scanned)
+                return (res[0], loc)
+        res = matcher(template, screen, threshold)
+        self.record("full", key, res[1] if res else None, screen.shape, version, scanned+screen.shape[0]*screen.shape[1])
+        return res
+
+    #same as search, but with bitmap_matcher (the window is passed to the matcher instead of cropping the screen)
+    #screen is a pillow image or an array from prepareBitmapScreen. Returns (x,y) or None
+    def searchBitmap(self, key, screen, bitmap, version=None, **kwargs):
+        if isinstance(screen, np.ndarray):
+            shape = screen.shape
+        else:
+            shape = (screen.size[1], screen.size[0])
+        bw, bh = bitmap.size
+        #keep the windows inside the area the caller asked to search
+        sx, sy = kwargs.get("x", 0), kwargs.get("y", 0)
+        ex = shape[1] if kwargs.get("w") is None else sx+kwargs["w"]
+        ey = shape[0] if kwargs.get("h") is None else sy+kwargs["h"]
+        scanned = 0
+        for level, (x1, y1, x2, y2) in zip(("near", "wide"), self.getWindows(key, shape, (bw, bh), version)):
+            x1, y1, x2, y2 = max(x1, sx), max(y1, sy), min(x2, ex), min(y2, ey)
+            if x2-x1 < bw or y2-y1 < bh: continue
+            scanned += (x2-x1)*(y2-y1)
+            res = bitmap_matcher.find_bitmap_cython(screen, bitmap, x=x1, y=y1, w=x2-x1, h=y2-y1, variance=kwargs.get("variance", 0))
+            if res:
+                self.record(level, key, res, shape, version, scanned)
+                return res
+        res = bitmap_matcher.find_bitmap_cython(screen, bitmap, **kwargs)
+        self.record("full", key, res, shape, version, scanned+shape[0]*shape[1])
+        return res
+
+    def getStats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        total = stats["near"] + stats["wide"] + stats["full"]
+        return {
+            **stats,
+            "hit_rate": (stats["near"]+stats["wide"])/total if total else 0,
+            #fraction of the pixels that would have been scanned without the cache
+            "scan_ratio": stats["pixels_scanned"]/stats["pixels_full"] if stats["pixels_full"] else 0,
+        }
+
+locationCache = LocationCache()
@@ -0,0 +1,171 @@
+import cv2
+import numpy as np
+from modules.screen.imageSearch import findColorObjectRGB
+
+class NightDetector:
+    '''
+    Detects night from a screenshot of the roblox window.
+    All grass colours (day and night) are labelled in a single pass: each colour is a bit, and a per-channel lookup table
+    gives the bits a channel value belongs to. ANDing the 3 channel lookups gives the colours each pixel matches.
+    The black sky check uses an integral image instead of checking every 15x15 patch in python.
+    '''
+
+    #(rgb colour, kernel size)
+    dayColors = [
+        ((47, 117, 57), 6), #ground
+        ((46, 117, 58), 9), #dande
+        ((60, 156, 74), 9), #stump
+        ((38, 114, 51), 9), #pa
+        ((66, 123, 40), 6), #clov
+        ((32, 211, 22), 9), #ant
+    ]
+    nightColors = [
+        ((23, 72, 30), 3), #a
+        ((17, 71, 28), 6), #dande
+    ]
+
+    def __init__(self, robloxWindow, variance=6):
+        self.robloxWindow = robloxWindow
+        self.colors = self.dayColors + self.nightColors
+        self.dayBits = [1 << i for i in range(len(self.dayColors))]
+        self.nightBits = [1 << (i+len(self.dayColors)) for i in range(len(self.nightColors))]
+        self.kernels = {k: cv2.getStructuringElement(cv2.MORPH_RECT, (k, k)) for _, k in self.colors}
+
+        #lookup tables in bgr order, since the screen is bgr(a)
+        self.luts = []
+        for channel in (2, 1, 0):
+            lut = np.zeros(256, dtype=np.uint8)
+            for i, (color, _) in enumerate(self.colors):
+                lo = max(0, color[channel]-variance)
+                hi = min(255, color[channel]+variance)
+                lut[lo:hi+1] |= 1 << i
+            self.luts.append(lut)
+
+    def labelColors(self, bgr):
+        b = cv2.LUT(np.ascontiguousarray(bgr[:, :, 0]), self.luts[0])
+        g = cv2.LUT(np.ascontiguousarray(bgr[:, :, 1]), self.luts[1])
+        r = cv2.LUT(np.ascontiguousarray(bgr[:, :, 2]), self.luts[2])
+        return cv2.bitwise_and(cv2.bitwise_and(b, g), r)
+
+    #same check as findColorObjectRGB with an erode kernel: is there any pixel left after eroding the colour's mask
+    def hasColorObject(self, labels, bit, kernelSize):
+        mask = cv2.bitwise_and(labels, bit)
+        if not cv2.countNonZero(mask):
+            return False, 0
+        return bool(cv2.countNonZero(cv2.erode(mask, self.kernels[kernelSize]))), cv2.countNonZero(mask)
+
+    #detect the color of the grass in fields
+    #useful when gathering
+    #returns (night, confidence)
+    def isGrassNight(self, bgr):
+        bgr = bgr[0:bgr.shape[0]- (100*self.robloxWindow.multi)]
+        dayTop = int(bgr.shape[0]*2/5)
+        nightTop = int(bgr.shape[0]/2)
+        labels = self.labelColors(bgr[dayTop:])
+
+        dayPixels = 0
+        for bit, (_, k) in zip(self.dayBits, self.dayColors):
+            found, count = self.hasColorObject(labels, bit, k)
+            dayPixels += count
+            if found:
+                return False, 0.0
+        #day not found, detect night. Night is only searched for in the bottom half
+        nightLabels = labels[nightTop-dayTop:]
+        nightPixels = 0
+        night = False
+        for bit, (_, k) in zip(self.nightBits, self.nightColors):
+            found, count = self.hasColorObject(nightLabels, bit, k)
+            nightPixels += count
+            night = night or found
+        if not night:
+            return False, 0.0
+        #how much of the grass coloured area is night coloured
+        return True, nightPixels/(nightPixels+dayPixels)
+
+    #check if there is a 15x15 area that is entirely black in the sky (above the buffs)
+    #returns (night, confidence)
+    def isNightSky(self, bgr, size=15):
+        y = 30*self.robloxWindow.multi
+        bgr = bgr[0:y, 180*self.robloxWindow.multi:int(self.robloxWindow.mw)]
+        h, w = bgr.shape[:2]
+        if h <= size or w <= size:
+            return False, 0.0
+        black = (bgr[:, :, :3].max(axis=2) == 0).astype(np.uint8)
+        integral = cv2.integral(black)
+        #number of black pixels in every size x size window
+        sums = integral[size:, size:] - integral[:-size, size:] - integral[size:, :-size] + integral[:-size, :-size]
+        #the original loop does not check the last row/column of positions
+        sums = sums[:h-size, :w-size]
+        windows = np.count_nonzero(sums == size*size)
+        return windows > 0, min(1.0, windows/sums.size*10) if windows else 0.0
+
+    def detect(self, screen, converting):
+        if converting:
+            return self.isNightSky(screen)
+        return self.isGrassNight(screen)
+
+#previous implementations, kept to compare accuracy and speed against
+def isNightSkyLegacy(bgr, robloxWindow):
+    y = 30*robloxWindow.multi
+    #crop the image to only the area above buff
+    bgr = bgr[0:y, 180*robloxWindow.multi:int(robloxWindow.mw)]
+    w,h = bgr.shape[:2]
+    #check if a 15x15 area that is entirely black
+    for x in range(w-15):
+        for y in range(h-15):
+            area = bgr[x:x+15, y:y+15]
+            if np.all(area == [0, 0, 0]):
+                return True
+    return False
+
+def isGrassNightLegacy(bgr, robloxWindow):
+    dayColors = [[color, cv2.getStructuringElement(cv2.MORPH_RECT, (k, k))] for color, k in NightDetector.dayColors]
+    nightColors = [[color, cv2.getStructuringElement(cv2.MORPH_RECT, (k, k))] for color, k in NightDetector.nightColors]
+
+    bgr = bgr[0:bgr.shape[0]- (100*robloxWindow.multi)]
+    dayScreen = bgr[int(bgr.shape[0]*2/5):bgr.shape[0]].copy()
+    #detect day
+    for color, kernel in dayColors:
+        if findColorObjectRGB(dayScreen, color, variance=6, kernel=kernel, mode="box"):
+            return False
+    #day not found, detect Night
+    nightScreen = bgr[int(bgr.shape[0]/2):bgr.shape[0]].copy()
+    for color, kernel in nightColors:
+        if findColorObjectRGB(nightScreen, color, variance=6, kernel=kernel, mode="box"):
+            return True
+    return False
+
+def benchmarkNightDetection(frames, robloxWindow, labels=None, runs=5):
+    '''
+    Compare the night detector against the legacy implementations on recorded frames
+    frames: bgr(a) screenshots of the roblox window
+    labels: optional list of True/False (night) for each frame, to report accuracy
+    '''
+    from modules.misc.benchmark import timeCall, formatTable
+    detector = NightDetector(robloxWindow)
+    rows = []
+    for name, new, legacy in [
+        ("grass", lambda f: detector.isGrassNight(f)[0], lambda f: isGrassNightLegacy(f, robloxWindow)),
+        ("sky", lambda f: detector.isNightSky(f)[0], lambda f: isNightSkyLegacy(f, robloxWindow)),
+    ]:
+        newTimes, legacyTimes, agree, correct = [], [], 0, 0
+        for i, frame in enumerate(frames):
+            frame = frame[:, :, :3]
+            newStats, newRes = timeCall(lambda: new(frame), runs, 1)
+            legacyStats, legacyRes = timeCall(lambda: legacy(frame), max(1, runs//5), 0)
+            newTimes.append(newStats["p50_ms"])
+            legacyTimes.append(legacyStats["p50_ms"])
+            agree += newRes == legacyRes
+            if labels is not None:
+                correct += newRes == labels[i]
+        n = max(1, len(frames))
+        rows.append({
+            "check": name,
+            "legacy_ms": sum(legacyTimes)/n,
+            "new_ms": sum(newTimes)/n,
+            "speedup": sum(legacyTimes)/max(sum(newTimes), 1e-9),
+            "agreement": agree/n,
+            "accuracy": correct/n if labels is not None else "",
+        })
+    print(formatTable(rows))
+    return rows
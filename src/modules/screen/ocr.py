@@ -1,4 +1,6 @@
 from modules.screen.screenshot import mssScreenshot
+from modules.screen.capture import captureService
+from modules.screen.ocrCache import ocrCache
 import pyautogui as pag
 import numpy as np
 from PIL import Image
@@ -9,25 +11,141 @@ import mss.darwin
 mss.darwin.IMAGE_OPTIONS = 0
 from modules.screen.screenData import getScreenData
 import io
+import threading
+import cv2
 
 ocrLib = None
 useLangPref = True
-try:
-    from ocrmac import ocrmac #see if ocr mac is installed
-    ocrLib = "ocrmac"
-except:
-    try:
+ocrmac = None
+ocrP = None
+easyocrReader = None
+
+class OCRBackendManager:
+    '''
+    Loads the ocr backend the first time it is needed instead of when this module is imported,
+    so processes that never read text (the gui, discord bot) don't load an ocr model.
+    The backend can be picked in the settings (ocr_backend), otherwise the first one that is installed is used:
+    ocrmac, then paddleocr, then easyocr.
+
+    warmUp loads the backend on a background thread, so the first read doesn't have to wait for the model.
+
+    Each backend has a pillow entry point (read) and a numpy one (readArray). The numpy one passes bgr/gray arrays
+    to the backend as they are, instead of converting them to pillow images (or png bytes for paddleocr) first.
+    '''
+    backends = ["ocrmac", "paddleocr", "easyocr"]
+
+    #strict: only load the preferred backend, instead of falling back to the others
+    def __init__(self, preferred="auto", strict=False):
+        self.preferred = preferred
+        self.strict = strict
+        self.name = None
+        self.func = None
+        self.arrayFunc = None
+        self._lock = threading.Lock()
+        self.loadTime = None
+        self.firstCallTime = None
+        self.failed = {} #backend: error
+
+    def setPreferred(self, preferred):
+        if preferred not in self.backends:
+            preferred = "auto"
+        if preferred == self.preferred:
+            return
+        with self._lock:
+            self.preferred = preferred
+            #switch on the next read if another backend is loaded
+            if self.name is not None and preferred != "auto" and preferred != self.name:
+                self.name = None
+                self.func = None
+                self.arrayFunc = None
+
+    def loadOcrmac(self):
+        global ocrmac, useLangPref
+        from ocrmac import ocrmac
+        try:
+            ocrMac_(Image.new("RGB", (10, 10)))
+        except Exception as e:
+            print(e)
+            print("Language Preferences for ocrmac is disabled")
+            useLangPref = False
+        return ocrMac_, ocrMacArray
+
+    def loadPaddle(self):
+        global ocrP
         from paddleocr import PaddleOCR
         ocrP = PaddleOCR(lang='en', show_log = False, use_angle_cls=False)
-        print("Imported paddleocr")
-        ocrLib = "paddleocr"
-    except:
+        return ocrPaddle, ocrPaddleArray
+
+    def loadEasy(self):
+        global easyocrReader
         import easyocr
         import ssl
         ssl._create_default_https_context = ssl._create_unverified_context
-        print("Imported easyocr")
         easyocrReader = easyocr.Reader(['en'])
-        ocrLib = "easyocr"
+        return ocrEasy, ocrEasyArray
+
+    #load the backend if it isn't loaded yet. Returns the pillow and numpy ocr functions
+    def load(self):
+        global ocrLib
+        if self.func is not None:
+            return self.func, self.arrayFunc
+        with self._lock:
+            if self.func is not None:
+                return self.func, self.arrayFunc
+            order = self.backends
+            if self.preferred in self.backends:
+                order = [self.preferred] if self.strict else [self.preferred] + [x for x in self.backends if x != self.preferred]
+            loaders = {"ocrmac": self.loadOcrmac, "paddleocr": self.loadPaddle, "easyocr": self.loadEasy}
+            for name in order:
+                st = time.perf_counter()
+                try:
+                    func, arrayFunc = loaders[name]()
+                except Exception as e:
+                    self.failed[name] = str(e)
+                    continue
+                self.loadTime = time.perf_counter() - st
+                self.name = name
+                ocrLib = name
+                self.func = func
+                self.arrayFunc = arrayFunc
+                print(f"Loaded {name} in {self.loadTime:.2f}s")
+                if self.preferred not in ("auto", name):
+                    print(f"Could not load {self.preferred} ({self.failed.get(self.preferred)}), using {name} instead")
+                return func, arrayFunc
+        raise ImportError(f"No ocr backend could be loaded: {self.failed}")
+
+    def call(self, func, img):
+        if self.firstCallTime is None:
+            st = time.perf_counter()
+            out = func(img)
+            self.firstCallTime = time.perf_counter() - st
+            return out
+        return func(img)
+
+    def read(self, img):
+        return self.call(self.load()[0], img)
+
+    def readArray(self, arr):
+        return self.call(self.load()[1], arr)
+
+    def warmUp(self):
+        def run():
+            try:
+                self.read(Image.new("RGB", (10, 10)))
+            except Exception as e:
+                print(f"OCR warm up failed: {e}")
+        threading.Thread(target=run, daemon=True).start()
+
+    def getStats(self):
+        return {
+            "backend": self.name,
+            "preferred": self.preferred,
+            "load_s": self.loadTime,
+            "first_call_s": self.firstCallTime,
+            "failed": self.failed,
+        }
+
+ocrBackend = OCRBackendManager()
 
 mw, mh = pag.size()
 screenInfo = getScreenData()
@@ -73,6 +191,36 @@ def ocrEasy(img):
     result = easyocrReader.readtext(img)
     return [[(x[0]), (x[1], x[2])] for x in result]
 
+#numpy (bgr or gray) versions of the backends
+def ocrMacArray(arr):
+    #ocrmac only takes pillow images
+    if arr.ndim == 3:
+        arr = cv2.cvtColor(arr, cv2.COLOR_BGR2RGB)
+    return ocrMac_(Image.fromarray(arr))
+
+def ocrPaddleArray(arr):
+    #paddleocr takes bgr and gray arrays directly
+    return ocrP.ocr(arr, cls=False)[0]
+
+def ocrEasyArray(arr):
+    result = easyocrReader.readtext(arr)
+    return [[(x[0]), (x[1], x[2])] for x in result]
+
+#cv2 versions of the preprocessing done on pillow images before the ocr
+#threshold: (lower, upper) colour range to keep as white text, eg ([242, 242, 242], [245, 245, 245])
+#invert: make the text black on white
+#scale: upscale factor (lanczos, like the pillow resize)
+def preprocessArray(arr, threshold=None, invert=False, scale=1):
+    if arr.ndim == 3 and arr.shape[2] == 4:
+        arr = cv2.cvtColor(arr, cv2.COLOR_BGRA2BGR)
+    if threshold is not None:
+        arr = cv2.inRange(arr, np.array(threshold[0]), np.array(threshold[1]))
+    if invert:
+        arr = cv2.bitwise_not(arr)
+    if scale != 1:
+        arr = cv2.resize(arr, (arr.shape[1]*scale, arr.shape[0]*scale), interpolation=cv2.INTER_LANCZOS4)
+    return np.ascontiguousarray(arr)
+
 def screenshot(**kwargs):
     out = None
     for _ in range(4):
@@ -101,13 +249,13 @@ def imToString(m):
     elif m == "egg shop":
         cap = screenshot(region=(ww//(1.2*xsm),wh//(3*ysm),ww-ww//1.2,wh//5))
     elif m == "blue":
-        cap = mssScreenshot(mw*3//4, mh//3*2, mw//4,mh//3)
+        cap = Image.fromarray(captureService.getRegion((mw*3//4, mh//3*2, mw//4,mh//3))[:, :, 2::-1])
     elif m == "chat":
         cap = screenshot(region=(ww*3//4, 0, ww//4,wh//3))
     elif m == "ebutton":
         #cap = screenshot(region=(ww//(2.65*xsm),ebY,ww//(21*xlm),wh//(17*ylm)))
         cap = mssScreenshot(mw//2-200,20,400,125)
-        result = ocrFunc(cap)
+        result = ocrCache.read("ebutton", cap, ocrFunc)
         try:
             result = sorted(result, key = lambda x: x[1][1], reverse = True)
             return result[0][1][0]
@@ -116,7 +264,7 @@ def imToString(m):
     elif m == "honey":
         cap = mssScreenshot(mw//2-241, honeyY, 140, 36)
         if not cap: return ""
-        ocrres = ocrFunc(cap)
+        ocrres = ocrCache.read("honey", cap, ocrFunc)
         honey = ""
         try:
             result = ''.join([x[1][0] for x in ocrres])
@@ -135,7 +283,11 @@ def imToString(m):
     elif m == "dialog":
         cap = screenshot(region=(ww//(3*xsm),wh//(1.6*ysm),ww//(8*xlm),wh//(ylm*15)))
     if not cap: return ""
-    result = ocrFunc(cap)
+    #the blue texts stay on screen for a while, so the same crop is often read multiple times
+    if m == "blue":
+        result = ocrCache.read("blue", cap, ocrFunc)
+    else:
+        result = ocrFunc(cap)
     try:
         result = sorted(result, key = lambda x: x[1][1], reverse = True)
         out = ''.join([x[1][0] for x in result])
@@ -160,17 +312,64 @@ def ocrRead(img):
     if out is None:
         return [[[""],["",0]]]
     return out
-    
-if ocrLib == "ocrmac":
-    ocrFunc = ocrMac_
-    try:
-        ocrFunc(mssScreenshot(1,1,10,10))
-    except Exception as e:
-        print(e)
-        print("Language Preferences for ocrmac is disabled")
-        useLangPref = False
-elif ocrLib == "paddleocr":
-    ocrFunc = ocrPaddle
-elif ocrLib == "easyocr":
-    ocrFunc = ocrEasy
 
+#same as ocrRead, but returns the previous result if the crop has not changed since it was last read
+#kind: name of the region being read, eg "honey". Crops of different kinds never share results
+def ocrReadCached(img, kind):
+    return ocrCache.read(kind, img, ocrRead)
+
+#accept bgr(a)/gray numpy arrays. See preprocessArray for the preprocessing options
+def ocrReadArray(arr, **preprocess):
+    out = ocrBackend.readArray(preprocessArray(arr, **preprocess))
+    if out is None:
+        return [[[""],["",0]]]
+    return out
+
+#ocrReadArray with the ocr cache. The cache key is taken from the array before preprocessing
+def ocrReadArrayCached(arr, kind, **preprocess):
+    return ocrCache.read(kind, arr, lambda x: ocrReadArray(x, **preprocess))
+
+#run the ocr on a pillow img with the loaded backend (loading it if needed)
+def ocrFunc(img):
+    return ocrBackend.read(img)
+
+
+def benchmarkArrayInput(runs=200, includeOCR=False):
+    '''
+    Compare the per call overhead of the pillow path (array -> pillow -> invert -> resize -> backend input)
+    against the numpy path (cv2 preprocessing, array passed to the backend), for each backend.
+    The ocr itself is not included unless includeOCR is set, in which case the loaded backend is also timed end to end
+    '''
+    from modules.misc.benchmark import timeCall, formatTable
+    from PIL import ImageOps
+    #a buff count sized text mask (retina)
+    mask = np.zeros((36, 50), dtype=np.uint8)
+    cv2.putText(mask, "123", (2, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.9, 255, 2)
+
+    def pillowPreprocess():
+        img = ImageOps.invert(Image.fromarray(mask))
+        return img.resize((img.width * 3, img.height * 3), Image.LANCZOS)
+
+    def pngBytes(img):
+        out = io.BytesIO()
+        img.save(out, format='PNG')
+        return out.getvalue()
+
+    #the conversion each backend's entry point does before running the model
+    inputs = {
+        "ocrmac": (lambda: pillowPreprocess(), lambda: Image.fromarray(preprocessArray(mask, invert=True, scale=3))),
+        "paddleocr": (lambda: pngBytes(pillowPreprocess()), lambda: preprocessArray(mask, invert=True, scale=3)),
+        "easyocr": (lambda: np.asarray(pillowPreprocess()), lambda: preprocessArray(mask, invert=True, scale=3)),
+    }
+    rows = []
+    for name, (legacy, new) in inputs.items():
+        legacyStats, _ = timeCall(legacy, runs)
+        newStats, _ = timeCall(new, runs)
+        rows.append({"backend": name, "path": "input only", "pillow_ms": legacyStats["p50_ms"], "numpy_ms": newStats["p50_ms"], "saved_ms": legacyStats["p50_ms"]-newStats["p50_ms"]})
+    if includeOCR:
+        ocrBackend.load()
+        legacyStats, _ = timeCall(lambda: ocrRead(pillowPreprocess()), max(1, runs//10))
+        newStats, _ = timeCall(lambda: ocrReadArray(mask, invert=True, scale=3), max(1, runs//10))
+        rows.append({"backend": ocrBackend.name, "path": "with ocr", "pillow_ms": legacyStats["p50_ms"], "numpy_ms": newStats["p50_ms"], "saved_ms": legacyStats["p50_ms"]-newStats["p50_ms"]})
+    print(formatTable(rows))
+    return rows
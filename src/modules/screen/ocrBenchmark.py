@@ -0,0 +1,157 @@
+'''
+Compare the ocr backends (and the fast paths in front of them) on crops the macro actually reads.
+
+The corpus is a folder with one sub folder per region (eg honey, blue, ebutton, quest, buff count, inventory),
+each with its png crops and a labels.txt of "filename,text" lines.
+
+python -m modules.screen.ocrBenchmark path/to/corpus [--backends ocrmac easyocr] [--runs 3] [--out results.json]
+'''
+import argparse
+import json
+import os
+import time
+import cv2
+from modules.misc.benchmark import percentile, formatTable
+
+#regions that only contain a number, where the digit reader can be used
+digitModes = ["honey", "buff count", "quantity"]
+
+def loadCorpus(path):
+    corpus = {}
+    for mode in sorted(os.listdir(path)):
+        labelsPath = os.path.join(path, mode, "labels.txt")
+        if not os.path.isfile(labelsPath):
+            continue
+        crops = []
+        with open(labelsPath, "r") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if not line or "," not in line:
+                    continue
+                name, text = line.split(",", 1)
+                img = cv2.imread(os.path.join(path, mode, name), cv2.IMREAD_UNCHANGED)
+                if img is None:
+                    print(f"Could not read {mode}/{name}")
+                    continue
+                crops.append((name, img, text))
+        if crops:
+            corpus[mode] = crops
+    return corpus
+
+def normalize(text, mode):
+    text = text.lower()
+    if mode in digitModes:
+        #the macro only keeps the digits of these
+        return ''.join(x for x in text if x.isdigit())
+    return ' '.join(text.split())
+
+def editDistance(a, b):
+    prev = list(range(len(b)+1))
+    for i, ca in enumerate(a, 1):
+        curr = [i]
+        for j, cb in enumerate(b, 1):
+            curr.append(min(prev[j]+1, curr[j-1]+1, prev[j-1]+(ca != cb)))
+        prev = curr
+    return prev[-1]
+
+def charAccuracy(pred, label):
+    if not label:
+        return 1.0 if not pred else 0.0
+    return max(0.0, 1 - editDistance(pred, label)/len(label))
+
+#returns {name: function(bgr/gray array) -> text} for every backend that can be loaded
+def getBackends(names=None):
+    from modules.screen import ocr
+    impls = {}
+    for name in names or ocr.OCRBackendManager.backends:
+        manager = ocr.OCRBackendManager(name, strict=True)
+        try:
+            manager.load()
+        except ImportError:
+            pass
+        if manager.name != name:
+            print(f"{name} is not available: {manager.failed.get(name)}")
+            continue
+        impls[name] = lambda img, manager=manager: ''.join(x[1][0] for x in (manager.readArray(ocr.preprocessArray(img)) or []))
+    return impls
+
+def timeImpl(func, crops, mode, runs):
+    latencies = []
+    charAcc = 0
+    fieldAcc = 0
+    unread = 0
+    st = time.perf_counter()
+    for name, img, label in crops:
+        pred = ""
+        for _ in range(runs):
+            callStart = time.perf_counter()
+            pred = func(img)
+            latencies.append(time.perf_counter()-callStart)
+        if pred is None or pred == "":
+            unread += 1
+            pred = ""
+        pred = normalize(pred, mode)
+        label = normalize(label, mode)
+        charAcc += charAccuracy(pred, label)
+        fieldAcc += pred == label
+    total = time.perf_counter()-st
+    n = max(1, len(crops))
+    return {
+        "crops": len(crops),
+        "p50_ms": percentile(latencies, 50)*1000,
+        "p95_ms": percentile(latencies, 95)*1000,
+        "crops_per_s": len(latencies)/max(total, 1e-9),
+        "char_accuracy": charAcc/n,
+        "field_accuracy": fieldAcc/n,
+        "unread": unread/n,
+    }
+
+def runBenchmark(corpus, backends=None, runs=3, fastPaths=True):
+    '''
+    corpus: path or the output of loadCorpus
+    Returns a list of result rows (one per region and implementation)
+    '''
+    if isinstance(corpus, str):
+        corpus = loadCorpus(corpus)
+    impls = getBackends(backends)
+    rows = []
+    for mode, crops in corpus.items():
+        for name, func in impls.items():
+            rows.append({"mode": mode, "impl": name, **timeImpl(func, crops, mode, runs)})
+            if not fastPaths:
+                continue
+            #a crop that has not changed since it was last read only costs a cache lookup
+            from modules.screen.ocrCache import OCRCache
+            cache = OCRCache(maxSize=len(crops)+1)
+            for _, img, _ in crops:
+                cache.read(mode, img, func)
+            rows.append({"mode": mode, "impl": f"{name}+cache (unchanged crops)", **timeImpl(lambda img: cache.read(mode, img, func), crops, mode, runs)})
+
+        if fastPaths and mode in digitModes:
+            #digit reader with the learnt glyph set, without the ocr fallback. unread is the fallback rate
+            from modules.screen.digitReader import digitReader, whiteTextMask
+            def readDigits(img):
+                mask = img if img.ndim == 2 else whiteTextMask(img)
+                return digitReader.read(mask)
+            rows.append({"mode": mode, "impl": "digitReader", **timeImpl(readDigits, crops, mode, runs)})
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ocr backends on a labelled crop corpus")
+    parser.add_argument("corpus", help="folder with a sub folder (png crops + labels.txt) per region")
+    parser.add_argument("--backends", nargs="*", default=None, help="backends to test (default: all available)")
+    parser.add_argument("--runs", type=int, default=3, help="number of times each crop is read")
+    parser.add_argument("--no-fast-paths", action="store_true", help="skip the ocr cache and digit reader")
+    parser.add_argument("--out", default="./data/user/ocr_benchmark.json", help="where to save the json results")
+    args = parser.parse_args()
+
+    rows = runBenchmark(args.corpus, args.backends, args.runs, not args.no_fast_paths)
+    print(formatTable(rows))
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({"time": time.time(), "corpus": os.path.abspath(args.corpus), "runs": args.runs, "results": rows}, f, indent=2)
+        print(f"Saved results to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import threading
+import time
+import hashlib
+from collections import OrderedDict
+import cv2
+import numpy as np
+from PIL import Image
+
+class OCRCache:
+    '''
+    Caches ocr results of screen crops that rarely change between calls (honey counter, text beside E, blue texts, buff counts...)
+    Crops are keyed by a perceptual hash: the crop is converted to grayscale, shrunk and binarized (otsu threshold),
+    so a crop with the same text gives the same key even if a few pixels flicker, while a changed digit gives a different one.
+    The key also includes the kind of region, so different regions never share results.
+
+    Entries expire after ttl seconds and the least recently used entries are dropped once there are more than maxSize.
+    '''
+
+    def __init__(self, maxSize=256, ttl=30, hashWidth=160):
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.hashWidth = hashWidth
+        self._lock = threading.Lock()
+        #key: (result, timestamp)
+        self.entries = OrderedDict()
+
+        #stats, per kind
+        self.hits = {}
+        self.misses = {}
+        self.expired = {}
+        self.ocrTime = {} #total time spent on ocr for misses
+        self.savedTime = {} #estimated time saved by hits (average ocr time of that kind)
+
+    #convert a pillow image or array to a grayscale array
+    def toGray(self, img):
+        if isinstance(img, Image.Image):
+            if img.mode != "L":
+                img = img.convert("L")
+            return np.asarray(img)
+        arr = np.asarray(img)
+        if arr.ndim == 2:
+            return arr
+        if arr.shape[2] == 4:
+            return cv2.cvtColor(arr, cv2.COLOR_BGRA2GRAY)
+        return cv2.cvtColor(arr, cv2.COLOR_BGR2GRAY)
+
+    def getKey(self, kind, img):
+        gray = self.toGray(img)
+        h, w = gray.shape[:2]
+        if not h or not w:
+            return (kind, (h, w), b"")
+        #shrink large crops. Small crops (eg buff counts) are kept at full size so single digits still change the hash
+        if w > self.hashWidth:
+            small = cv2.resize(gray, (self.hashWidth, max(1, round(h*self.hashWidth/w))), interpolation=cv2.INTER_AREA)
+        else:
+            small = gray
+        _, binary = cv2.threshold(np.ascontiguousarray(small), 0, 1, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        digest = hashlib.blake2b(np.packbits(binary).tobytes(), digest_size=16).digest()
+        return (kind, (h, w), digest)
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            result, timestamp = entry
+            if time.time() - timestamp > self.ttl:
+                del self.entries[key]
+                self.expired[key[0]] = self.expired.get(key[0], 0) + 1
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, result):
+        with self._lock:
+            self.entries[key] = (result, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+
+    #run ocrFunc on the image, or return the cached result if the crop has not changed
+    #kind: name of the region, eg "honey"
+    def read(self, kind, img, ocrFunc):
+        key = self.getKey(kind, img)
+        entry = self.get(key)
+        if entry is not None:
+            with self._lock:
+                self.hits[kind] = self.hits.get(kind, 0) + 1
+                self.savedTime[kind] = self.savedTime.get(kind, 0) + self.ocrTime.get(kind, 0)/max(1, self.misses.get(kind, 0))
+            return entry[0]
+
+        st = time.perf_counter()
+        result = ocrFunc(img)
+        duration = time.perf_counter() - st
+        with self._lock:
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+            self.ocrTime[kind] = self.ocrTime.get(kind, 0) + duration
+        self.set(key, result)
+        return result
+
+    def invalidate(self, kind=None):
+        with self._lock:
+            if kind is None:
+                self.entries.clear()
+            else:
+                for key in [k for k in self.entries if k[0] == kind]:
+                    del self.entries[key]
+
+    def getStats(self):
+        with self._lock:
+            kinds = sorted(set(self.hits) | set(self.misses))
+            out = {}
+            for kind in kinds:
+                hits = self.hits.get(kind, 0)
+                misses = self.misses.get(kind, 0)
+                out[kind] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "expired": self.expired.get(kind, 0),
+                    "hit_rate": hits/max(1, hits+misses),
+                    "avg_ocr_ms": self.ocrTime.get(kind, 0)/max(1, misses)*1000,
+                    "saved_s": self.savedTime.get(kind, 0),
+                }
+            return out
+
+    def formatStats(self):
+        stats = self.getStats()
+        if not stats:
+            return "OCR cache: no reads"
+        hits = sum(x["hits"] for x in stats.values())
+        misses = sum(x["misses"] for x in stats.values())
+        saved = sum(x["saved_s"] for x in stats.values())
+        perKind = ", ".join(f"{kind} {x['hits']}/{x['hits']+x['misses']} ({x['avg_ocr_ms']:.0f}ms/ocr)" for kind, x in stats.items())
+        return f"OCR cache: {hits} hits, {misses} misses ({hits/max(1, hits+misses)*100:.0f}% hit rate), ~{saved:.1f}s of ocr saved. {perKind}"
+
+#one ocr cache per process
+ocrCache = OCRCache()
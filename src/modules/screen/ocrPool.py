@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import cv2
+import numpy as np
+from PIL import Image
+
+#ocr module used by the workers. Imported once, so the ocr model stays loaded
+workerOCR = None
+
+def initWorker():
+    global workerOCR
+    from modules.screen import ocr
+    workerOCR = ocr
+
+def ocrBatch(images):
+    #runs in a worker thread. Returns the ocr results and the time spent on ocr
+    if workerOCR is None:
+        initWorker()
+    st = time.perf_counter()
+    out = []
+    for img in images:
+        out.append(workerOCR.ocrReadArray(img))
+    return out, time.perf_counter()-st
+
+class OCRPool:
+    '''
+    Runs ocr in background threads so the macro can keep scrolling/walking while the text is read.
+    submit/submitBatch return futures. A batch is sent to one worker as a single task, so many small crops
+    (eg quest objectives) are queued together.
+
+    The macro runs in a daemon process, which can't start child processes, so the workers are threads.
+    The ocr model is loaded once and stays loaded between requests. There is one worker by default, since the ocr
+    backends aren't guaranteed to be thread safe. The ocr still overlaps with the caller, it just isn't run in parallel.
+    '''
+
+    def __init__(self, workers=1, latencySamples=200):
+        self.workers = workers
+        self.executor = None
+        self.mode = None
+        self._lock = threading.Lock()
+
+        #stats
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=latencySamples) #time from submit to result, per request
+        self.ocrTime = 0 #time spent in the workers
+
+    def start(self):
+        with self._lock:
+            if self.executor is not None:
+                return
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, initializer=initWorker)
+            self.mode = "thread"
+        print(f"OCR pool started ({self.workers} workers)")
+
+    #load the ocr model in the background, so the first real request doesn't wait for it
+    def warmUp(self):
+        self.start()
+        return self.executor.submit(ocrBatch, [np.zeros((8, 8, 3), dtype=np.uint8)])
+
+    #images are converted to arrays like the screenshots (bgr(a) or gray), which is what the ocr reads
+    def toArray(self, img):
+        if isinstance(img, Image.Image):
+            if img.mode == "L":
+                return np.asarray(img)
+            return cv2.cvtColor(np.asarray(img.convert("RGB")), cv2.COLOR_RGB2BGR)
+        return img
+
+    #submit a list of images. Returns a future of the list of ocr results (same format as ocr.ocrRead)
+    def submitBatch(self, images):
+        self.start()
+        images = [self.toArray(x) for x in images]
+        out = Future()
+        if not images:
+            out.set_result([])
+            return out
+        st = time.perf_counter()
+        with self._lock:
+            self.submitted += len(images)
+
+        def done(future):
+            with self._lock:
+                self.completed += len(images)
+                try:
+                    results, duration = future.result()
+                except Exception as e:
+                    self.failed += len(images)
+                    out.set_exception(e)
+                    return
+                self.ocrTime += duration
+                self.latencies.append(time.perf_counter()-st)
+            out.set_result(results)
+        self.executor.submit(ocrBatch, images).add_done_callback(done)
+        return out
+
+    #submit a single image. Returns a future of the ocr result
+    def submit(self, img):
+        out = Future()
+        def done(future):
+            try:
+                out.set_result(future.result()[0])
+            except Exception as e:
+                out.set_exception(e)
+        self.submitBatch([img]).add_done_callback(done)
+        return out
+
+    #blocking ocr of a list of images
+    def map(self, images, timeout=None):
+        return self.submitBatch(images).result(timeout)
+
+    def getQueueDepth(self):
+        return self.submitted - self.completed
+
+    def getStats(self):
+        from modules.misc.benchmark import percentile
+        with self._lock:
+            latencies = list(self.latencies)
+            return {
+                "mode": self.mode,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "queue_depth": self.submitted - self.completed,
+                "p50_latency_ms": percentile(latencies, 50)*1000,
+                "p95_latency_ms": percentile(latencies, 95)*1000,
+                "avg_ocr_ms": self.ocrTime/max(1, self.completed)*1000,
+            }
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=wait, cancel_futures=True)
+                self.executor = None
+
+#one ocr pool per process, started on first use
+ocrPool = OCRPool()
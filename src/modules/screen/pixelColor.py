@@ -1,12 +1,5 @@
-import mss 
-import mss.darwin
-mss.darwin.IMAGE_OPTIONS = 0
-import numpy as np
-def getPixelColor(X1,Y1):
-    region = {'top': Y1, 'left': X1, 'width': 1, 'height': 1}
-    
-    with mss.mss() as sct:
-        img = sct.grab(region)
-        im = np.array(img)
-        col = tuple(int(c) for c in im[0,0])[:-1][::-1]
-        return col
+from modules.screen.capture import captureService
+
+#uses the shared capture service, so multiple pixel reads in the same tick only take one screenshot
+def getPixelColor(X1,Y1, maxAge=None):
+    return captureService.getPixel(X1, Y1, maxAge)
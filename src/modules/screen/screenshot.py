@@ -1,22 +1,25 @@
-import mss
-import mss.darwin
-mss.darwin.IMAGE_OPTIONS = 0
 from PIL import Image
-import mss.tools
-import time
-import pyautogui as pag
 import numpy as np
 import cv2
 import time
 import os
 import tempfile
 import subprocess
-import Quartz.CoreGraphics as CG
-from modules.screen.screenData import getScreenData
-from modules.misc.appManager import getWindowSize
+from modules.screen.captureBackend import getCaptureBackend
+
+#mss, pyautogui and the screen data are only needed by the live screen backend, so they are imported when first used
+#instead of at import time. This lets the vision code run against the replay backend on machines without them
+def getScreenSize():
+    return getCaptureBackend().size()
+
+#mw, mh (screen size in points) and multi (pixels per point) are looked up on first access
+def __getattr__(name):
+    if name in ("mw", "mh"):
+        return getScreenSize()[name == "mh"]
+    if name == "multi":
+        return getCaptureBackend().scale
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-mw, mh = pag.size()
-multi = 2 if getScreenData()["display_type"] == "retina" else 1
 '''
 Theres an issue for a few people where the mss screenshot takes almost a minute to run in the macro process.
 This seems to affect any screenshots taken with quartz, but not those taken with filepath
@@ -37,6 +40,7 @@ def pillowGrab(x,y,w,h):
     return im_cropped
 
 def cgGrab(region=None):
+    import Quartz.CoreGraphics as CG
     # Set up the screen capture rectangle
     if region:
         left, top, width, height = region
@@ -73,48 +77,47 @@ def cgGrab(region=None):
 #returns an NP array, useful for cv2
 def mssScreenshotNP(x,y,w,h, save = False):
     #return cgGrab((x,y,w,h))
-    if usePillow:
+    return grabBGRA(x,y,w,h, save)
+
+#grab a region as a bgra NP array from the active capture backend
+def grabBGRA(x,y,w,h, save = False, filename = None):
+    backend = getCaptureBackend()
+    if usePillow and backend.name == "mss":
+        multi = backend.scale
         screen = pillowGrab(int(x*multi),int(y*multi),int(w*multi),int(h*multi))
         screen = np.array(screen)
         screen_bgra = cv2.cvtColor(screen, cv2.COLOR_RGB2BGRA)
-        return screen_bgra
-
     else:
-        with mss.mss() as sct:
-            # The screen part to capture
-            monitor = {"left": int(x), "top": int(y), "width": int(w), "height": int(h)}
-            # Grab the data and convert to opencv img
-            sct_img = sct.grab(monitor)
-            if save: mss.tools.to_png(sct_img.rgb, sct_img.size, output=f"screen-{time.time()}.png")
-            return np.array(sct_img)
+        screen_bgra = backend.grab(x,y,w,h)
+    if save: cv2.imwrite(filename if filename else f"screen-{time.time()}.png", screen_bgra)
+    return screen_bgra
 
 
-def mssScreenshot(x=0,y=0,w=mw,h=mh, save = False, filename=None):
+def mssScreenshot(x=0,y=0,w=None,h=None, save = False, filename=None):
+    if w is None or h is None:
+        mw, mh = getScreenSize()
+        w = mw if w is None else w
+        h = mh if h is None else h
     # img = cgGrab((x,y,w,h))
     # img = img[:, :, [2, 1, 0]]
     # img = Image.fromarray(img, 'RGB')
     # return img
-    if usePillow:
+    backend = getCaptureBackend()
+    if usePillow and backend.name == "mss":
+        multi = backend.scale
         return pillowGrab(int(x*multi),int(y*multi),int(w*multi),int(h*multi))
-    else:
-        with mss.mss() as sct:
-            # The screen part to capture
-            monitor = {"left": int(x), "top": int(y), "width": int(w), "height": int(h)}
-            # Grab the data and convert to pillow img
-            sct_img = sct.grab(monitor)
-            img = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
-            if save: mss.tools.to_png(sct_img.rgb, sct_img.size, output=filename if filename else f"screen-{time.time()}.png")
-            return img
+    screen = grabBGRA(x,y,w,h, save, filename)
+    return Image.fromarray(cv2.cvtColor(screen, cv2.COLOR_BGRA2RGB))
 
 def screenshotRobloxWindow(filename = None, regionMultipliers = None):
+    from modules.misc.appManager import getWindowSize
     res = getWindowSize("roblox roblox")
     if res:
         x,y,w,h = res
     else:
         x = 0
         y = 0
-        w = mw
-        h = mh
+        w, h = getScreenSize()
     if regionMultipliers:
         x = x*regionMultipliers[0] if regionMultipliers[0] <= 1 else regionMultipliers[0]
         y *= y*regionMultipliers[1] if regionMultipliers[1] <= 1 else regionMultipliers[1]
@@ -125,6 +128,9 @@ def screenshotRobloxWindow(filename = None, regionMultipliers = None):
 def benchmarkMSS():
     global usePillow
     try:
+        import mss
+        import mss.darwin
+        mss.darwin.IMAGE_OPTIONS = 0
         with mss.mss() as sct:
             monitor = {"left": 0, "top": 0, "width": 100, "height": 100}
             start = time.time()
@@ -143,10 +149,11 @@ def benchmarkMSS():
     return False
 
 #returns a rgba pillow screenshot
-def mssScreenshotPillowRGBA(x=0,y=0,w=mw,h=mh):   
-    with mss.mss() as sct:
-        monitor = {"left": int(x), "top": int(y), "width": int(w), "height": int(h)}
-        sct_img = sct.grab(monitor)
-        img = Image.frombytes("RGBA", sct_img.size, sct_img.bgra, "raw", "BGRA")
-        #img.save(f"buff_area.png")
-        return img
\ No newline at end of file
+def mssScreenshotPillowRGBA(x=0,y=0,w=None,h=None):
+    if w is None or h is None:
+        mw, mh = getScreenSize()
+        w = mw if w is None else w
+        h = mh if h is None else h
+    img = Image.fromarray(cv2.cvtColor(getCaptureBackend().grab(x,y,w,h), cv2.COLOR_BGRA2RGBA))
+    #img.save(f"buff_area.png")
+    return img
\ No newline at end of file
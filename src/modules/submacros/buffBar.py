@@ -0,0 +1,156 @@
+import cv2
+import numpy as np
+import time
+import hashlib
+from collections import OrderedDict
+
+class BuffBarParser:
+    '''
+    Reads every uptime buff from one screenshot of the buff bar.
+    Instead of running inRange once per buff colour, every pixel is labelled in a single pass:
+    each (colour, variation) pair is a bit, and per channel lookup tables give the bits that a channel value falls in.
+    The buff searches then only need to pick their bit out of the label plane.
+
+    Stack counts are only read (with ocr) when the text in the buff has changed since it was last read.
+    '''
+
+    #(buff colour name, variation) pairs that are searched for
+    colorClasses = [
+        ("baby_love", 0),
+        ("haste", 0),
+        ("melody", 12),
+        ("focus", 0),
+        ("bomb_combo", 0),
+        ("balloon_aura", 0),
+        ("boost", 0),
+        ("blue_boost", 20),
+        ("red_boost", 20),
+        ("inspire", 0),
+    ]
+
+    def __init__(self, buffDetector, hourlyReport, countCacheSize=128):
+        self.buffDetector = buffDetector
+        self.hourlyReport = hourlyReport
+        self.robloxWindow = buffDetector.robloxWindow
+
+        self.bits = {}
+        luts = [np.zeros(256, dtype=np.uint16) for _ in range(3)]
+        for i, (name, variation) in enumerate(self.colorClasses):
+            hex = self.hourlyReport.uptimeBuffsColors[name][0]
+            bgr = [hex & 0xFF, (hex >> 8) & 0xFF, (hex >> 16) & 0xFF]
+            bit = 1 << i
+            self.bits[(name, variation)] = bit
+            for c in range(3):
+                luts[c][max(0, bgr[c]-variation):min(255, bgr[c]+variation)+1] |= bit
+        self.luts = luts
+
+        #hash of the text pixels: stack count
+        self.countCache = OrderedDict()
+        self.countCacheSize = countCacheSize
+        self.countReads = 0
+        self.countCacheHits = 0
+        self.lastParseTime = 0
+
+    def labelColors(self, bgr):
+        return self.luts[0][bgr[:, :, 0]] & self.luts[1][bgr[:, :, 1]] & self.luts[2][bgr[:, :, 2]]
+
+    #same as BuffDetector.detectBuffColorInImage, using the label plane instead of inRange
+    def detect(self, labels, name, x1=0, y1=0, x2=None, y2=None, variation=0, searchDirection=1, instances=1):
+        if x2 is None:
+            x2 = labels.shape[1]
+        if y2 is None:
+            y2 = labels.shape[0]
+        cropped = labels[int(y1):int(y2), max(int(x1),0):int(x2)]
+        if cropped.size == 0:
+            return []
+        mask = np.where(cropped & self.bits[(name, variation)], 255, 0).astype(np.uint8)
+        minSize = self.hourlyReport.uptimeBuffsColors[name][1]
+        return self.buffDetector.getBuffBoxesFromMask(mask, minSize, x1, y1, searchDirection=searchDirection, instances=instances)
+
+    #read the stack count of a buff, reusing the previous result if the text has not changed
+    def readCount(self, buffImg):
+        textMask = cv2.inRange(buffImg, np.array([242, 242, 242]), np.array([245, 245, 245]))
+        key = hashlib.blake2b(textMask.tobytes(), digest_size=16).digest() + bytes(str(textMask.shape), "ascii")
+        self.countReads += 1
+        if key in self.countCache:
+            self.countCache.move_to_end(key)
+            self.countCacheHits += 1
+            return self.countCache[key]
+        value = int(self.buffDetector.getBuffQuantityFromImgTight(buffImg))
+        self.countCache[key] = value
+        if len(self.countCache) > self.countCacheSize:
+            self.countCache.popitem(last=False)
+        return value
+
+    #returns a snapshot of the buffs: {buff name: value}. Buffs that are not active are left out
+    #screen: bgra screenshot of the buff area (BuffDetector.screenshotBuffArea)
+    #nectars: also read the nectar levels from the same screenshot
+    def parse(self, screen=None, nectars=False):
+        st = time.perf_counter()
+        if screen is None:
+            screen = self.buffDetector.screenshotBuffArea()
+        multi = self.robloxWindow.multi
+        bgr = cv2.cvtColor(screen, cv2.COLOR_BGRA2BGR)
+        height, width = bgr.shape[:2]
+        labels = self.labelColors(bgr)
+        snapshot = {}
+
+        if self.detect(labels, "baby_love", y1=30*multi, searchDirection=7):
+            snapshot["baby_love"] = 1
+
+        if self.buffDetector.hasAnyBuff(self.hourlyReport.uptimeBearBuffs, screen=bgr, threshold=0.78):
+            snapshot["bear"] = 1
+
+        for j in ["focus", "bomb_combo", "balloon_aura", "inspire"]:
+            res = self.detect(labels, j, y1=30*multi, y2=50*multi, searchDirection=7)
+            if res:
+                x = res[0]+res[2]
+                x1 = max(0, int(x-25*multi))
+                x2 = min(width, int(x+5*multi))
+                snapshot[j] = self.readCount(bgr[15*multi:50*multi , x1:x2])
+
+        #haste and melody share the same colour
+        x = 0
+        for _ in range(3):
+            res = self.detect(labels, "haste", x, 30*multi, searchDirection=6)
+            if not res:
+                break
+            x = res[0]
+            if self.detect(labels, "melody", x+2*multi, 30, x+34*multi, 40*multi, 12):
+                snapshot["melody"] = 1
+            elif "haste" not in snapshot:
+                x1 = max(0, int(x+6*multi))
+                x2 = min(width, int(x+44*multi))
+                snapshot["haste"] = self.readCount(bgr[15*multi:50*multi , x1:x2])
+            x += 44*multi
+
+        x = width
+        for _ in range(3):
+            res = self.detect(labels, "boost", y1=30*multi, x2=x, searchDirection=7)
+            if not res:
+                break
+            x = res[0]+res[2]
+
+            if len(self.detect(labels, "red_boost", x-30*multi, 15*multi, x-4*multi, 34*multi, 20)):
+                buffType = "red_boost"
+            elif len(self.detect(labels, "blue_boost", x-30*multi, 15*multi, x-4*multi, 34*multi, 20)):
+                buffType = "blue_boost"
+            else:
+                buffType = "white_boost"
+
+            x1 = max(0, x-25*multi)
+            snapshot[buffType] = self.readCount(bgr[15*multi: 50*multi, x1: x])
+            x -= 40*multi
+
+        if nectars:
+            snapshot["nectars"] = dict(zip(self.buffDetector.nectars, self.buffDetector.getNectars(screen)))
+
+        self.lastParseTime = time.perf_counter()-st
+        return snapshot
+
+    def getStats(self):
+        return {
+            "last_parse_ms": self.lastParseTime*1000,
+            "count_reads": self.countReads,
+            "count_cache_hits": self.countCacheHits,
+        }
@@ -1,27 +1,54 @@
-from modules.misc.imageManipulation import pillowToCv2
-from modules.screen.screenshot import mssScreenshot
-from modules.misc.appManager import openApp
+from modules.screen.screenshot import grabBGRA
 from modules.controls.keyboard import keyboard
+from modules.misc.benchmark import percentile
+from collections import deque
 import numpy as np
 import cv2
 import time
-import pyautogui as pag
 from modules.screen.robloxWindow import RobloxWindowBounds
 
-mw, mh = pag.size()
+#the top of the window (hotbar, buffs) is never searched
+topMargin = 100
 
-class fieldDriftCompensation():
-    def __init__(self, robloxWindow: RobloxWindowBounds):
+class SaturatorTracker:
+    '''
+    Finds the saturator on screen, in screen points relative to the roblox window.
+    Keeps a constant velocity model of the saturator (it moves on screen as the player walks) and only searches a
+    region around its predicted position. The region grows with the distance the saturator can move during a detection.
+    The whole window is only searched when there is no previous position, or the saturator isn't fully inside the region.
+
+    latency is a moving average of how long a detection takes, which sets the rate of the control loop
+    '''
+    def __init__(self, robloxWindow: RobloxWindowBounds, roiSize=90, smoothing=0.5):
         self.robloxWindow = robloxWindow
+        self.roiSize = roiSize #half the width/height of the search region, before adding the predicted movement
+        self.smoothing = smoothing
+        self.latency = None
         #double pixel coordinates, double kernel size
         if self.robloxWindow.isRetina:
             self.kernel = cv2.getStructuringElement(cv2.MORPH_RECT,(15,15))
         else:
             self.kernel = cv2.getStructuringElement(cv2.MORPH_RECT,(8,8))
-    
-    #imgSRC is a cv2 img
-    def getSaturatorInImage(self, imgSRC):
-        imgHLS = cv2.cvtColor(imgSRC, cv2.COLOR_BGR2HLS)
+        self.reset()
+
+        #stats
+        self.roiSearches = 0
+        self.roiHits = 0
+        self.fullSearches = 0
+        self.roiTime = 0
+        self.fullTime = 0
+
+    #forget the saturator's position (eg after a loss or when starting a new correction)
+    def reset(self):
+        self.position = None
+        self.velocity = (0, 0)
+        self.t = None
+
+    #bounding box (x,y,w,h) of the saturator in a bgr/bgra image, in pixels
+    def detect(self, img):
+        if img.shape[2] == 4:
+            img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+        imgHLS = cv2.cvtColor(img, cv2.COLOR_BGR2HLS)
 
         sLow = 250
         sHi = 255
@@ -32,139 +59,195 @@ class fieldDriftCompensation():
 
         # Apply thresholds to each channel (H, L, S)
         binary_mask = cv2.inRange(
-            cv2.cvtColor(imgHLS, cv2.COLOR_BGR2HLS),
+            imgHLS,
             np.array([hLow, lLow, sLow], dtype=np.uint8),
             np.array([hHi, lHi, sHi], dtype=np.uint8)
             )
-        
+
         binary_mask = cv2.erode(binary_mask, self.kernel, iterations=1)
         contours, _ = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
         if not contours: return None
         # return the bounding with the largest area
-        x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
-        #display results
-        '''
-        cv2.rectangle(imgSRC, (x, y), (x+w, y+h), (0, 255, 0), 2)
-        imgRST = cv2.bitwise_and(imgHLS, imgMSK)
-        imgBGR = cv2.cvtColor(imgRST, cv2.COLOR_HLS2BGR)
-        cv2.imshow("src", imgSRC)
-        cv2.imshow("result", imgBGR)
-        cv2.waitKey(0)
-        cv2.destroyAllWindows()
-        '''
+        return cv2.boundingRect(max(contours, key=cv2.contourArea))
+
+    #search a region of the window (in points). Returns (center or None, whether it touches the edge of the region, capture time)
+    def search(self, x, y, w, h):
+        rw = self.robloxWindow
+        t = time.perf_counter()
+        img = grabBGRA(rw.mx+x, rw.my+y, w, h)
+        box = self.detect(img)
+        if box is None:
+            return None, False, t
+        scale = img.shape[1]/w
+        bx, by, bw, bh = [v/scale for v in box]
+        onEdge = bx <= 1 or by <= 1 or bx+bw >= w-1 or by+bh >= h-1
+        return (x+bx+bw/2, y+by+bh/2), onEdge, t
+
+    #where the saturator is expected to be after dt seconds
+    def predict(self, dt=0):
+        if self.position is None:
+            return None
+        return (self.position[0]+self.velocity[0]*dt, self.position[1]+self.velocity[1]*dt)
+
+    def locate(self):
+        rw = self.robloxWindow
+        st = time.perf_counter()
+        location = None
+        if self.position is not None:
+            px, py = self.predict(st-self.t)
+            margin = self.roiSize + max(abs(self.velocity[0]), abs(self.velocity[1]))*(self.latency or 0)
+            x1, y1 = max(0, int(px-margin)), max(topMargin, int(py-margin))
+            x2, y2 = min(int(rw.mw), int(px+margin)), min(int(rw.mh), int(py+margin))
+            if x2 > x1 and y2 > y1:
+                self.roiSearches += 1
+                location, onEdge, t = self.search(x1, y1, x2-x1, y2-y1)
+                #part of the saturator is outside the region, its center can't be trusted
+                if onEdge:
+                    location = None
+                if location is not None:
+                    self.roiHits += 1
+                self.roiTime += time.perf_counter()-st
+        if location is None:
+            self.fullSearches += 1
+            fst = time.perf_counter()
+            location, _, t = self.search(0, topMargin, int(rw.mw), int(rw.mh)-topMargin)
+            self.fullTime += time.perf_counter()-fst
+        self.update(location, t, time.perf_counter()-st)
+        return location
+
+    def update(self, location, t, latency):
+        self.latency = latency if self.latency is None else self.latency + self.smoothing*(latency-self.latency)
+        if location is None:
+            self.reset()
+            return
+        if self.position is not None and t > self.t:
+            vx = (location[0]-self.position[0])/(t-self.t)
+            vy = (location[1]-self.position[1])/(t-self.t)
+            self.velocity = (self.velocity[0] + self.smoothing*(vx-self.velocity[0]), self.velocity[1] + self.smoothing*(vy-self.velocity[1]))
+        self.position = location
+        self.t = t
+
+    def getStats(self):
+        return {
+            "roi_searches": self.roiSearches,
+            "roi_hit_rate": self.roiHits/max(1, self.roiSearches),
+            "full_searches": self.fullSearches,
+            "avg_roi_ms": self.roiTime/max(1, self.roiSearches)*1000,
+            "avg_full_ms": self.fullTime/max(1, self.fullSearches)*1000,
+            "latency_ms": (self.latency or 0)*1000,
+        }
+
+class fieldDriftCompensation():
+    '''
+    Walks back to the saturator after gathering.
+    With fast detections, the movement keys are held and each axis is released when the saturator is predicted to be in
+    the center of the screen by the time the next detection finishes (natro's field drift compensation, with prediction).
+    Above slowLatency, holding keys overshoots, so the player moves in short steps instead.
+    The loop runs once per detection, and at most every minPeriod seconds
+    '''
+    def __init__(self, robloxWindow: RobloxWindowBounds, slowLatency=0.25, minPeriod=0.02, maxTime=5, history=200):
+        self.robloxWindow = robloxWindow
+        self.tracker = SaturatorTracker(robloxWindow)
+        self.slowLatency = slowLatency
+        self.minPeriod = minPeriod
+        self.maxTime = maxTime
+        self.corrections = deque(maxlen=history)
+
+    #imgSRC is a cv2 img
+    def getSaturatorInImage(self, imgSRC):
+        box = self.tracker.detect(imgSRC)
+        if box is None: return None
+        x, y, w, h = box
         #get the center and return its coordinates
         return (x+w//2, y+h//2)
 
     def getSaturatorLocation(self):
-        saturatorLocation = self.getSaturatorInImage(pillowToCv2(mssScreenshot(self.robloxWindow.mx,self.robloxWindow.my+100, self.robloxWindow.mw, self.robloxWindow.mh-100)))
-        if saturatorLocation is None: return None
-        x,y = saturatorLocation
-        if self.isRetina:
-            x /= 2
-            y /= 2
-        y += 100
-        return (x,y)
-        
+        return self.tracker.locate()
+
     def press(self, k,t):
         keyboard.keyDown(k, False)
         time.sleep(t)
         keyboard.keyUp(k, False)
-        
-    def slowFieldDriftCompensation(self, initialSaturatorLocation):
+
+    #key to press for each axis to bring the saturator to the center box, or "" if it is inside
+    def getMoves(self, location):
         winUp, winDown = self.robloxWindow.mh/2.14, self.robloxWindow.mh/1.88
         winLeft, winRight = self.robloxWindow.mw/2.14, self.robloxWindow.mw/1.88
-        saturatorLocation = initialSaturatorLocation
-        for _ in range(8):
-            if saturatorLocation is None: break #cant find saturator
-            x,y = saturatorLocation
-            if x >= winLeft and x <= winRight and y >= winUp and y <= winDown: 
-                break
-            if x < winLeft:
-                self.press("a",0.2)
-            elif x > winRight:
-                self.press("d",0.2)
-            if y < winUp:
-                self.press("w",0.2)
-            elif y > winDown:
-                self.press("s",0.2)
-
-            saturatorLocation = self.getSaturatorLocation()
-
-    #natro's field drift compensation
-    #works well with fast detection times (<0.2s)
-    def fastFieldDriftCompensation(self, initialSaturatorLocation):
-        
-        winUp, winDown = mh/2.14, mh/1.88
-        winLeft, winRight = mw/2.14, mw/1.88
-        hmove, vmove = "", ""
-        st = time.time()
-        if initialSaturatorLocation:
-            x,y = initialSaturatorLocation
-
-            #move towards saturator
-            if x >= winLeft and x <= winRight and y >= winUp and y <= winDown: 
-                return
-            if x < winLeft:
-                keyboard.keyDown("a", False)
-                hmove = "a"
-            elif x > winRight:
-                keyboard.keyDown("d", False)
-                hmove = "d"
-            if y < winUp:
-                keyboard.keyDown("w", False)
-                vmove = "w"
-            elif y > winDown:
-                keyboard.keyDown("s", False)
-                vmove = "s"
-
-            i = 0
-            while hmove or vmove:
-                #check if reached saturator
-                if (hmove == "a" and x >= winLeft) or (hmove == "d" and x <= winRight):
-                    keyboard.keyUp(hmove, False)
-                    hmove = ""
-                    
-                if (vmove == "w" and y >= winUp) or (vmove == "s" and y <= winDown):
-                    keyboard.keyUp(vmove, False)
-                    vmove = ""
-                
-                time.sleep(0.02)
-                #taking too long, just give up
-                if i >= 100:
-                    print("give up")
-                    keyboard.releaseMovement()
-                    break
-                #update saturator location
-                saturatorLocation = self.getSaturatorLocation()
-                if saturatorLocation is not None:
-                    x,y = saturatorLocation
+        x, y = location
+        hmove = "a" if x < winLeft else "d" if x > winRight else ""
+        vmove = "w" if y < winUp else "s" if y > winDown else ""
+        return hmove, vmove
 
-                else: #cant find saturator, pause
-                    keyboard.releaseMovement()
-                    #try to find saturator
-                    for _ in range(10):
-                        time.sleep(0.02)
-                        saturatorLocation = self.getSaturatorLocation()
-                        #saturator found
-                        if saturatorLocation:
-                            #move towards saturator
-                            if hmove:
-                                keyboard.keyDown(hmove)
-                            if vmove:
-                                keyboard.keyDown(vmove)
-                            x,y = saturatorLocation
-                            break
-                    else: #still cant find it, give up
-                        return
-                i += 1
-                
     def run(self):
-        #calculate how fast it takes to get the saturator and determine if the fast or slow version should be used
-        st = time.time()
-        saturatorLocation = self.getSaturatorLocation()
-        timing = time.time()-st
-        if timing > 0.25:
-            self.slowFieldDriftCompensation(saturatorLocation)
-        else:
-            self.fastFieldDriftCompensation(saturatorLocation)
\ No newline at end of file
+        st = time.perf_counter()
+        self.tracker.reset()
+        saturatorLocation = self.tracker.locate()
+        detections = 1
+        held = ["", ""]
+        result = "gave up" if saturatorLocation else "not found"
+        slow = False
+        while saturatorLocation is not None:
+            slow = self.tracker.latency > self.slowLatency
+            if slow:
+                if held != ["", ""]:
+                    keyboard.releaseMovement()
+                    held = ["", ""]
+                moves = self.getMoves(saturatorLocation)
+            else:
+                #release a key early if the saturator will be in the center by the time the next detection is done
+                predicted = self.getMoves(self.tracker.predict(time.perf_counter()-self.tracker.t+self.tracker.latency))
+                moves = self.getMoves(saturatorLocation)
+                moves = tuple("" if held[i] and predicted[i] != held[i] else moves[i] for i in range(2))
+                for i, k in enumerate(moves):
+                    if held[i] != k:
+                        if held[i]: keyboard.keyUp(held[i], False)
+                        if k: keyboard.keyDown(k, False)
+                        held[i] = k
+            if self.getMoves(saturatorLocation) == ("", ""):
+                result = "converged"
+                break
+            if time.perf_counter()-st > self.maxTime:
+                break
+            if slow:
+                for k in moves:
+                    if k: self.press(k, 0.2)
+            else:
+                time.sleep(max(0, self.minPeriod-self.tracker.latency))
+            saturatorLocation = self.tracker.locate()
+            detections += 1
+
+            if saturatorLocation is None: #cant find saturator, stop and try to find it again
+                keyboard.releaseMovement()
+                held = ["", ""]
+                for _ in range(10):
+                    time.sleep(0.02)
+                    saturatorLocation = self.tracker.locate()
+                    detections += 1
+                    if saturatorLocation: break
+                else:
+                    result = "lost"
+        keyboard.releaseMovement()
+
+        correction = {
+            "result": result,
+            "mode": "slow" if slow else "fast",
+            "time": time.perf_counter()-st,
+            "detections": detections,
+        }
+        self.corrections.append(correction)
+        print(f"Field drift compensation: {result} in {correction['time']:.2f}s ({detections} detections, {correction['mode']}, detection latency {(self.tracker.latency or 0)*1000:.0f}ms)")
+
+    def getStats(self):
+        corrections = list(self.corrections)
+        times = [x["time"] for x in corrections if x["result"] == "converged"]
+        return {
+            "corrections": len(corrections),
+            "converged": len(times),
+            "lost": sum(x["result"] == "lost" for x in corrections),
+            "slow": sum(x["mode"] == "slow" for x in corrections),
+            "p50_converge_ms": percentile(times, 50)*1000,
+            "p95_converge_ms": percentile(times, 95)*1000,
+            "avg_detections": sum(x["detections"] for x in corrections)/max(1, len(corrections)),
+            **self.tracker.getStats(),
+        }
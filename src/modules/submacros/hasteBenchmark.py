@@ -0,0 +1,170 @@
+'''
+Compare the haste compensation implementations on recorded buff strips with a known move speed.
+
+The corpus has a folder per display type (retina, built-in), each with png captures of the top of the roblox window
+(the full window width and at least corpusHeight points tall, with the window at the top left of the screen) and a
+labels.txt of "filename,haste stacks,bear morph (0/1),haste+ (0/1)" lines.
+Each implementation is fed the part of the capture it was written for (see hasteRegions), not a shared buff strip.
+
+python -m modules.submacros.hasteBenchmark path/to/corpus [--impls HasteCompensationRevamped ...] [--runs 3] [--out results.json]
+
+The results are saved to ./data/user/haste_benchmark.json by default. On startup, the macro uses the implementation
+that was the most accurate (then fastest) for its display type, see selectHasteImplementation
+'''
+import argparse
+import json
+import os
+import time
+import cv2
+from modules.misc.benchmark import percentile, formatTable
+from modules.screen.captureBackend import ReplayCaptureBackend
+from modules.submacros.hasteCompensation import hasteImplementations, hasteRegions, createHasteCompensation
+
+resultsPath = "./data/user/haste_benchmark.json"
+defaultImplementation = "HasteCompensationRevamped"
+displayTypes = ["retina", "built-in"]
+#the expected speed is calculated with this base speed, so it does not depend on the user's settings
+baseMoveSpeed = 28
+#height of the captures in points. Covers the regions of all implementations
+corpusHeight = 110
+
+class DisplayInfo:
+    '''
+    The parts of RobloxWindowBounds the implementations use, for a window at the top left of the screen
+    '''
+    def __init__(self, displayType, width):
+        self.display_type = displayType
+        self.isRetina = displayType == "retina"
+        self.multi = 2 if self.isRetina else 1
+        self.mx, self.my = 0, 0
+        self.mw, self.mh = width, corpusHeight
+        self.yOffset = 21
+
+def expectedSpeed(haste, bear, hastePlus):
+    return (baseMoveSpeed + 4*bear) * (1 + 0.1*(haste + 10*hastePlus))
+
+def loadCorpus(path):
+    corpus = {}
+    for displayType in displayTypes:
+        labelsPath = os.path.join(path, displayType, "labels.txt")
+        if not os.path.isfile(labelsPath):
+            continue
+        frames = []
+        with open(labelsPath, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                name, haste, bear, hastePlus = [x.strip() for x in line.split(",")]
+                img = cv2.imread(os.path.join(path, displayType, name), cv2.IMREAD_UNCHANGED)
+                if img is None:
+                    print(f"Could not read {displayType}/{name}")
+                    continue
+                #frames are bgra, like the capture service's regions
+                if img.ndim == 2:
+                    img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
+                elif img.shape[2] == 3:
+                    img = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+                frames.append((name, img, expectedSpeed(int(haste), int(bear), int(hastePlus))))
+        if frames:
+            corpus[displayType] = frames
+    return corpus
+
+#the implementations remember the previous haste to smooth over missed detections. Frames are independent, so clear it
+def resetState(impl):
+    for attr in ["prevHaste", "prevHaste368", "hasteEnds", "prevHasteEnds", "endTime"]:
+        if hasattr(impl, attr):
+            setattr(impl, attr, 0)
+
+#current: list whose first item is the capture backend the implementation reads from (its frame source)
+def timeImpl(impl, current, frames, runs, scale):
+    latencies = []
+    cpu = 0
+    correct = 0
+    error = 0
+    failed = 0
+    for name, frame, expected in frames:
+        current[0] = ReplayCaptureBackend([frame], scale=scale)
+        speed = None
+        for _ in range(runs):
+            resetState(impl)
+            st = time.perf_counter()
+            cpuStart = time.process_time() #process time, since some implementations match on threads
+            try:
+                speed = impl.getHaste()
+            except Exception as e:
+                speed = None
+                print(f"{type(impl).__name__} failed on {name}: {e}")
+            cpu += time.process_time() - cpuStart
+            latencies.append(time.perf_counter() - st)
+        if speed is None:
+            failed += 1
+            continue
+        correct += abs(speed - expected) < 1e-6
+        error += abs(speed - expected)
+    n = max(1, len(frames))
+    return {
+        "frames": len(frames),
+        "accuracy": correct/n,
+        "mean_abs_speed_error": error/max(1, len(frames)-failed),
+        "failed": failed,
+        "p50_ms": percentile(latencies, 50)*1000,
+        "p95_ms": percentile(latencies, 95)*1000,
+        "cpu_ms": cpu/max(1, len(latencies))*1000,
+    }
+
+def runBenchmark(corpus, impls=None, runs=3):
+    '''
+    corpus: path or the output of loadCorpus
+    Returns a list of result rows (one per display type and implementation)
+    '''
+    if isinstance(corpus, str):
+        corpus = loadCorpus(corpus)
+    rows = []
+    for displayType, frames in corpus.items():
+        display = DisplayInfo(displayType, 0)
+        display.mw = frames[0][1].shape[1]//display.multi
+        for name in impls or hasteImplementations:
+            current = [None]
+            region = hasteRegions[name](display)
+            try:
+                impl = createHasteCompensation(name, display, baseMoveSpeed, lambda: current[0].grab(*region))
+            except Exception as e:
+                #eg a template image that no longer exists
+                print(f"Could not create {name} for {displayType}: {e}")
+                continue
+            rows.append({"display": displayType, "impl": name, **timeImpl(impl, current, frames, runs, display.multi)})
+    return rows
+
+#name of the implementation to use on this display type, from the saved benchmark results
+def selectHasteImplementation(displayType, path=resultsPath):
+    try:
+        with open(path, "r") as f:
+            results = json.load(f)["results"]
+    except (OSError, ValueError, KeyError):
+        return defaultImplementation
+    rows = [x for x in results if x.get("display") == displayType and x.get("impl") in hasteImplementations and not x.get("failed")]
+    if not rows:
+        return defaultImplementation
+    best = min(rows, key=lambda x: (-x["accuracy"], x["p50_ms"]))
+    print(f"Haste compensation: using {best['impl']} ({best['accuracy']*100:.1f}% accurate, {best['p50_ms']:.2f}ms)")
+    return best["impl"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the haste compensation implementations on recorded buff strips")
+    parser.add_argument("corpus", help="folder with a retina and/or built-in sub folder (png buff strips + labels.txt)")
+    parser.add_argument("--impls", nargs="*", default=None, help="implementations to test (default: all)")
+    parser.add_argument("--runs", type=int, default=3, help="number of times each frame is read")
+    parser.add_argument("--out", default=resultsPath, help="where to save the json results")
+    args = parser.parse_args()
+
+    rows = runBenchmark(args.corpus, args.impls, args.runs)
+    print(formatTable(rows))
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({"time": time.time(), "corpus": os.path.abspath(args.corpus), "runs": args.runs, "results": rows}, f, indent=2)
+        print(f"Saved results to {args.out}")
+
+if __name__ == "__main__":
+    main()
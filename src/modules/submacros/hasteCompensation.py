@@ -1,7 +1,7 @@
 import cv2
 import pyautogui as pag
-from modules.screen.imageSearch import templateMatch
-from modules.screen.screenshot import mssScreenshot, mssScreenshotNP
+from modules.screen.imageSearch import templateMatch, findFirstBitmap, prepareBitmapScreen
+from modules.screen.screenshot import mssScreenshotNP, getScreenSize
 import numpy as np
 import time
 from PIL import Image
@@ -13,11 +13,18 @@ import mss
 import mss.darwin
 mss.darwin.IMAGE_OPTIONS = 0
 from modules.screen.robloxWindow import RobloxWindowBounds
+from modules.screen.capture import captureService
+
+#frameSource: function returning the implementation's buff region (see hasteRegions) as a bgra array.
+#By default each implementation grabs its own region from the screen
 
 class HasteCompensation():
-    def __init__(self, isRetina, baseMoveSpeed):
+    def __init__(self, isRetina, baseMoveSpeed, frameSource=None):
         self.isRetina = isRetina
         self.baseMoveSpeed = baseMoveSpeed
+        if frameSource is None:
+            frameSource = lambda: mssScreenshotNP(0, 30, getScreenSize()[0], 70)
+        self.frameSource = frameSource
 
         self.hasteStacks = []
         for i in range(10):
@@ -54,9 +61,12 @@ class HasteCompensation():
         _, val, _, loc = res
         return (val > threshold, val)
 
-    def getHaste(self, mx, my, mw):
+    def screenshotBuff(self):
+        return Image.fromarray(cv2.cvtColor(self.frameSource(), cv2.COLOR_BGRA2RGB))
+
+    def getHaste(self):
         st = time.perf_counter()
-        screen = np.array(mssScreenshot(mx,my+30,mw,70))
+        screen = np.array(self.screenshotBuff())
         screenGray = cv2.cvtColor(screen.copy(), cv2.COLOR_RGB2GRAY)
         bestHaste = 0
         bestHasteMaxVal = 0
@@ -111,10 +121,13 @@ class HasteCompensationOptimized():
     mw, mh = pag.size() 
     BUFF_REGION = (0, 30, int(mw / 1.8), 70)
 
-    def __init__(self, isRetina, baseMoveSpeed):
+    def __init__(self, isRetina, baseMoveSpeed, frameSource=None):
         self.isRetina = isRetina
         self.baseMoveSpeed = baseMoveSpeed
         self.buff_region = HasteCompensationOptimized.BUFF_REGION
+        if frameSource is None:
+            frameSource = lambda: mssScreenshotNP(*self.buff_region)
+        self.frameSource = frameSource
 
         #load templates
         self.hasteStacks = []
@@ -169,8 +182,11 @@ class HasteCompensationOptimized():
         return (max_val > threshold, max_val)
 
 
+    def screenshotBuff(self):
+        return self.frameSource()
+
     def getHaste(self):
-        screenBGR = cv2.cvtColor(mssScreenshotNP(self.buff_region[0], self.buff_region[1], self.buff_region[2], self.buff_region[3]), cv2.COLOR_RGBA2BGR)
+        screenBGR = cv2.cvtColor(self.screenshotBuff(), cv2.COLOR_RGBA2BGR)
 
         screen_grayscale = cv2.cvtColor(screenBGR, cv2.COLOR_BGR2GRAY)
 
@@ -240,10 +256,13 @@ class HasteCompensationFastest():
     mw, mh = pag.size() 
     BUFF_REGION = (0, 30, int(mw / 1.8), 70)
 
-    def __init__(self, isRetina, baseMoveSpeed):
+    def __init__(self, isRetina, baseMoveSpeed, frameSource=None):
         self.isRetina = isRetina
         self.baseMoveSpeed = baseMoveSpeed
         self.buff_region = HasteCompensationOptimized.BUFF_REGION
+        if frameSource is None:
+            frameSource = lambda: mssScreenshotNP(*self.buff_region)
+        self.frameSource = frameSource
 
         # --- Optimization 2: Preload and Preprocess Templates ---
         self.hasteStacks = []
@@ -308,12 +327,14 @@ class HasteCompensationFastest():
         return (max_val > threshold, max_val)
 
 
+    def screenshotBuff(self):
+        return self.frameSource()
+
     def getHaste(self):
         st = time.perf_counter() # Keep for timing checks
 
 
-        screen_cv2 = cv2.cvtColor(mssScreenshotNP(self.buff_region[0], self.buff_region[1], 
-                                   self.buff_region[2], self.buff_region[3]), cv2.COLOR_RGBA2BGR)
+        screen_cv2 = cv2.cvtColor(self.screenshotBuff(), cv2.COLOR_RGBA2BGR)
 
         screen_grayscale = cv2.cvtColor(screen_cv2, cv2.COLOR_BGR2GRAY)
 
@@ -390,9 +411,13 @@ class HasteCompensationFastest():
         return final_speed
 
 class HasteCompensationRevamped():
-    def __init__(self, robloxWindow: RobloxWindowBounds, baseMoveSpeed):
+    def __init__(self, robloxWindow: RobloxWindowBounds, baseMoveSpeed, frameSource=None):
         self.robloxWindow = robloxWindow
         self.baseMoveSpeed = baseMoveSpeed
+        if frameSource is None:
+            #served from the shared frame instead of a new mss grab
+            frameSource = lambda: captureService.getRegion("buffs")
+        self.frameSource = frameSource
 
         self.countBitmaps = []
         self.bearMorphs = []
@@ -434,17 +459,15 @@ class HasteCompensationRevamped():
         self.endTime = 0
 
     def screenshotBuff(self):   
-        with mss.mss() as sct:
-            monitor = {"left": int(self.robloxWindow.mx), "top": int(self.robloxWindow.my+self.robloxWindow.yOffset+33), "width": int(self.robloxWindow.mw), "height": int(48)}
-            sct_img = sct.grab(monitor)
-            img = Image.frombytes("RGBA", sct_img.size, sct_img.bgra, "raw", "BGRA")
-            #img.save(f"buff_area.png")
-            return img
+        img = Image.fromarray(cv2.cvtColor(self.frameSource(), cv2.COLOR_BGRA2RGBA))
+        #img.save(f"buff_area.png")
+        return img
 
     #similar to natro's implementation for haste detection
     def getHaste(self):
         start_time = time.time()
-        screen = self.screenshotBuff()
+        #all the searches below share the same converted screen
+        screen = prepareBitmapScreen(self.screenshotBuff())
         haste = 0
         hasteX = None
 
@@ -464,21 +487,11 @@ class HasteCompensationRevamped():
 
         #haste found, get count
         if hasteX:
-            for i, img in enumerate(self.countBitmaps):
-                res = bitmap_matcher.find_bitmap_cython(screen, img, x=hasteX, w=38*self.robloxWindow.multi, variance=0)
-                if res:
-                    haste = i+2
-                    break
-            else:
-                haste = 1
-            
+            res = findFirstBitmap(screen, self.countBitmaps, x=hasteX, w=38*self.robloxWindow.multi, variance=0)
+            haste = res[0]+2 if res else 1
         
         #search for bear morphs
-        bearmorphSpeed = 0
-        for img in self.bearMorphs:
-            if bitmap_matcher.find_bitmap_cython(screen, img, variance=30):
-                bearmorphSpeed = 4
-                break
+        bearmorphSpeed = 4 if findFirstBitmap(screen, self.bearMorphs, variance=30) else 0
         end_time = time.time()
 
         #search for haste+
@@ -488,4 +501,31 @@ class HasteCompensationRevamped():
         #print(end_time-start_time)
         #print(f"{(self.baseMoveSpeed + bearmorphSpeed) * (1 + (0.1 * haste))} --- {self.baseMoveSpeed}, {haste}")
         
-        return (self.baseMoveSpeed + bearmorphSpeed) * (1 + (0.1 * haste))
\ No newline at end of file
+        return (self.baseMoveSpeed + bearmorphSpeed) * (1 + (0.1 * haste))
+
+#buff region each implementation was written for, in screen points: function(robloxWindow) -> (x,y,w,h)
+hasteRegions = {
+    #70px strip below the top of the window
+    "HasteCompensation": lambda rw: (rw.mx, rw.my+30, rw.mw, 70),
+    #left part of the top of the screen
+    "HasteCompensationOptimized": lambda rw: HasteCompensationOptimized.BUFF_REGION,
+    "HasteCompensationFastest": lambda rw: HasteCompensationOptimized.BUFF_REGION,
+    #the "buffs" capture region
+    "HasteCompensationRevamped": lambda rw: captureService.regions["buffs"](rw),
+}
+
+#name: constructor(robloxWindow, baseMoveSpeed, frameSource)
+hasteImplementations = {
+    "HasteCompensation": lambda rw, speed, frameSource: HasteCompensation(rw.isRetina, speed, frameSource),
+    "HasteCompensationOptimized": lambda rw, speed, frameSource: HasteCompensationOptimized(rw.isRetina, speed, frameSource),
+    "HasteCompensationFastest": lambda rw, speed, frameSource: HasteCompensationFastest(rw.isRetina, speed, frameSource),
+    "HasteCompensationRevamped": lambda rw, speed, frameSource: HasteCompensationRevamped(rw, speed, frameSource),
+}
+
+#create a haste compensation implementation by name
+#by default it reads its own buff region (hasteRegions) from the shared capture frame
+def createHasteCompensation(name, robloxWindow, baseMoveSpeed, frameSource=None):
+    if frameSource is None:
+        region = hasteRegions[name]
+        frameSource = lambda: captureService.getRegion(region(robloxWindow))
+    return hasteImplementations[name](robloxWindow, baseMoveSpeed, frameSource)
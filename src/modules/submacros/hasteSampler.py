@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import deque
+
+class HasteSampler:
+    '''
+    Reads the move speed (HasteCompensationRevamped.getHaste) on a background thread at a fixed rate,
+    instead of every wait loop iteration taking its own screenshot and running the bitmap searches.
+
+    The latest reading is published as a (speed, timestamp, sequence) tuple. Replacing a tuple is atomic,
+    so readers never take a lock. The thread only samples while a wait function is using it (see active),
+    and for a short time after, so consecutive pattern steps don't have to wait for a fresh sample.
+    If the latest sample is too old (the sampler just woke up, or is behind), the speed is read directly.
+    Reads are serialized by _readLock, so a direct read and the sampler thread never publish out of order
+    '''
+
+    def __init__(self, hasteCompensation, rate=30, maxAge=0.25, linger=2):
+        self.hasteCompensation = hasteCompensation
+        self.rate = rate
+        self.maxAge = maxAge
+        self.linger = linger #seconds to keep sampling after the last user
+
+        #(speed, timestamp, sequence)
+        self.latest = (0, 0, 0)
+        self.users = 0
+        self.lastUse = 0
+        self._lock = threading.Lock()
+        self._readLock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+        #stats
+        self.samples = 0
+        self.sampleTime = 0 #wall time spent reading the speed on the sampler thread
+        self.sampleCPUTime = 0 #cpu time spent reading the speed on the sampler thread
+        self.activeTime = 0 #time the sampler was awake
+        self.directReads = 0 #reads that had to get the speed directly since the sample was too old
+        self.reads = 0
+        self.ages = deque(maxlen=500) #age of the sample when it was read
+
+    def setRate(self, rate):
+        self.rate = max(1, rate)
+
+    #time of a sample is the middle of the read, since the screenshot is taken at the start
+    def read(self):
+        st = time.perf_counter()
+        cpu = time.thread_time()
+        speed = self.hasteCompensation.getHaste()
+        et = time.perf_counter()
+        return speed, (st+et)/2, et-st, time.thread_time()-cpu
+
+    #call with _readLock held. An older sample than the latest one is dropped
+    def publish(self, speed, timestamp):
+        if timestamp > self.latest[1]:
+            self.latest = (speed, timestamp, self.latest[2]+1)
+
+    #read the speed and publish it. Returns the read's duration and cpu time
+    def sample(self):
+        with self._readLock:
+            speed, timestamp, duration, cpu = self.read()
+            self.publish(speed, timestamp)
+        return duration, cpu
+
+    def run(self):
+        while True:
+            with self._lock:
+                idle = not self.users and time.perf_counter() - self.lastUse > self.linger
+                if idle:
+                    self._wake.clear()
+            if idle:
+                self._wake.wait()
+                continue
+            st = time.perf_counter()
+            try:
+                duration, cpu = self.sample()
+            except Exception as e:
+                print(f"Haste sampler error: {e}")
+                time.sleep(0.5)
+                continue
+            self.samples += 1
+            self.sampleTime += duration
+            self.sampleCPUTime += cpu
+            #sleep for the rest of the period
+            remaining = 1/self.rate - (time.perf_counter()-st)
+            if remaining > 0:
+                time.sleep(remaining)
+            self.activeTime += time.perf_counter()-st
+
+    def acquire(self):
+        with self._lock:
+            self.users += 1
+            self.lastUse = time.perf_counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self.run, daemon=True)
+                self._thread.start()
+            self._wake.set()
+
+    def release(self):
+        with self._lock:
+            self.users = max(0, self.users-1)
+            self.lastUse = time.perf_counter()
+
+    #with sampler.active(): ... keeps the sampler running while waiting
+    def active(self):
+        sampler = self
+        class Active:
+            def __enter__(self):
+                sampler.acquire()
+                return sampler
+            def __exit__(self, *args):
+                sampler.release()
+        return Active()
+
+    #latest (speed, timestamp, sequence). Reads the speed directly if the sample is older than maxAge
+    def getSample(self):
+        sample = self.latest
+        now = time.perf_counter()
+        self.reads += 1
+        if now - sample[1] > self.maxAge:
+            with self._readLock:
+                #the sampler thread may have published while this thread waited for the lock
+                if time.perf_counter() - self.latest[1] > self.maxAge:
+                    self.directReads += 1
+                    speed, timestamp, _, _ = self.read()
+                    self.publish(speed, timestamp)
+                sample = self.latest
+        self.ages.append(now - sample[1])
+        return sample
+
+    def getSpeed(self):
+        return self.getSample()[0]
+
+    #track the distance travelled since start, see SpeedIntegrator
+    def integrator(self, start=None):
+        return SpeedIntegrator(self, time.perf_counter() if start is None else start)
+
+    def getStats(self):
+        from modules.misc.benchmark import percentile
+        ages = list(self.ages)
+        return {
+            "rate_hz": self.rate,
+            "samples": self.samples,
+            "actual_rate_hz": self.samples/max(self.activeTime, 1e-9),
+            "avg_sample_ms": self.sampleTime/max(1, self.samples)*1000,
+            #share of a core used by the sampler while it is awake
+            "cpu_load": self.sampleCPUTime/max(self.activeTime, 1e-9),
+            "reads": self.reads,
+            "direct_reads": self.directReads,
+            "p50_staleness_ms": percentile(ages, 50)*1000,
+            "p95_staleness_ms": percentile(ages, 95)*1000,
+        }
+
+class SpeedIntegrator:
+    '''
+    Distance travelled from the published speed samples.
+    Between two samples the speed is interpolated linearly. After the latest sample the speed is assumed to stay the same,
+    and that estimate is corrected once the next sample arrives.
+    '''
+    def __init__(self, sampler, start):
+        self.sampler = sampler
+        speed, _, self.seq = sampler.getSample()
+        #last point (time, speed) the distance is committed up to
+        self.t = start
+        self.v = speed
+        self.distance = 0
+
+    #returns the distance travelled until now
+    def update(self, now=None):
+        if now is None:
+            now = time.perf_counter()
+        speed, timestamp, seq = self.sampler.getSample()
+        if seq != self.seq:
+            self.seq = seq
+            if timestamp > self.t:
+                self.distance += (self.v + speed)/2 * (timestamp - self.t)
+                self.t = timestamp
+            self.v = speed
+        return self.distance + self.v * max(0, now - self.t)
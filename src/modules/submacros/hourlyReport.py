@@ -7,12 +7,14 @@ import ast
 import numpy as np
 import platform
 from modules.misc.messageBox import msgBox
-from modules.screen.imageSearch import locateTransparentImageOnScreen, locateTransparentImage
+from modules.screen.imageSearch import locateTransparentImageOnScreen, locateTransparentImage, TemplateSet, matchTemplateSet
 from modules.screen.screenshot import mssScreenshotNP, mssScreenshot
-from modules.misc.imageManipulation import adjustImage
+from modules.screen.capture import captureService
+from modules.misc.imageManipulation import adjustImage, templateRegistry
 import time
 import pyautogui as pag
-from modules.screen.ocr import ocrRead, imToString
+from modules.screen.ocr import ocrRead, ocrReadCached, ocrReadArray, ocrReadArrayCached, imToString
+from modules.screen.digitReader import digitReader
 import copy
 from datetime import datetime
 from modules.screen.robloxWindow import RobloxWindowBounds
@@ -56,7 +58,7 @@ class BuffDetector():
         self.nectarKernel = cv2.getStructuringElement(cv2.MORPH_RECT,(3,3))
 
     def screenshotBuffArea(self):
-        return mssScreenshotNP(self.robloxWindow.mx, self.robloxWindow.my+self.robloxWindow.yOffset+33, self.robloxWindow.mw, 45)
+        return captureService.getRegion("buffArea")
 
     def getBuffQuantityFromImg(self, bgrImg,transform, crop=True, buff=None, intOnly=False):
         #buff size is 76x76
@@ -73,16 +75,17 @@ class BuffDetector():
             #extract only the text (white color)
             mask = cv2.inRange(mask, lower, upper)
             mask = cv2.erode(mask, kernel)
-        mask = Image.fromarray(mask)
-        if transform:
-            mask = ImageOps.invert(mask)
-            pass
-        
-        mask = mask.resize((mask.width * 3, mask.height * 3), Image.LANCZOS)
 
-        #mask.save(f"{time.time()}.png")
-        #read the text
-        ocrText = ''.join([x[1][0] for x in ocrRead(mask)]).replace(":", ".")
+        def readWithOCR():
+            #black text on white background when transformed, upscaled 3x
+            return ''.join([x[1][0] for x in ocrReadArray(mask, invert=transform, scale=3)])
+
+        #read the text. The mask is only text when transformed, otherwise use the ocr
+        if transform:
+            ocrText = digitReader.read(mask, readWithOCR)
+        else:
+            ocrText = readWithOCR()
+        ocrText = ocrText.replace(":", ".")
         buffCount = ''.join([x for x in ocrText if x.isdigit() or (not intOnly and x == ".")])
 
         # Clean up the buffCount to ensure it's a valid number format
@@ -125,13 +128,13 @@ class BuffDetector():
         #dilate to make the text thicker
         kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
         mask = cv2.dilate(mask, kernel)
-        img = Image.fromarray(mask)
-        img = img.resize((img.width * 3, img.height * 3), Image.LANCZOS)
-        #convert to black text on white background for ocr
-        #img = ImageOps.invert(img)
-        if show:
-            img.show()
-        ocrText = ''.join([x[1][0] for x in ocrRead(img)])
+
+        def readWithOCR():
+            if show:
+                Image.fromarray(mask).show()
+            return ''.join([x[1][0] for x in ocrReadArrayCached(mask, "buff count", scale=3)])
+
+        ocrText = digitReader.read(mask, readWithOCR)
         hasteVal = ''.join([x for x in ocrText if x.isdigit()])
         return hasteVal if hasteVal else '1'
 
@@ -141,16 +144,18 @@ class BuffDetector():
 
         if screen is None:
             screen = self.screenshotBuffArea()
+        #find all the buffs in one pass
+        templateSet = self.getBuffTemplateSet([buff for buff, _ in buffs])
+        locations = {x[0]: (x[1], x[2]) for x in matchTemplateSet(templateSet, screen, threshold, "all", parallel=True)}
 
         for buff,v in buffs:
             templatePosition, transform, stackable = v
 
-            #find the buff
-            buffTemplate = adjustImage("./images/buffs", buff, self.robloxWindow.display_type)
+            buffTemplate = templateSet.templates[buff]
             finalBuffValues = []
 
             for _ in range(3):
-                res = locateTransparentImage(buffTemplate, screen, threshold)
+                res = locations.get(buff)
 
                 if not res: 
                     finalBuffValues.append(0)
@@ -158,7 +163,7 @@ class BuffDetector():
 
                 #get a screenshot of the buff
                 rx, ry = res[1]
-                h,w = buffTemplate.shape[:-1]
+                h,w = buffTemplate.shape[:2]
                 if templatePosition == "bottom": 
                     ry-=self.buffSize-h
                 elif templatePosition == "middle":
@@ -212,6 +217,15 @@ class BuffDetector():
 
         return buffQuantity
 
+    def getBuffTemplateSet(self, buffs):
+        return TemplateSet({buff: templateRegistry.get("./images/buffs", buff, self.robloxWindow.display_type, "gray") for buff in buffs}, gray=True)
+
+    #check if any of the buffs are active, stopping at the first one found
+    def hasAnyBuff(self, buffs, screen=None, threshold=0.7):
+        if screen is None:
+            screen = self.screenshotBuffArea()
+        return bool(matchTemplateSet(self.getBuffTemplateSet(buffs), screen, threshold, "first"))
+
     def getBuffWithColor(self, buffs):
         buffQuantity = []
         buffs = buffs.items()
@@ -272,6 +286,10 @@ class BuffDetector():
             return []
 
         mask = cv2.inRange(cropped, lower, upper)
+        return self.getBuffBoxesFromMask(mask, minSize, x1, y1, show, searchDirection, instances, screen)
+
+    #find the buff boxes in a mask of the buff colour (cropped at x1, y1)
+    def getBuffBoxesFromMask(self, mask, minSize, x1=0, y1=0, show=False, searchDirection=1, instances=1, screen=None):
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         coords = []
         for cnt in contours:
@@ -310,7 +328,8 @@ class BuffDetector():
         if coords:
             coords.sort(key=sort_key)
             out = []
-            preview = screen.copy()
+            if show:
+                preview = screen.copy()
             for i in range(min(len(coords), instances)):
                 x, y, w, h = coords[i]
                 out.append(coords[i])
@@ -329,15 +348,18 @@ class BuffDetector():
         return []
 
         
-    def getNectar(self, nectar):
+    #screen and res can be passed in to reuse a screenshot/template match (see getNectars)
+    def getNectar(self, nectar, screen=None, res=False):
         vals = self.nectars[nectar]
         col, offsetCoords = vals
         offsetX, offsetY = offsetCoords
 
         #find the buff
-        screen = self.screenshotBuffArea()
-        buffTemplate = adjustImage("./images/buffs", nectar, self.robloxWindow.display_type)
-        res = locateTransparentImage(buffTemplate, screen, 0.5) #get the best match first. At high nectar levels, it becomes hard to detect the nectar icon
+        if screen is None:
+            screen = self.screenshotBuffArea()
+        if res is False:
+            buffTemplate = templateRegistry.get("./images/buffs", nectar, self.robloxWindow.display_type, "gray")
+            res = locateTransparentImage(buffTemplate, screen, 0.5) #get the best match first. At high nectar levels, it becomes hard to detect the nectar icon
         if not res: 
             return 0
         #get a screenshot of the buff
@@ -371,10 +393,14 @@ class BuffDetector():
         return quantity
 
 
-    def getNectars(self):
+    #all nectars are read from the same screenshot, and their icons are located in one pass
+    def getNectars(self, screen=None):
+        if screen is None:
+            screen = self.screenshotBuffArea()
+        locations = {x[0]: (x[1], x[2]) for x in matchTemplateSet(self.getBuffTemplateSet(self.nectars), screen, 0.5, "all")}
         nectarQuantity = []
         for nectar in self.nectars:
-            nectarQuantity.append(self.getNectar(nectar))
+            nectarQuantity.append(self.getNectar(nectar, screen, locations.get(nectar)))
         return nectarQuantity
 
 
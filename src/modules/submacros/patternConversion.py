@@ -0,0 +1,118 @@
+'''
+Convert the .ahk patterns in the patterns folder to python, only when they changed.
+
+A manifest (./data/user/ahk_manifest.json) stores the hash of every converted .ahk file (and of the converter),
+and the hash of the .py file it produced. A pattern is converted again if its source or the converter changed,
+or if its .py file is missing or was changed. Failed conversions are kept in the manifest so they aren't retried until the .ahk file changes.
+Conversions run in a process pool when there are enough of them, and every result is compiled and run once against
+the pattern simulator's virtual keyboard, so broken output is rejected instead of being written.
+'''
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+manifestPath = "./data/user/ahk_manifest.json"
+#below this many conversions, starting the worker processes takes longer than converting
+minPoolSize = 4
+
+def hashText(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+#changes to the converter also invalidate the converted patterns
+def converterHash():
+    from modules.submacros import convertAhkPattern
+    with open(convertAhkPattern.__file__, "r") as f:
+        return hashText(f.read())
+
+def loadManifest(path=manifestPath):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def saveManifest(manifest, path=manifestPath):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+#run the converted pattern once with the simulator. Raises if it doesn't compile or fails to run
+def smokeRun(python, name):
+    from modules.submacros.patternSimulator import PatternSimulator
+    code = compile(python, f"{name}.py", "exec")
+    sim = PatternSimulator(step=60)
+    for width in [1, 2]:
+        sim.run(code, 1, width)
+
+#runs in the worker. Returns (python, error, seconds)
+def convertPattern(ahk, name):
+    from modules.submacros.convertAhkPattern import ahkPatternToPython
+    st = time.perf_counter()
+    try:
+        python = ahkPatternToPython(ahk)
+        smokeRun(python, name)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", time.perf_counter() - st
+    return python, None, time.perf_counter() - st
+
+def convertAhkPatterns(patternsDir, path=manifestPath, workers=None):
+    '''
+    Convert the new and changed .ahk patterns in patternsDir
+    Returns {"converted": [names], "cached": [names], "failed": {name: error}, "time": seconds, "convert_time": seconds, "mode": "inline"/"process"}
+    '''
+    st = time.perf_counter()
+    manifest = loadManifest(path)
+    converter = converterHash()
+    report = {"converted": [], "cached": [], "failed": {}, "time": 0, "convert_time": 0, "mode": "inline"}
+
+    jobs = []
+    for file in sorted(os.listdir(patternsDir)):
+        if not file.lower().endswith(".ahk"):
+            continue
+        with open(os.path.join(patternsDir, file), "r") as f:
+            ahk = f.read()
+        name = file.rsplit(".", 1)[0].lower()
+        outputPath = os.path.join(patternsDir, f"{name}.py")
+        sourceHash = hashText(converter + ahk)
+        entry = manifest.get(file)
+        #failed conversions are remembered too, so they are only retried after the pattern changes
+        if entry and entry["source"] == sourceHash and "error" in entry:
+            report["failed"][file] = entry["error"]
+            continue
+        if entry and entry["source"] == sourceHash and os.path.isfile(outputPath):
+            with open(outputPath, "r") as f:
+                if hashText(f.read()) == entry["output"]:
+                    report["cached"].append(file)
+                    continue
+        jobs.append((file, name, outputPath, sourceHash, ahk))
+
+    if len(jobs) >= minPoolSize:
+        report["mode"] = "process"
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(convertPattern, [x[4] for x in jobs], [x[1] for x in jobs]))
+    else:
+        results = [convertPattern(x[4], x[1]) for x in jobs]
+
+    for (file, name, outputPath, sourceHash, _), (python, error, duration) in zip(jobs, results):
+        report["convert_time"] += duration
+        if error:
+            report["failed"][file] = error
+            manifest[file] = {"source": sourceHash, "error": error}
+            continue
+        with open(outputPath, "w") as f:
+            f.write(python)
+        manifest[file] = {"source": sourceHash, "output": hashText(python)}
+        report["converted"].append(file)
+
+    #forget deleted patterns
+    for file in list(manifest):
+        if not os.path.isfile(os.path.join(patternsDir, file)):
+            del manifest[file]
+    if jobs or len(manifest) != len(report["cached"]) + len(report["failed"]):
+        saveManifest(manifest, path)
+    report["time"] = time.perf_counter() - st
+    return report
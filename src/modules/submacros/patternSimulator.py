@@ -0,0 +1,392 @@
+'''
+Run gather patterns offline, against a virtual keyboard and a simple movement model, instead of in game.
+
+The pattern gets the same variables as in macro.gather (size, width, the invert flags, key names...), and self.keyboard
+moves a simulated player: walk/multiWalk/timeWait move 28*t studs (haste compensated), tileWait moves 4*n studs
+(natro tiles), and press/sleep let time pass while the held keys keep moving. Rotating the camera (, .) turns the
+direction of the movement keys by 45 degrees.
+
+The result has the path, the cycle duration, a heatmap of the time spent on each part of the field, the share
+of the field that was covered and how far the player ended up from where the pattern started.
+
+python -m modules.submacros.patternSimulator [--fields sunflower ...] [--patterns e_lol ...] [--top 5] [--out ranking.json]
+'''
+import argparse
+import ast
+import json
+import math
+import os
+import time
+import cv2
+import numpy as np
+from modules.misc.fieldData import startLocationDimensions, sizeData
+from modules.misc.settingsManager import getPatternsDir, getAvailablePatterns, getDefaultSettingsPath
+
+#startLocationDimensions are in ms of walking at 18 studs/s, from the field center to its edge
+studsPerDimension = 18/1000
+#natro's walk distance of one tile, see keyboard.tileWait
+studsPerTile = 4
+movementKeys = {
+    "w": (0, 1),
+    "s": (0, -1),
+    "a": (-1, 0),
+    "d": (1, 0),
+}
+
+class PatternStopped(Exception):
+    pass
+
+class VirtualKeyboard:
+    '''
+    Stand in for controls.keyboard that moves the simulated player instead of sending keys
+    '''
+    def __init__(self, sim):
+        self.sim = sim
+        self.ws = sim.movespeed
+        self.enableHasteCompensation = sim.hasteCompensation
+
+    def keyDown(self, k, pause=True):
+        self.sim.held.add(k)
+
+    def keyUp(self, k, pause=True):
+        self.sim.held.discard(k)
+
+    def press(self, key, delay=0.02):
+        self.keyDown(key)
+        self.sim.advance(delay)
+        self.keyUp(key)
+        if key == ",":
+            self.sim.angle += 45
+        elif key == ".":
+            self.sim.angle -= 45
+
+    def pagPress(self, k):
+        self.press(k)
+
+    def slowPress(self, k):
+        self.press(k, 0.08)
+
+    def write(self, text, interval=0.1):
+        self.sim.advance(len(text)*interval)
+
+    def walk(self, k, t, applyHaste=True, method='predictive'):
+        if applyHaste and self.enableHasteCompensation:
+            self.keyDown(k)
+            self.timeWait(t)
+            self.keyUp(k)
+        else:
+            self.press(k, t*28/self.ws)
+
+    def multiWalk(self, keys, t, applyHaste=True, method='predictive'):
+        for k in keys:
+            self.keyDown(k)
+        if applyHaste and self.enableHasteCompensation:
+            self.timeWait(t)
+        else:
+            self.sim.advance(t*28/self.ws)
+        for k in keys:
+            self.keyUp(k)
+
+    def timeWait(self, duration):
+        self.sim.travel(28*duration)
+
+    predictiveTimeWait = timeWait
+
+    def timeWaitNoHasteCompensation(self, duration):
+        self.sim.advance(duration*28/self.ws)
+
+    def tileWait(self, n, hasteCap=0):
+        self.sim.travel(n*studsPerTile - 1/8)
+
+    def tileWalk(self, key, tiles, applyHaste=True):
+        self.keyDown(key)
+        self.tileWait(tiles)
+        self.keyUp(key)
+
+    def releaseMovement(self):
+        for k in ["w", "a", "s", "d", "space"]:
+            self.keyUp(k)
+
+    def getMoveSpeed(self):
+        return self.sim.speed
+
+class PatternSimulator:
+    '''
+    Kinematic model of the player while a pattern runs. Positions are in studs, relative to the field center,
+    x to the right and y forwards (with the camera's default direction)
+
+    movespeed: base move speed (setting). haste: haste stacks (+10 for haste+). bear: bear morph
+    hasteCompensation: if the walk functions compensate for haste (setting). step: path sample interval in seconds
+    '''
+    keyboardClass = VirtualKeyboard
+
+    def __init__(self, movespeed=28, haste=0, bear=False, hasteCompensation=True, step=0.02, maxTime=600):
+        self.movespeed = movespeed
+        self.speed = (movespeed + 4*bear) * (1 + 0.1*haste)
+        self.hasteCompensation = hasteCompensation
+        self.step = step
+        self.maxTime = maxTime
+        self.reset()
+
+    def reset(self, x=0, y=0, angle=0):
+        self.t = 0
+        self.x = x
+        self.y = y
+        self.angle = angle #camera rotation in degrees, positive is to the left
+        self.held = set()
+        self.path = [(0, x, y)]
+
+    #unit vector of the held movement keys in field coordinates
+    def direction(self):
+        dx = sum(movementKeys[k][0] for k in self.held if k in movementKeys)
+        dy = sum(movementKeys[k][1] for k in self.held if k in movementKeys)
+        length = math.hypot(dx, dy)
+        if not length:
+            return 0, 0
+        dx, dy = dx/length, dy/length
+        a = math.radians(self.angle)
+        return dx*math.cos(a) - dy*math.sin(a), dx*math.sin(a) + dy*math.cos(a)
+
+    #let time pass, the held keys keep moving the player
+    def advance(self, duration):
+        if duration <= 0:
+            return
+        if self.t + duration > self.maxTime:
+            raise PatternStopped(f"pattern did not finish within {self.maxTime}s")
+        dx, dy = self.direction()
+        end = self.t + duration
+        while self.t < end:
+            dt = min(self.step, end - self.t)
+            self.t += dt
+            self.x += dx*self.speed*dt
+            self.y += dy*self.speed*dt
+            self.path.append((self.t, self.x, self.y))
+
+    #wait until the held keys moved the player this many studs. Time passes even if nothing is held (like the real wait functions)
+    def travel(self, distance):
+        self.advance(max(0, distance)/self.speed)
+
+    #variables the pattern can use, like the namespace in macro.gather
+    def namespace(self, size, width, sizeword="m", invertLR=False, invertFB=False):
+        class Macro:
+            pass
+        macro = Macro()
+        macro.keyboard = self.keyboardClass(self)
+        fwdkey, leftkey, backkey, rightkey = "w", "a", "s", "d"
+        return {
+            "self": macro,
+            "fwdkey": fwdkey, "leftkey": leftkey, "backkey": backkey, "rightkey": rightkey,
+            "rotleft": ",", "rotright": ".", "rotup": "pageup", "rotdown": "pagedown",
+            "zoomin": "i", "zoomout": "o", "sc_space": "space",
+            "tcfbkey": backkey if invertFB else fwdkey, "afcfbkey": fwdkey if invertFB else backkey,
+            "tclrkey": rightkey if invertLR else leftkey, "afclrkey": leftkey if invertLR else rightkey,
+            "facingcorner": 0, "sizeData": sizeData, "sizeword": sizeword, "size": size, "width": width,
+            "math": math,
+            #sleeps are simulated, the pattern doesn't actually wait
+            "sleep": self.advance,
+            "time": SimulatedTime(self),
+        }
+
+    def run(self, code, size, width, sizeword="m", invertLR=False, invertFB=False, start=(0, 0), angle=0):
+        self.reset(start[0], start[1], angle)
+        exec(code, self.namespace(size, width, sizeword, invertLR, invertFB))
+        self.held.clear()
+        return self.path
+
+class SimulatedTime:
+    '''
+    The parts of the time module patterns use, on the simulated clock
+    '''
+    def __init__(self, sim):
+        self.sim = sim
+    def sleep(self, duration):
+        self.sim.advance(duration)
+    def time(self):
+        return self.sim.t
+    perf_counter = time
+
+#half the field's size (x, y) in studs
+def fieldHalfSize(field):
+    length, width = startLocationDimensions[field]
+    return width*studsPerDimension, length*studsPerDimension
+
+#where macro.gather walks to before the pattern starts, relative to the field center
+def startPosition(field, startLocation="center", distance=10):
+    halfX, halfY = fieldHalfSize(field)
+    x = y = 0
+    if "upper" in startLocation or "top" in startLocation:
+        y = halfY*distance/10
+    elif "lower" in startLocation or "bottom" in startLocation:
+        y = -halfY*distance/10
+    if "left" in startLocation:
+        x = -halfX*distance/10
+    elif "right" in startLocation:
+        x = halfX*distance/10
+    return x, y
+
+def coverageMap(path, field, cellSize=1, reach=3):
+    '''
+    Returns (heatmap, covered, outside)
+    heatmap: seconds spent in each cell of the field (rows from the top of the field)
+    covered: cells within reach studs of the path
+    outside: seconds spent outside the field
+    '''
+    halfX, halfY = fieldHalfSize(field)
+    w = max(1, int(round(2*halfX/cellSize)))
+    h = max(1, int(round(2*halfY/cellSize)))
+    heatmap = np.zeros((h, w), dtype=np.float32)
+    outside = 0
+    for i in range(1, len(path)):
+        t, x, y = path[i]
+        dt = t - path[i-1][0]
+        col = int((x + halfX)/cellSize)
+        row = int((halfY - y)/cellSize)
+        if 0 <= col < w and 0 <= row < h:
+            heatmap[row, col] += dt
+        else:
+            outside += dt
+    #the player collects from the cells around them
+    r = max(0, int(round(reach/cellSize)))
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2*r+1, 2*r+1))
+    covered = cv2.dilate((heatmap > 0).astype(np.uint8), kernel) > 0
+    return heatmap, covered, outside
+
+def simulate(pattern, field, sizeword="m", width=3, startLocation="center", distance=10, turn="none", turnTimes=0,
+             invertLR=False, invertFB=False, sim=None, code=None, cellSize=1, reach=3):
+    '''
+    Simulate one cycle of a pattern in a field
+    Returns a dict with the path, heatmap and stats (duration, coverage, coverage_per_s, drift...)
+    '''
+    if sim is None:
+        sim = PatternSimulator()
+    if code is None:
+        path = os.path.join(getPatternsDir(), f"{pattern}.py")
+        with open(path, "r") as f:
+            code = compile(f.read(), path, "exec")
+    angle = 0
+    if turn == "left":
+        angle = 45*turnTimes
+    elif turn == "right":
+        angle = -45*turnTimes
+    start = startPosition(field, startLocation, distance)
+    path = sim.run(code, sizeData[sizeword], int(width), sizeword, invertLR, invertFB, start, angle)
+    heatmap, covered, outside = coverageMap(path, field, cellSize, reach)
+    duration = path[-1][0]
+    coverage = covered.mean()
+    endX, endY = path[-1][1], path[-1][2]
+    travelled = sum(math.hypot(path[i][1]-path[i-1][1], path[i][2]-path[i-1][2]) for i in range(1, len(path)))
+    return {
+        "pattern": pattern,
+        "field": field,
+        "size": sizeword,
+        "width": int(width),
+        "duration_s": duration,
+        "coverage": float(coverage),
+        #a pattern that doesn't move only covers the cells around the player
+        "coverage_per_s": float(coverage/max(duration, 1e-9)) if travelled >= reach else 0.0,
+        "travelled_studs": travelled,
+        "outside_share": outside/max(duration, 1e-9),
+        "drift_studs": math.hypot(endX - start[0], endY - start[1]),
+        "drift": (endX - start[0], endY - start[1]),
+        "path": path,
+        "heatmap": heatmap,
+    }
+
+#draw the heatmap and the path of a simulate result
+def drawResult(result, cellSize=1, scale=8):
+    heatmap = result["heatmap"]
+    h, w = heatmap.shape
+    norm = (heatmap/max(heatmap.max(), 1e-9)*255).astype(np.uint8)
+    img = cv2.applyColorMap(norm, cv2.COLORMAP_INFERNO)
+    img = cv2.resize(img, (w*scale, h*scale), interpolation=cv2.INTER_NEAREST)
+    halfX, halfY = w*cellSize/2, h*cellSize/2
+    points = np.array([[(x + halfX)/cellSize*scale, (halfY - y)/cellSize*scale] for _, x, y in result["path"]], dtype=np.int32)
+    cv2.polylines(img, [points], False, (255, 255, 255), 1)
+    cv2.circle(img, (int(points[0][0]), int(points[0][1])), 4, (0, 255, 0), -1)
+    cv2.circle(img, (int(points[-1][0]), int(points[-1][1])), 4, (0, 0, 255), -1)
+    return img
+
+def loadDefaultFieldSettings():
+    with open(os.path.join(getDefaultSettingsPath(), "fields.txt"), "r") as f:
+        return ast.literal_eval(f.read())
+
+def rankPatterns(fields=None, patterns=None, sizes=None, widths=range(1, 9), movespeed=28, haste=0, fieldSettings=None):
+    '''
+    Simulate every pattern x size x width in each field (start location and turn from the field settings)
+    Returns {field: rows sorted by coverage per second}. Patterns that fail are skipped
+    '''
+    if fieldSettings is None:
+        fieldSettings = loadDefaultFieldSettings()
+    sim = PatternSimulator(movespeed, haste)
+    codes = {}
+    for pattern in patterns or sorted(getAvailablePatterns()):
+        path = os.path.join(getPatternsDir(), f"{pattern}.py")
+        try:
+            with open(path, "r") as f:
+                codes[pattern] = compile(f.read(), path, "exec")
+        except (OSError, SyntaxError) as e:
+            print(f"Skipping {pattern}: {e}")
+
+    out = {}
+    failed = set()
+    for field in fields or startLocationDimensions:
+        setting = fieldSettings.get(field, {})
+        rows = []
+        for pattern, code in codes.items():
+            for sizeword in sizes or sizeData:
+                for width in widths:
+                    if pattern in failed:
+                        break
+                    try:
+                        result = simulate(pattern, field, sizeword, width, setting.get("start_location", "center"), int(setting.get("distance", 10)),
+                                          setting.get("turn", "none"), int(setting.get("turn_times", 0)), setting.get("invert_lr", False), setting.get("invert_fb", False),
+                                          sim=sim, code=code)
+                    except PatternStopped as e:
+                        print(f"{pattern} ({sizeword}, width {width}): {e}")
+                        break
+                    except Exception as e:
+                        #the pattern would also fail in the macro (which then falls back to e_lol)
+                        print(f"{pattern} ({sizeword}, width {width}) failed: {e}")
+                        failed.add(pattern)
+                        break
+                    rows.append({k: v for k, v in result.items() if k not in ("path", "heatmap", "drift")})
+        rows.sort(key=lambda x: -x["coverage_per_s"])
+        out[field] = rows
+    return out
+
+def main():
+    from modules.misc.benchmark import formatTable
+    parser = argparse.ArgumentParser(description="Simulate the gather patterns and rank them by field coverage per second")
+    parser.add_argument("--fields", nargs="*", default=None, help="fields to rank (default: all)")
+    parser.add_argument("--patterns", nargs="*", default=None, help="patterns to simulate (default: all)")
+    parser.add_argument("--sizes", nargs="*", default=None, choices=list(sizeData), help="sizes to try (default: all)")
+    parser.add_argument("--widths", nargs="*", type=int, default=list(range(1, 9)), help="widths to try")
+    parser.add_argument("--movespeed", type=float, default=28)
+    parser.add_argument("--haste", type=int, default=0, help="haste stacks (+10 for haste+)")
+    parser.add_argument("--top", type=int, default=5, help="number of combinations to print per field")
+    parser.add_argument("--out", default="./data/user/pattern_ranking.json", help="where to save the json ranking")
+    parser.add_argument("--image", default=None, help="save the heatmap of the best combination of each field to this folder")
+    args = parser.parse_args()
+
+    st = time.perf_counter()
+    ranking = rankPatterns(args.fields, args.patterns, args.sizes, args.widths, args.movespeed, args.haste)
+    for field, rows in ranking.items():
+        print(f"\n{field.title()}")
+        print(formatTable(rows[:args.top], ["pattern", "size", "width", "duration_s", "coverage", "coverage_per_s", "outside_share", "travelled_studs", "drift_studs"]))
+        if args.image and rows:
+            best = rows[0]
+            setting = loadDefaultFieldSettings().get(field, {})
+            result = simulate(best["pattern"], field, best["size"], best["width"], setting.get("start_location", "center"), int(setting.get("distance", 10)),
+                              setting.get("turn", "none"), int(setting.get("turn_times", 0)), setting.get("invert_lr", False), setting.get("invert_fb", False),
+                              sim=PatternSimulator(args.movespeed, args.haste))
+            os.makedirs(args.image, exist_ok=True)
+            cv2.imwrite(os.path.join(args.image, f"{field}.png"), drawResult(result))
+    print(f"\nSimulated in {time.perf_counter()-st:.1f}s")
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({"time": time.time(), "movespeed": args.movespeed, "haste": args.haste, "ranking": ranking}, f, indent=2)
+        print(f"Saved ranking to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 import cv2
 import pyautogui as pag
 from modules.screen.imageSearch import templateMatch
-from modules.screen.screenshot import mssScreenshot
+from modules.screen.screenshot import mssScreenshotNP
 from modules.screen.screenData import getScreenData
 import numpy as np
 import time
@@ -10,7 +10,8 @@ from modules.misc.imageManipulation import pillowToCv2
 
 
 class Walk():
-    def __init__(self, isRetina, baseMoveSpeed):
+    #frameSource: function returning the buff region (0,30,screen width/1.8,70) as a bgra array, like the haste compensation implementations
+    def __init__(self, isRetina, baseMoveSpeed, frameSource=None):
         self.isRetina = isRetina
         self.baseMoveSpeed = baseMoveSpeed
 
@@ -25,13 +26,14 @@ class Walk():
 
         self.hastePlus = self.adjustBuffImage(f"./images/buffs/haste+.png")         
         self.mw, self.mh = pag.size()                 
+        if frameSource is None:
+            frameSource = lambda: mssScreenshotNP(0,30,self.mw/1.8,70)
+        self.frameSource = frameSource
         self.prevHaste = 0         
         self.prevHaste368 = 0 #tracking the previous haste to accurately determine if the haste stack is 3,6 or 8
         self.hasteEnds = 0
         self.prevHasteEnds = 0
 
-        self.hasteCompensationObj = HasteCompensationRevamped(isRetina, baseMoveSpeed)
-
 
     def adjustBuffImage(self, path):
         img = Image.open(path)
@@ -51,7 +53,7 @@ class Walk():
 
     def hasteCompensation(self):
         st = time.perf_counter()
-        screen = np.array(mssScreenshot(0,30,self.mw/1.8,70))
+        screen = cv2.cvtColor(self.frameSource(), cv2.COLOR_BGRA2RGB)
         bestHaste = 0
         bestHasteMaxVal = 0
         #match haste
@@ -0,0 +1,5 @@
+import os
+import sys
+
+#the macro's modules are imported as "modules.*" from the src folder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
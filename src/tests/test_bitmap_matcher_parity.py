@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from PIL import Image
+from modules import bitmap_matcher
+from modules.bitmap_matcher import vectorized
+
+@pytest.fixture(scope="module")
+def native():
+    if bitmap_matcher.backend != "native":
+        pytest.skip("native bitmap_matcher extension is not available")
+    return bitmap_matcher._bitmap_matcher
+
+def randomCase(rng):
+    mh, mw = rng.integers(8, 48, 2)
+    bh, bw = rng.integers(1, 6, 2)
+    palette = rng.integers(0, 256, (4, 3), dtype=np.uint8)
+    main = palette[rng.integers(0, 4, (mh, mw))]
+    bitmap = np.dstack([palette[rng.integers(0, 4, (bh, bw))], np.where(rng.random((bh, bw)) < 0.2, 0, 255).astype(np.uint8)])
+    if mh > bh and mw > bw:
+        py, px = rng.integers(0, mh-bh), rng.integers(0, mw-bw)
+        opaque = bitmap[:, :, 3] > 0
+        main[py:py+bh, px:px+bw][opaque] = bitmap[:, :, :3][opaque]
+    return Image.fromarray(main, "RGB").convert("RGBA"), Image.fromarray(bitmap, "RGBA")
+
+def edgeCases():
+    rng = np.random.default_rng(1)
+    main = Image.fromarray(rng.integers(0, 256, (20, 30, 3), dtype=np.uint8), "RGB").convert("RGBA")
+    crop = main.crop((7, 5, 11, 8))
+    return {
+        "larger than image": (main, Image.new("RGBA", (40, 10), (1, 2, 3, 255)), {}),
+        "taller than window": (main, crop, {"h": 2}),
+        "fully transparent": (main, Image.new("RGBA", (3, 3), (0, 0, 0, 0)), {"x": 4, "y": 2}),
+        "exact crop, variance 0": (main, crop, {"variance": 0}),
+        "variance 255": (main, Image.new("RGBA", (3, 3), (10, 200, 90, 255)), {"variance": 255}),
+        "window offset": (main, crop, {"x": 8, "y": 5}),
+    }
+
+def asTuple(res):
+    return None if res is None else tuple(res)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_vectorized_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(40):
+        main, bitmap = randomCase(rng)
+        variance = int(rng.choice([0, 5, 30, 255]))
+        expected = vectorized.find_bitmap_reference(main, bitmap, variance=variance)
+        assert asTuple(vectorized.find_bitmap_cython(main, bitmap, variance=variance)) == expected
+
+@pytest.mark.parametrize("name", list(edgeCases()))
+def test_vectorized_edge_cases(name):
+    main, bitmap, kwargs = edgeCases()[name]
+    expected = vectorized.find_bitmap_reference(main, bitmap, **kwargs)
+    assert asTuple(vectorized.find_bitmap_cython(main, bitmap, **kwargs)) == expected
+
+def test_edge_case_results():
+    cases = edgeCases()
+    assert vectorized.find_bitmap_cython(*cases["larger than image"][:2]) is None
+    assert vectorized.find_bitmap_cython(cases["taller than window"][0], cases["taller than window"][1], h=2) is None
+    assert vectorized.find_bitmap_cython(cases["fully transparent"][0], cases["fully transparent"][1], x=4, y=2) == (4, 2)
+    assert vectorized.find_bitmap_cython(cases["variance 255"][0], cases["variance 255"][1], variance=255) == (0, 0)
+
+@pytest.mark.parametrize("seed", range(3))
+def test_native_parity_random(native, seed):
+    assert vectorized.check_parity(cases=100, seed=seed, native=native) == []
+
+@pytest.mark.parametrize("name", list(edgeCases()))
+def test_native_parity_edge_cases(native, name):
+    main, bitmap, kwargs = edgeCases()[name]
+    assert asTuple(native.find_bitmap_cython(main, bitmap, **kwargs)) == asTuple(vectorized.find_bitmap_cython(main, bitmap, **kwargs))
+    assert [tuple(p) for p in native.find_all_bitmap_cython(main, bitmap, **kwargs)] == vectorized.find_all_bitmap_cython(main, bitmap, **kwargs)
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+srcPath = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+#run in a new interpreter where the live screen dependencies can't be imported
+script = textwrap.dedent('''
+    import sys
+    import numpy as np
+
+    blocked = {"mss", "pyautogui", "Quartz", "AppKit", "ApplicationServices"}
+    class BlockImports:
+        def find_spec(self, name, path=None, target=None):
+            if name.split(".")[0] in blocked:
+                raise ImportError(f"{name} is blocked")
+            return None
+    sys.meta_path.insert(0, BlockImports())
+
+    from modules.screen.captureBackend import ReplayCaptureBackend, setCaptureBackend
+    frame = np.zeros((90, 160, 4), dtype=np.uint8)
+    frame[10, 20] = (1, 2, 3, 255)
+    setCaptureBackend(ReplayCaptureBackend([frame]))
+
+    from modules.screen.capture import captureService
+    from modules.screen import screenshot
+    assert screenshot.getScreenSize() == (160, 90)
+    assert captureService.getRegion((0, 0, 160, 90)).shape == (90, 160, 4)
+    assert captureService.getPixel(20, 10) == (3, 2, 1)
+    for name in blocked:
+        assert name not in sys.modules, name
+    print("ok")
+''')
+
+def test_capture_imports_without_screen_dependencies():
+    result = subprocess.run([sys.executable, "-c", script], cwd=srcPath, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "ok"
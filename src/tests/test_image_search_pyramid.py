@@ -0,0 +1,41 @@
+import os
+import cv2
+import numpy as np
+import pytest
+from modules.screen import captureBackend
+from modules.screen.captureBackend import ReplayCaptureBackend, setCaptureBackend
+from modules.screen.imageSearch import locateImageOnScreen
+
+template = cv2.imread(os.path.join(os.path.dirname(__file__), "../images/menu/disconnect-retina.png"))
+
+#blurred noise, so the background has some texture at both scales
+def background(seed, h=360, w=1250):
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(img, (0, 0), 6)
+
+@pytest.fixture
+def replay():
+    previous = captureBackend._backend
+    def use(frame):
+        setCaptureBackend(ReplayCaptureBackend([frame]))
+    yield use
+    setCaptureBackend(previous)
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("planted", [True, False])
+def test_pyramid_finds_the_same_matches(replay, seed, planted):
+    frame = background(seed)
+    if planted:
+        rng = np.random.default_rng(seed+100)
+        th, tw = template.shape[:2]
+        y, x = rng.integers(0, frame.shape[0]-th), rng.integers(0, frame.shape[1]-tw)
+        frame[y:y+th, x:x+tw] = template
+    replay(frame)
+    h, w = frame.shape[:2]
+    exact = locateImageOnScreen(template, 0, 0, w, h, 0.7)
+    pyramid = locateImageOnScreen(template, 0, 0, w, h, 0.7, pyramid=True)
+    assert (exact is None) == (pyramid is None) == (not planted)
+    if planted:
+        assert exact[1] == (x, y)
+        assert abs(pyramid[1][0]-x) <= 2 and abs(pyramid[1][1]-y) <= 2